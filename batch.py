@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+from typing import Dict, List, Optional
+
+from content import Content
+from cover import Cover
+from directory import Directory
+from main import content_filename, cover_filename, quotation_filename
+from profiling import StageProfiler
+from project import load_project
+from quotation import Quotation
+from recalc import RecalculationError, recalculator_from_config
+from separate import Separate
+
+
+STAGES = ("解析", "报价表", "目录", "封面", "文件夹", "拆分")
+
+
+def find_project_docs(source: str) -> List[str]:
+    """source 为目录时匹配其中的 project*.docx，否则按通配符匹配。"""
+    pattern = os.path.join(source, "project*.docx") if os.path.isdir(source) else source
+    return sorted(
+        path
+        for path in glob.glob(pattern)
+        if path.lower().endswith(".docx") and not os.path.basename(path).startswith("~$")
+    )
+
+
+def output_names(documents: List[str]) -> Dict[str, str]:
+    """各项目文档的输出目录名，默认为文档文件名（不含扩展名）。
+
+    不同目录中的文档文件名相同时加上所在目录名，如 甲地-project；仍然重复时再加序号，保证各项目互不覆盖。
+    """
+    stems = {document: os.path.splitext(os.path.basename(document))[0] for document in documents}
+    counts: Dict[str, int] = {}
+    for stem in stems.values():
+        counts[stem.lower()] = counts.get(stem.lower(), 0) + 1
+    names: Dict[str, str] = {}
+    used = set()
+    for document in documents:
+        name = stems[document]
+        if counts[name.lower()] > 1:
+            parent = os.path.basename(os.path.dirname(os.path.abspath(document)))
+            name = f"{parent}-{name}" if parent else name
+        unique, index = name, 2
+        while unique.lower() in used:  # Windows 和 macOS 的文件名不区分大小写
+            unique = f"{name}-{index}"
+            index += 1
+        used.add(unique.lower())
+        names[document] = unique
+    return names
+
+
+def build_project(
+    document: str,
+    output_root: str,
+    parser: str = "xml",
+    use_cache: bool = True,
+    stage_timings: bool = False,
+    output_name: Optional[str] = None,
+) -> Dict:
+    """在独立的输出目录中为单个项目生成报价表、目录、封面和文件夹结构，返回各阶段耗时。
+
+    output_name 为输出根目录下的目录名，默认为文档文件名（不含扩展名）。
+    stage_timings 为真时另外按工作表统计报价表的生成过程，写入输出目录的 报价表耗时.json，表格放在结果的 stages 中。
+    """
+    output_dir = os.path.join(output_root, output_name or os.path.splitext(os.path.basename(document))[0])
+    result: Dict = {
+        "document": document,
+        "output": output_dir,
+        "quotation": None,
+        "timings": {},
+        "stages": None,
+        "error": None,
+    }
+    timings = result["timings"]
+    stage = "解析"
+    try:
+        started = perf_counter()
+        project = load_project(document, parser=parser, use_cache=use_cache)
+        timings[stage] = perf_counter() - started
+        os.makedirs(output_dir, exist_ok=True)
+
+        stage = "报价表"
+        started = perf_counter()
+        profiler = StageProfiler() if stage_timings else None
+        quotation = os.path.join(output_dir, quotation_filename(project))
+        Quotation(project).generate(quotation, profiler=profiler)
+        result["quotation"] = quotation
+        timings[stage] = perf_counter() - started
+        if profiler is not None:
+            profiler.write_json(os.path.join(output_dir, "报价表耗时.json"))
+            result["stages"] = profiler.format_table()
+
+        stage = "目录"
+        started = perf_counter()
+        Content(project).generate_content(os.path.join(output_dir, content_filename(project)))
+        timings[stage] = perf_counter() - started
+
+        stage = "封面"
+        started = perf_counter()
+        Cover(project).generate(os.path.join(output_dir, cover_filename(project)))
+        timings[stage] = perf_counter() - started
+
+        stage = "文件夹"
+        started = perf_counter()
+        try:
+            Directory(project, root=output_dir).make_dir()
+        except FileExistsError:
+            pass  # 目录结构已存在时不重复创建
+        timings[stage] = perf_counter() - started
+    except Exception as exc:
+        result["error"] = f"{stage}失败：{exc}"
+    return result
+
+
+def run_batch(
+    documents: List[str],
+    output_root: str,
+    workers: Optional[int] = None,
+    parser: str = "xml",
+    use_cache: bool = True,
+    stage_timings: bool = False,
+) -> List[Dict]:
+    """使用进程池并行处理多个项目文档，结果按输入顺序返回；文件名相同的文档输出到不同的目录，见 output_names。"""
+    results: Dict[str, Dict] = {}
+    names = output_names(documents)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                build_project, document, output_root, parser, use_cache, stage_timings, names[document]
+            ): document
+            for document in documents
+        }
+        for future in as_completed(futures):
+            document = futures[future]
+            try:
+                results[document] = future.result()
+            except Exception as exc:  # 子进程异常退出
+                results[document] = {
+                    "document": document,
+                    "output": None,
+                    "quotation": None,
+                    "timings": {},
+                    "stages": None,
+                    "error": f"进程异常：{exc}",
+                }
+    return [results[document] for document in documents]
+
+
+def split_quotations(results: List[Dict]) -> None:
+    """在当前进程中依次拆分各项目的报价表，拆分结果放在项目的输出目录中。
+
+    所有报价表共用一个重算方式，LibreOffice 等外部进程只启动一次；失败时记在该项目结果的 error 中。
+    """
+    with recalculator_from_config() as recalculator:
+        separate = Separate(recalculator)
+        for result in results:
+            if result["error"] or not result["quotation"]:
+                continue
+            started = perf_counter()
+            try:
+                separate.generate(result["quotation"], incremental=True, output_dir=result["output"])
+            except Exception as exc:  # 重算失败、缓存值缺失等
+                result["error"] = f"拆分失败：{exc}"
+                continue
+            result["timings"]["拆分"] = perf_counter() - started
+
+
+def format_summary(results: List[Dict]) -> str:
+    headers = ["项目文件", *STAGES, "合计", "状态"]
+    lines = []
+    for result in results:
+        timings = result["timings"]
+        cells = [os.path.basename(result["document"])]
+        cells.extend(f"{timings[stage]:.2f}s" if stage in timings else "-" for stage in STAGES)
+        cells.append(f"{sum(timings.values()):.2f}s")
+        cells.append(result["error"] or "成功")
+        lines.append(cells)
+    widths = [max(len(str(row[i])) for row in [headers, *lines]) for i in range(len(headers))]
+    rows = [headers, ["-" * width for width in widths], *lines]
+    return "\n".join("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)) for row in rows)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="批量生成多个项目的报价表、目录、封面和文件夹结构。")
+    parser.add_argument("source", help="项目文档所在目录，或 project*.docx 的通配符")
+    parser.add_argument("-o", "--output", default="批量输出", help="输出根目录，每个项目单独一个子目录")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="并行进程数，默认为 CPU 核数")
+    parser.add_argument("--parser", choices=("xml", "docx"), default="xml", help="项目文档解析模式")
+    parser.add_argument("--no-cache", action="store_true", help="不使用项目解析缓存")
+    parser.add_argument("--stage-timings", action="store_true", help="按工作表统计报价表的生成耗时、单元格数和内存峰值")
+    parser.add_argument("--split", action="store_true", help="生成后拆分各项目的报价表，重算方式按环境变量 BIDDING_RECALC")
+    args = parser.parse_args(argv)
+
+    documents = find_project_docs(args.source)
+    if not documents:
+        print(f"<<< 未找到项目文档：{args.source} >>>")
+        return 1
+
+    started = perf_counter()
+    results = run_batch(
+        documents,
+        args.output,
+        args.workers,
+        args.parser,
+        use_cache=not args.no_cache,
+        stage_timings=args.stage_timings,
+    )
+    if args.split:
+        try:
+            split_quotations(results)
+        except RecalculationError as exc:  # 重算方式的配置有误或无法启动
+            print(f"<<< 未拆分报价表：{exc} >>>")
+    print(format_summary(results))
+    for result in results:
+        if result["stages"]:
+            print(f"<<< {os.path.basename(result['document'])} 报价表分阶段耗时 >>>")
+            print(result["stages"])
+    failed = sum(1 for result in results if result["error"])
+    print(f"<<< 共 {len(results)} 个项目，失败 {failed} 个，总耗时 {perf_counter() - started:.2f}s >>>")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
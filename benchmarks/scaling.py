@@ -0,0 +1,184 @@
+"""规模基准：用合成的项目文档分别计时各阶段，结果写成 JSON，并与保存的基线比较。
+
+每个物资数量合成一份项目文档（技术服务、来华培训的开关在各规模间轮换，--all-flags 时四种组合都测），
+依次计时项目解析、报价表、目录、封面、文件夹结构和报价表拆分。与基线相比变慢超过阈值的阶段视为性能回退，
+此时返回值为 1。
+
+    python benchmarks/scaling.py --sizes 10 100 1000 --repeat 3 -o result.json --baseline benchmarks/baseline.json
+    python benchmarks/scaling.py --sizes 10 100 1000 --update-baseline
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from time import perf_counter
+from typing import Callable, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from content import Content  # noqa: E402
+from cover import Cover  # noqa: E402
+from directory import Directory  # noqa: E402
+from project import Project  # noqa: E402
+from quotation import Quotation  # noqa: E402
+from separate import Separate  # noqa: E402
+from synthetic import write_project_doc  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+STAGES = ("解析", "报价表", "目录", "封面", "文件夹", "拆分")
+FLAGS = ((False, False), (True, False), (False, True), (True, True))  # (技术服务, 来华培训)
+
+
+@contextmanager
+def working_directory(path: str):
+    """拆分功能把结果写到当前目录，计时时切换到临时目录。"""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def case_name(count: int, tech: bool, cc: bool) -> str:
+    return f"{count}" + ("+技术服务" if tech else "") + ("+来华培训" if cc else "")
+
+
+def project_doc(cache_dir: str, count: int, tech: bool, cc: bool, seed: int) -> str:
+    """合成的文档按参数缓存，10000 项物资的文档生成一次即可重复使用。"""
+    filename = os.path.join(cache_dir, f"project-{count}-{int(tech)}{int(cc)}-{seed}.docx")
+    if not os.path.exists(filename):
+        write_project_doc(filename, count, tech=tech, cc=cc, seed=seed)
+    return filename
+
+
+def run_case(document: str, parser: str, workdir: str) -> Dict[str, float]:
+    """依次执行各阶段一次，返回各阶段耗时（秒）。"""
+    timings: Dict[str, float] = {}
+
+    def timed(stage: str, action: Callable):
+        started = perf_counter()
+        result = action()
+        timings[stage] = perf_counter() - started
+        return result
+
+    def parse() -> Project:
+        project = Project(document, parser=parser)
+        project.load_tables(demand_info=True)  # 物资清单和服务需求默认在首次访问时才读取
+        return project
+
+    project = timed("解析", parse)
+    quotation = os.path.join(workdir, "投标报价表-基准.xlsx")
+    timed("报价表", lambda: Quotation(project).generate(quotation))
+    timed("目录", lambda: Content(project).generate_content(os.path.join(workdir, "目录-基准.xlsx")))
+    timed("封面", lambda: Cover(project).generate(os.path.join(workdir, "封面-基准.docx")))
+    timed("文件夹", lambda: Directory(project, root=workdir).make_dir())
+    with working_directory(workdir):
+        timed("拆分", lambda: Separate().generate(quotation))
+    return timings
+
+
+def run(sizes: List[int], all_flags: bool, repeat: int, parser: str, seed: int, cache_dir: str) -> Dict[str, Dict]:
+    results: Dict[str, Dict] = {}
+    for index, count in enumerate(sizes):
+        for tech, cc in FLAGS if all_flags else [FLAGS[index % len(FLAGS)]]:
+            document = project_doc(cache_dir, count, tech, cc, seed)
+            best: Dict[str, float] = {}
+            for _ in range(repeat):
+                with tempfile.TemporaryDirectory() as workdir:
+                    for stage, seconds in run_case(document, parser, workdir).items():
+                        best[stage] = min(seconds, best.get(stage, seconds))
+            name = case_name(count, tech, cc)
+            results[name] = {"items": count, "tech": tech, "cc": cc, "seconds": best}
+            print(f"<<< {name}：" + "，".join(f"{stage} {best[stage]:.2f}s" for stage in STAGES) + " >>>")
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float, floor: float) -> List[Tuple]:
+    """逐个阶段与基线比较，返回 (用例, 阶段, 基线耗时, 本次耗时, 是否回退)；基线中没有的用例不比较。
+
+    变慢的比例超过 threshold 且绝对差值超过 floor 秒时视为回退，floor 用来忽略很短阶段的计时抖动。
+    """
+    rows = []
+    for name, result in results.items():
+        old = baseline.get(name, {}).get("seconds", {})
+        for stage in STAGES:
+            if stage in old and stage in result["seconds"]:
+                before, after = old[stage], result["seconds"][stage]
+                regressed = after > before * (1 + threshold) and after - before > floor
+                rows.append((name, stage, before, after, regressed))
+    return rows
+
+
+def format_comparison(rows: List[Tuple]) -> str:
+    headers = ["用例", "阶段", "基线", "本次", "变化", ""]
+    lines = [
+        [name, stage, f"{before:.3f}s", f"{after:.3f}s", f"{(after / before - 1) * 100:+.1f}%" if before else "-", "回退" if bad else ""]
+        for name, stage, before, after, bad in rows
+    ]
+    widths = [max(len(str(row[i])) for row in [headers, *lines]) for i in range(len(headers))]
+    table = [headers, ["-" * width for width in widths], *lines]
+    return "\n".join("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)).rstrip() for row in table)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="按物资规模计时各阶段，并与基线比较")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000], help="物资数量")
+    parser.add_argument("--all-flags", action="store_true", help="每个规模都测试技术服务、来华培训的四种组合")
+    parser.add_argument("--repeat", type=int, default=1, help="每个用例重复次数，各阶段取最短耗时")
+    parser.add_argument("--parser", choices=("xml", "docx"), default="xml", help="项目文档解析模式")
+    parser.add_argument("--seed", type=int, default=0, help="合成文档的随机种子")
+    parser.add_argument("--cache-dir", default=os.path.join(tempfile.gettempdir(), "bidding-benchmark"), help="合成文档的缓存目录")
+    parser.add_argument("-o", "--output", help="结果 JSON 文件")
+    parser.add_argument("--baseline", default=BASELINE, help="基线 JSON 文件")
+    parser.add_argument("--update-baseline", action="store_true", help="把本次结果写入基线")
+    parser.add_argument("--threshold", type=float, default=0.2, help="变慢超过该比例视为回退，默认 0.2")
+    parser.add_argument("--floor", type=float, default=0.05, help="绝对差值不超过该秒数时不算回退")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.cache_dir, exist_ok=True)
+    results = run(args.sizes, args.all_flags, args.repeat, args.parser, args.seed, args.cache_dir)
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parser": args.parser,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"<<< 已写入结果：{args.output} >>>")
+    if args.update_baseline:
+        baseline = {"results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        report["results"] = {**baseline.get("results", {}), **results}  # 只更新本次测试的用例
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"<<< 已更新基线：{args.baseline} >>>")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"<<< 没有基线文件，未做比较：{args.baseline} >>>")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare(results, baseline.get("results", {}), args.threshold, args.floor)
+    print(format_comparison(rows))
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"<<< 与基线比较 {len(rows)} 项，回退 {regressions} 项（阈值 {args.threshold:.0%}） >>>")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
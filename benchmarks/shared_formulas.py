@@ -0,0 +1,105 @@
+"""共享公式基准：xml 输出方式下，对比物资行公式逐个写出与写成共享公式时的文件大小和耗时。
+
+对每个物资数量分别统计报价表生成耗时、xlsx 文件大小、工作表 XML 解压后的大小，以及 openpyxl 读取的耗时
+（读取时共享公式会逐个展开，代表读取方解析公式的开销）。
+
+    python benchmarks/shared_formulas.py -n 1000 5000 --repeat 3
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import zipfile
+from time import perf_counter
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from openpyxl import load_workbook  # noqa: E402
+
+from quotation import Quotation  # noqa: E402
+from style_registry import synthetic_project  # noqa: E402
+
+CASES = {"逐个公式": False, "共享公式": True}
+
+
+def sheet_bytes(filename: str) -> int:
+    with zipfile.ZipFile(filename) as archive:
+        return sum(info.file_size for info in archive.infolist() if info.filename.startswith("xl/worksheets/"))
+
+
+def best_of(repeat: int, action) -> float:
+    timings: List[float] = []
+    for _ in range(repeat):
+        started = perf_counter()
+        action()
+        timings.append(perf_counter() - started)
+    return min(timings)
+
+
+def run(count: int, repeat: int, workdir: str) -> Dict[str, Dict]:
+    project = synthetic_project(count)
+    results = {}
+    for label, shared in CASES.items():
+        path = os.path.join(workdir, f"{count}-{label}.xlsx")
+        generate = best_of(
+            repeat, lambda: Quotation(project).generate(path, backend="xml", shared_formulas=shared)
+        )
+        load = best_of(repeat, lambda: load_workbook(path).close())
+        results[label] = {
+            "generate": generate,
+            "load": load,
+            "size": os.path.getsize(path),
+            "sheets": sheet_bytes(path),
+        }
+    return results
+
+
+def format_results(results: Dict[int, Dict[str, Dict]]) -> str:
+    headers = ["物资数量", "写法", "生成", "读取", "文件大小", "工作表XML"]
+    lines = []
+    for count, cases in results.items():
+        for label, result in cases.items():
+            lines.append(
+                [
+                    str(count),
+                    label,
+                    f"{result['generate']:.2f}s",
+                    f"{result['load']:.2f}s",
+                    f"{result['size'] / 1024:.0f}KB",
+                    f"{result['sheets'] / 1024:.0f}KB",
+                ]
+            )
+        old, new = cases["逐个公式"], cases["共享公式"]
+        lines.append(
+            [
+                "",
+                "变化",
+                f"{(new['generate'] / old['generate'] - 1) * 100:+.1f}%",
+                f"{(new['load'] / old['load'] - 1) * 100:+.1f}%",
+                f"{(new['size'] / old['size'] - 1) * 100:+.1f}%",
+                f"{(new['sheets'] / old['sheets'] - 1) * 100:+.1f}%",
+            ]
+        )
+    widths = [max(len(str(row[i])) for row in [headers, *lines]) for i in range(len(headers))]
+    rows = [headers, ["-" * width for width in widths], *lines]
+    return "\n".join("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="共享公式的文件大小和耗时基准")
+    parser.add_argument("-n", "--items", type=int, nargs="+", default=[1000, 5000], help="合成物资数量")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数，取最短耗时")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = {count: run(count, args.repeat, workdir) for count in args.items}
+    print(format_results(results))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,120 @@
+"""样式写入基准：对比按名称写入预先登记的样式编号与逐个属性赋值两种方式。
+
+用项目模板文档生成指定数量的合成物资，分别计时报价表（两种后端）和目录的生成，
+并统计写出文件中的样式表大小。
+
+    python benchmarks/style_registry.py -n 1000 --repeat 3
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import content  # noqa: E402
+import quotation  # noqa: E402
+from project import Commodity, Project  # noqa: E402
+from styles import StyleRegistry  # noqa: E402
+
+TEMPLATE = os.path.join(ROOT, "project-[项目名称务].docx")
+
+
+class AttributeRegistry(StyleRegistry):
+    """对照组：登记方式不变，但写入时逐个给单元格的 font/alignment 等属性赋值。"""
+
+    def stamp(self, cell, name: str) -> None:
+        for key, value in self._definitions[name].items():
+            setattr(cell, key, value)
+
+    def apply(self, cell, **parts) -> None:
+        for key, value in parts.items():
+            if value is not None:
+                setattr(cell, key, value)
+
+
+@contextmanager
+def registry(cls):
+    saved = quotation.StyleRegistry, content.StyleRegistry
+    quotation.StyleRegistry = content.StyleRegistry = cls
+    try:
+        yield
+    finally:
+        quotation.StyleRegistry, content.StyleRegistry = saved
+
+
+def synthetic_project(count: int) -> Project:
+    project = Project(TEMPLATE, parser="xml")
+    project.commodities = {
+        i: Commodity.from_row(
+            [f"物资{i}", "8702401090", "台", str(i % 7 + 1), "规格参数\n" * (i % 5) + "型号", "GB/T 1", str(i)]
+        )
+        for i in range(1, count + 1)
+    }
+    return project
+
+
+def style_tables(filename: str) -> Dict[str, int]:
+    with zipfile.ZipFile(filename) as archive:
+        styles = archive.read("xl/styles.xml").decode("utf-8")
+    counts = {}
+    for tag in ("fonts", "borders", "fills", "numFmts", "cellXfs"):
+        match = re.search(rf'<{tag} count="(\d+)"', styles)
+        counts[tag] = int(match.group(1)) if match else 0
+    return counts
+
+
+def run(project: Project, repeat: int, workdir: str) -> Dict[str, Dict]:
+    cases = {
+        "报价表(openpyxl)": lambda path: quotation.Quotation(project).generate(path, backend="openpyxl"),
+        "报价表(write_only)": lambda path: quotation.Quotation(project).generate(path, backend="write_only"),
+        "目录": lambda path: content.Content(project).generate_content(path),
+    }
+    results = {}
+    for label, build in cases.items():
+        path = os.path.join(workdir, f"{label}.xlsx")
+        timings: List[float] = []
+        for _ in range(repeat):
+            started = perf_counter()
+            build(path)
+            timings.append(perf_counter() - started)
+        results[label] = {"seconds": min(timings), "styles": style_tables(path)}
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="样式表写入方式基准")
+    parser.add_argument("-n", "--items", type=int, default=1000, help="合成物资数量")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数，取最短耗时")
+    args = parser.parse_args(argv)
+
+    project = synthetic_project(args.items)
+    with tempfile.TemporaryDirectory() as workdir:
+        with registry(AttributeRegistry):
+            before = run(project, args.repeat, workdir)
+        after = run(project, args.repeat, workdir)
+
+    print(f"物资数量：{args.items}")
+    print(f"{'场景':<20}{'逐个赋值':>10}{'样式编号':>10}{'加速':>8}  样式表(fonts/borders/cellXfs)")
+    for label in after:
+        old, new = before[label], after[label]
+        tables = "/".join(str(new["styles"][tag]) for tag in ("fonts", "borders", "cellXfs"))
+        if old["styles"] != new["styles"]:
+            tables += f"（逐个赋值：{'/'.join(str(old['styles'][tag]) for tag in ('fonts', 'borders', 'cellXfs'))}）"
+        print(
+            f"{label:<20}{old['seconds']:>9.2f}s{new['seconds']:>9.2f}s"
+            f"{old['seconds'] / new['seconds']:>7.2f}x  {tables}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,137 @@
+"""按项目模板文档合成指定物资数量的 project*.docx，供基准测试使用。
+
+基本信息表沿用模板，按参数改写项目名称、对外货值、技术服务和来华培训开关、主要标的；供货清单以模板中的
+第一行物资为样式原型，生成随机的多行规格参数。
+
+    python benchmarks/synthetic.py -n 1000 --tech --cc -o project-synthetic.docx
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import os
+import random
+from typing import Optional
+
+from docx import Document
+from docx.oxml.ns import qn
+from docx.table import _Row
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE = os.path.join(ROOT, "project-[项目名称务].docx")
+
+NAMES = ["公交车", "充电桩", "发电机组", "变压器", "水泵", "空调", "办公桌", "计算机", "打印机", "医用监护仪"]
+UNITS = ["台", "套", "辆", "个", "批"]
+SPEC_LINES = [
+    "额定功率：{}kW",
+    "输入电压：{}V",
+    "外形尺寸：{}×{}×{}mm",
+    "防护等级：IP{}",
+    "工作温度：-{}℃～{}℃",
+    "质保期：{}个月",
+    "整机重量：约{}kg",
+]
+INFO_ROWS = {  # 基本信息表中需要改写的行（第二列）
+    "name": 0,
+    "totalsum": 6,
+    "tech": 9,
+    "tech_people": 10,
+    "tech_days": 11,
+    "cc": 13,
+    "cc_people": 14,
+    "cc_days": 15,
+    "main_items": 17,
+}
+
+
+def _set_text(cell, text: str) -> None:
+    """改写单元格文字并保留第一段的段落和字体格式，多行文字写成多个段落。"""
+    paragraphs = cell.paragraphs
+    first = paragraphs[0]
+    for extra in paragraphs[1:]:
+        extra._p.getparent().remove(extra._p)
+    runs = first.runs
+    for run in runs[1:]:
+        run._r.getparent().remove(run._r)
+    lines = text.split("\n")
+    if runs:
+        runs[0].text = lines[0]
+    else:
+        first.add_run(lines[0])
+    anchor = first._p
+    for line in lines[1:]:
+        paragraph = copy.deepcopy(first._p)
+        anchor.addnext(paragraph)
+        anchor = paragraph
+        for t in paragraph.iter(qn("w:t")):
+            t.text = line
+
+
+def _spec(rng: random.Random) -> str:
+    lines = rng.sample(SPEC_LINES, rng.randint(1, len(SPEC_LINES)))
+    return "\n".join(line.format(*(rng.randint(1, 999) for _ in range(line.count("{}")))) for line in lines)
+
+
+def write_project_doc(
+    filename: str,
+    count: int,
+    *,
+    tech: bool = False,
+    cc: bool = False,
+    seed: int = 0,
+    template: str = TEMPLATE,
+) -> str:
+    """合成 count 项物资的项目文档，tech、cc 分别为是否有技术服务和来华培训。"""
+    rng = random.Random(seed)
+    document = Document(template)
+    info, items = document.tables[0], document.tables[1]
+
+    def info_cell(key: str, value) -> None:
+        _set_text(info.rows[INFO_ROWS[key]].cells[1], str(value))
+
+    info_cell("name", f"合成基准项目（{count}项物资）")
+    info_cell("totalsum", count * 50000)
+    info_cell("tech", "y" if tech else "n")
+    info_cell("tech_people", 3 if tech else "")
+    info_cell("tech_days", 12 if tech else "")
+    info_cell("cc", "y" if cc else "n")
+    info_cell("cc_people", 10 if cc else "")
+    info_cell("cc_days", 14 if cc else "")
+    info_cell("main_items", " ".join(str(index) for index in range(1, min(count, 3) + 1)))
+
+    prototype = copy.deepcopy(items.rows[1]._tr)
+    for row in list(items.rows)[1:]:
+        row._tr.getparent().remove(row._tr)
+    for index in range(1, count + 1):
+        tr = copy.deepcopy(prototype)
+        items._tbl.append(tr)
+        cells = _Row(tr, items).cells
+        values = [
+            str(index),
+            f"{rng.choice(NAMES)}{index}",
+            f"{rng.randint(10000000, 99999999)}{rng.randint(10, 99)}",
+            rng.choice(UNITS),
+            str(rng.randint(1, 50)),
+            _spec(rng),
+            f"GB/T {rng.randint(1000, 50000)}-{rng.randint(2000, 2025)}",
+        ]
+        for cell, value in zip(cells, values):
+            _set_text(cell, value)
+    document.save(filename)
+    return filename
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="合成指定物资数量的项目文档")
+    parser.add_argument("-n", "--items", type=int, default=100, help="物资数量")
+    parser.add_argument("--tech", action="store_true", help="有技术服务")
+    parser.add_argument("--cc", action="store_true", help="有来华培训")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("-o", "--output", default="project-synthetic.docx", help="输出文件")
+    args = parser.parse_args(argv)
+    print(f"<<< 已生成：{write_project_doc(args.output, args.items, tech=args.tech, cc=args.cc, seed=args.seed)} >>>")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
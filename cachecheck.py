@@ -0,0 +1,145 @@
+"""报价表公式缓存值的检查：拆分前确认公式单元格都有缓存值，且缓存值是按当前的输入算出的。
+
+openpyxl 生成的报价表只写公式、不写缓存值，直接拆分只会得到空白；重算之后又改过单价等输入、
+却没有再次重算时，缓存值已经过期。检查逐块读取 zip 中的工作表 XML，不经过 openpyxl：
+
+- 缺少缓存值：公式单元格没有 <v>，或 <v> 为空而结果又不是字符串
+- 输入已变化：所有非公式单元格的内容计算一个哈希，重算后由 record_calculation 写入报价表旁的
+  .<文件名>.calc.json；之后检查时哈希不同，说明上次重算以后输入被改过
+
+    report = check_cache("投标报价表-xxx.xlsx")
+    if not report.ok:
+        print(report.summary())
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from openpyxl.utils.cell import column_index_from_string, get_column_letter
+
+from xlsxpackage import PackageSplitter
+
+# 行的开始标签，或一个单元格；按顺序扫描以便在 r 属性省略时推算位置
+_ROW_OR_CELL = re.compile(r"<row\b([^>]*?)/?>|<c\b([^>]*?)(?:/>|>(.*?)</c>)", re.DOTALL)
+_REFERENCE = re.compile(r'\sr="([A-Z]+)?(\d+)?"')
+_TYPE = re.compile(r'\st="([^"]*)"')
+_VALUE = re.compile(r"<v>(.*?)</v>", re.DOTALL)
+_INLINE = re.compile(r"<is>(.*?)</is>", re.DOTALL)
+_STRING_ITEM = re.compile(r"<si>(.*?)</si>", re.DOTALL)
+CALC_VERSION = 1
+
+
+class StaleCacheError(RuntimeError):
+    """报价表的公式缓存值缺失或已过期，拆分结果会是空白或旧的数值。"""
+
+
+@dataclass
+class CacheReport:
+    filename: str
+    formulas: int = 0  # 公式单元格数
+    missing: List[str] = field(default_factory=list)  # 缺少缓存值的公式单元格，如 "1.投标报价总表!C4"
+    inputs: str = ""  # 当前非公式单元格内容的哈希
+    recorded: Optional[str] = None  # 上次重算时记录的哈希，没有记录时为 None
+
+    @property
+    def inputs_changed(self) -> bool:
+        return self.recorded is not None and self.recorded != self.inputs
+
+    @property
+    def ok(self) -> bool:
+        return not self.missing and not self.inputs_changed
+
+    def summary(self, limit: int = 5) -> str:
+        problems = []
+        if self.missing:
+            shown = "、".join(self.missing[:limit]) + ("等" if len(self.missing) > limit else "")
+            problems.append(f"{len(self.missing)}/{self.formulas} 个公式没有缓存值（{shown}）")
+        if self.inputs_changed:
+            problems.append("上次重算之后输入单元格有改动，缓存值已过期")
+        if not problems:
+            return f"{os.path.basename(self.filename)} 的 {self.formulas} 个公式缓存值完整"
+        return f"{os.path.basename(self.filename)}：" + "；".join(problems)
+
+
+def _calc_path(filename: str) -> str:
+    folder, name = os.path.split(os.path.abspath(filename))
+    return os.path.join(folder, f".{name}.calc.json")
+
+
+def _recorded_inputs(filename: str) -> Optional[str]:
+    try:
+        with open(_calc_path(filename), encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data.get("inputs") if data.get("version") == CALC_VERSION else None
+
+
+def check_cache(filename: str) -> CacheReport:
+    """检查 filename 中所有公式的缓存值，并与上次重算时记录的输入哈希比较。"""
+    report = CacheReport(filename, recorded=_recorded_inputs(filename))
+    digest = hashlib.sha256()
+    with PackageSplitter(filename) as package:
+        for name, part in package.sheets.items():
+            digest.update(f"\0{name}\0".encode("utf-8"))
+            row = column = 0  # 当前单元格的位置；OOXML 允许省略 <row> 和 <c> 的 r 属性，此时按顺序递增
+            for chunk in package.sheet_xml(part):
+                lines = []
+                for match in _ROW_OR_CELL.finditer(chunk):
+                    if match.group(2) is None:
+                        reference = _REFERENCE.search(match.group(1))
+                        row = int(reference.group(2)) if reference and reference.group(2) else row + 1
+                        column = 0
+                        continue
+                    attributes, inner = match.group(2), match.group(3) or ""
+                    reference = _REFERENCE.search(attributes)
+                    if reference and reference.group(1):
+                        column = column_index_from_string(reference.group(1))
+                        row = int(reference.group(2)) if reference.group(2) else row
+                    else:
+                        column += 1
+                    ref = f"{get_column_letter(column)}{row}"
+                    kind = _TYPE.search(attributes)
+                    kind = kind.group(1) if kind else "n"
+                    if "<f" in inner:
+                        report.formulas += 1
+                        value = _VALUE.search(inner)
+                        if value is None or (not value.group(1) and kind != "str"):
+                            report.missing.append(f"{name}!{ref}")
+                        continue
+                    if kind == "inlineStr":
+                        text = _INLINE.search(inner)
+                        text = text.group(1) if text else ""
+                        kind = "s"  # 内联字符串与共享字符串按文本比较，重新保存时两者可能互换
+                    else:
+                        value = _VALUE.search(inner)
+                        if value is None:
+                            continue  # 只有样式的空单元格
+                        text = value.group(1)
+                        if kind == "s":
+                            item = _STRING_ITEM.fullmatch(package.strings[int(text)])
+                            text = item.group(1) if item else ""  # <si/> 为空字符串
+                    lines.append(f"{ref}\0{kind}\0{text}\n")
+                digest.update("".join(lines).encode("utf-8"))
+    report.inputs = digest.hexdigest()
+    return report
+
+
+def record_calculation(filename: str, report: Optional[CacheReport] = None) -> None:
+    """重算完成后记录当前输入的哈希；report 为已经对该文件做过的检查结果时不再重复读取。"""
+    inputs = (report or check_cache(filename)).inputs
+    path = _calc_path(filename)
+    temp_path = f"{path}.tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CALC_VERSION, "inputs": inputs}, f)
+        os.replace(temp_path, path)
+    except OSError:
+        pass  # 记录写入失败时只是无法发现之后的输入改动
+    if report is not None:
+        report.recorded = inputs
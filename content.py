@@ -2,6 +2,8 @@
 from openpyxl.styles import Border, Side, Alignment, Font
 from openpyxl.worksheet.page import PageMargins
 
+from styles import StyleRegistry
+
 
 class Content:
     """
@@ -24,6 +26,8 @@ class Content:
     )
     ctr_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
     left_alignment = Alignment(horizontal='left', vertical='center', wrap_text=True, indent=1)
+    right_alignment = Alignment(horizontal='right', vertical='center', wrap_text=True)
+    plain_alignment = Alignment(vertical='center', wrap_text=True)
     margin = PageMargins(left=0.75, right=0.75, top=1.0, bottom=1.0, header=0.5, footer=0.5)
     cn_numbers = [
         '一', '二', '三', '四', '五', '六', '七', '八', '九', '十',
@@ -33,6 +37,18 @@ class Content:
     def __init__(self, project) -> None:
         self.project = project
 
+        # 目录行的样式组合，按名称整体写入单元格
+        self.styles = StyleRegistry()
+        self.styles.define('border', border=self.normal_border)
+        self.styles.define('section', font=self.header_font, alignment=self.ctr_alignment, border=self.normal_border)
+        self.styles.define('page', alignment=self.ctr_alignment, border=self.normal_border)
+        self.styles.define('entry-no', font=self.normal_font, alignment=self.ctr_alignment, border=self.normal_border)
+        self.styles.define('entry', font=self.normal_font, alignment=self.plain_alignment, border=self.normal_border)
+        self.styles.define('sub-no', font=self.sub_font, alignment=self.right_alignment, border=self.normal_border)
+        self.styles.define('sub', font=self.sub_font, alignment=self.plain_alignment, border=self.normal_border)
+        self.styles.define('plain', font=self.normal_font, alignment=self.left_alignment, border=self.normal_border)
+        self.styles.define('plain-sub', font=self.sub_font, alignment=self.left_alignment, border=self.normal_border)
+
     @staticmethod
     def _safe_name(name: str) -> str:
         invalid = '<>:"/\\|?*'
@@ -65,7 +81,7 @@ class Content:
         seq = sorted(self.project.commodities.keys())
         for index in seq:
             item = self.project.commodities[index]
-            rows.append(('sub', item[-1], item[0]))
+            rows.append(('sub', item.no, item.name))
 
         tech_items = [
             '质量保证声明',
@@ -142,41 +158,27 @@ class Content:
             if kind == 'section':
                 ws.merge_cells(f'A{row}:B{row}')
                 ws[f'A{row}'] = item[1]
-                ws[f'A{row}'].font = self.header_font
-                ws[f'A{row}'].alignment = self.ctr_alignment
-                ws[f'A{row}'].border = self.normal_border
-                ws[f'C{row}'].border = self.normal_border
+                self.styles.stamp(ws[f'A{row}'], 'section')
+                self.styles.stamp(ws[f'C{row}'], 'border')
             elif kind == 'entry':
                 ws[f'A{row}'] = item[1]
                 ws[f'B{row}'] = item[2]
-                ws[f'A{row}'].font = self.normal_font
-                ws[f'A{row}'].alignment = self.ctr_alignment
-                ws[f'B{row}'].font = self.normal_font
-                ws[f'B{row}'].alignment = Alignment(vertical='center', wrap_text=True)
-                ws[f'C{row}'].alignment = self.ctr_alignment
-                for col in ('A', 'B', 'C'):
-                    ws[f'{col}{row}'].border = self.normal_border
+                self.styles.stamp(ws[f'A{row}'], 'entry-no')
+                self.styles.stamp(ws[f'B{row}'], 'entry')
+                self.styles.stamp(ws[f'C{row}'], 'page')
             elif kind == 'sub':
                 ws[f'A{row}'] = item[1]
                 ws[f'B{row}'] = item[2]
-                ws[f'A{row}'].font = self.sub_font
-                ws[f'A{row}'].alignment = Alignment(horizontal='right', vertical='center', wrap_text=True)
-                ws[f'B{row}'].font = self.sub_font
-                ws[f'B{row}'].alignment = Alignment(vertical='center', wrap_text=True)
-                ws[f'C{row}'].alignment = self.ctr_alignment
+                self.styles.stamp(ws[f'A{row}'], 'sub-no')
+                self.styles.stamp(ws[f'B{row}'], 'sub')
+                self.styles.stamp(ws[f'C{row}'], 'page')
                 ws.row_dimensions[row].height = 20.1
-                for col in ('A', 'B', 'C'):
-                    ws[f'{col}{row}'].border = self.normal_border
             else:
                 ws[f'A{row}'] = item[1]
                 ws[f'B{row}'] = item[2]
-                ws[f'A{row}'].font = self.normal_font
-                ws[f'A{row}'].alignment = self.ctr_alignment
-                ws[f'B{row}'].font = self.sub_font if item[1] == '' else self.normal_font
-                ws[f'B{row}'].alignment = self.left_alignment
-                ws[f'C{row}'].alignment = self.ctr_alignment
-                for col in ('A', 'B', 'C'):
-                    ws[f'{col}{row}'].border = self.normal_border
+                self.styles.stamp(ws[f'A{row}'], 'entry-no')
+                self.styles.stamp(ws[f'B{row}'], 'plain-sub' if item[1] == '' else 'plain')
+                self.styles.stamp(ws[f'C{row}'], 'page')
 
             row += 1
 
@@ -223,8 +225,8 @@ class Content:
             ws2[f'C{r}'].font = self.normal_font
             ws2[f'A{r}'].alignment = self.ctr_alignment
             ws2[f'C{r}'].alignment = self.ctr_alignment
-            ws2[f'B{r}'].font = Font(name='仿宋_GB2312', size=font_size)
-            ws2[f'B{r}'].alignment = self.left_alignment if font_size == 12 else Alignment(vertical='center', wrap_text=True)
+            ws2[f'B{r}'].font = self.sub_font if font_size == 12 else self.normal_font
+            ws2[f'B{r}'].alignment = self.left_alignment if font_size == 12 else self.plain_alignment
             ws2.row_dimensions[r].height = 45
             for col in ('A', 'B', 'C'):
                 ws2[f'{col}{r}'].border = self.normal_border
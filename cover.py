@@ -41,9 +41,9 @@ class Cover:
         run_now.font.size = Pt(size)
         return para_now
 
-    def generate(self):
+    def generate(self, filename=None):
         """
-        生成封面
+        生成封面,filename为输出文件名,默认为 封面-<项目名>.docx
         """
         for part in self.parts:
             for section in self.sections_1:                
@@ -71,7 +71,10 @@ class Cover:
             if not last:
                 self.doc.add_page_break()
 
-        self.doc.save('封面-{}.docx'.format(self.name))
+        if not filename:
+            filename = '封面-{}.docx'.format(self.name)
+        self.doc.save(filename)
+        return filename
 
         
                 
@@ -0,0 +1,152 @@
+"""报价表公式依赖分析：建立跨工作表的单元格引用关系，列出循环引用和被大量公式引用的单元格。
+
+    python dependencies.py 投标报价表-xxx.xlsx --top 15
+"""
+from __future__ import annotations
+
+import argparse
+from bisect import bisect_left, bisect_right
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+
+from formula import Cell, Evaluator, FormulaError
+from quotation import Quotation
+
+
+@dataclass
+class DependencyReport:
+    formulas: int  # 公式单元格个数
+    references: int  # 直接引用的条数，区域按其中的非空单元格计
+    dynamic: int  # 含 INDIRECT、OFFSET 等动态引用的公式个数，这些引用在静态分析中看不到
+    iterate: bool  # 工作簿是否开启了迭代计算
+    cycles: List[List[Cell]]  # 每个循环引用的一条路径，首尾为同一单元格
+    cycle_sizes: List[int]  # 各循环引用所在强连通分量的单元格个数
+    dependents: Counter  # 单元格 -> 直接引用它的公式个数
+    precedents: Counter  # 公式单元格 -> 直接引用的单元格个数
+
+
+def analyze(evaluator: Evaluator) -> DependencyReport:
+    """分析 evaluator 中全部公式的引用关系。"""
+    occupied: Dict[str, Dict[int, List[int]]] = {}  # 各表各列的非空单元格行号
+    for sheet, cells in evaluator.sheets.items():
+        columns = occupied[sheet] = {}
+        for row, col in cells:
+            columns.setdefault(col, []).append(row)
+        for rows in columns.values():
+            rows.sort()
+
+    dependents: Counter = Counter()
+    precedents: Counter = Counter()
+    ranges: Counter = Counter()
+    range_cells: Dict[Tuple, List[Cell]] = {}
+    dynamic = 0
+    for key in evaluator.formula_cells:
+        sheet, row, col = key
+        if Quotation.VOLATILE_PATTERN.search(str(evaluator.sheets[sheet][(row, col)])):
+            dynamic += 1
+        for ref in evaluator.precedents(key):
+            if ref.is_cell:
+                dependents[(ref.sheet, ref.min_row, ref.min_col)] += 1
+                precedents[key] += 1
+                continue
+            range_key = ref.key()
+            if range_key not in range_cells:
+                members = []
+                for column, rows in occupied.get(ref.sheet, {}).items():
+                    if ref.min_col <= column <= ref.max_col:
+                        members.extend(
+                            (ref.sheet, member, column)
+                            for member in rows[bisect_left(rows, ref.min_row):bisect_right(rows, ref.max_row)]
+                        )
+                range_cells[range_key] = members
+            ranges[range_key] += 1
+            precedents[key] += len(range_cells[range_key])
+    for range_key, count in ranges.items():  # 同一区域只展开一次
+        for member in range_cells[range_key]:
+            dependents[member] += count
+
+    cycles, sizes = [], []
+    for component, cyclic in evaluator.components():
+        if cyclic:
+            cycles.append(cycle_path(evaluator, component))
+            sizes.append(len(component))
+    return DependencyReport(
+        formulas=len(evaluator.formula_cells),
+        references=sum(precedents.values()),
+        dynamic=dynamic,
+        iterate=evaluator.iterate,
+        cycles=cycles,
+        cycle_sizes=sizes,
+        dependents=dependents,
+        precedents=precedents,
+    )
+
+
+def cycle_path(evaluator: Evaluator, component: List[Cell]) -> List[Cell]:
+    """在强连通分量内找一条经过其中第一个单元格的最短循环，前一个单元格引用后一个。"""
+    members = set(component)
+    start = component[0]
+    parents: Dict[Cell, Optional[Cell]] = {start: None}
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        for successor in evaluator.formula_precedents(node):
+            if successor == start:
+                path = [start]
+                while node is not None:
+                    path.append(node)
+                    node = parents[node]
+                return path[::-1]
+            if successor in members and successor not in parents:
+                parents[successor] = node
+                queue.append(successor)
+    return [start, start]
+
+
+def cell_name(cell: Cell) -> str:
+    sheet, row, col = cell
+    return f"'{sheet}'!{get_column_letter(col)}{row}"
+
+
+def format_report(report: DependencyReport, top: int = 10) -> str:
+    lines = [
+        f"公式 {report.formulas} 个，直接引用 {report.references} 条，含动态引用的公式 {report.dynamic} 个",
+        f"迭代计算：{'开启' if report.iterate else '关闭'}，循环引用 {len(report.cycles)} 处",
+    ]
+    for path, size in zip(report.cycles, report.cycle_sizes):
+        lines.append(f"  循环（所在分量 {size} 个单元格）：" + " -> ".join(cell_name(cell) for cell in path))
+    if report.cycles:
+        lines.append('  可用 Quotation.generate(tax_mode="closed") 生成没有循环引用的报价表，并关闭迭代计算')
+    lines.append(f"被引用最多的单元格（前 {top} 个）：")
+    lines.extend(f"  {cell_name(cell)}  {count}" for cell, count in report.dependents.most_common(top))
+    lines.append(f"引用单元格最多的公式（前 {top} 个）：")
+    lines.extend(f"  {cell_name(cell)}  {count}" for cell, count in report.precedents.most_common(top))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="报价表公式依赖分析：列出循环引用和被大量公式引用的单元格。")
+    parser.add_argument("workbook", help="要分析的报价表")
+    parser.add_argument("--top", type=int, default=10, help="列出引用最多的前几个单元格")
+    args = parser.parse_args(argv)
+
+    try:
+        workbook = load_workbook(args.workbook, read_only=True)
+        try:
+            evaluator = Evaluator.from_workbook(workbook)
+        finally:
+            workbook.close()
+    except (OSError, FormulaError) as exc:
+        print(f"<<< 无法读取报价表：{exc} >>>")
+        return 1
+    report = analyze(evaluator)
+    print(format_report(report, args.top))
+    return 1 if report.cycles and not report.iterate else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
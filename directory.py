@@ -7,17 +7,17 @@ class Directory(object):
     通过读取project类来创建项目空白本目录结构
     """
 
-    def __init__(self, project) -> None:
+    def __init__(self, project, root=None) -> None:
         self.project = project
         self.name = project.name        
-        self.root = os.path.abspath('')
+        self.root = os.path.abspath(root or '')  # 目录结构创建在 root 下，默认为当前目录
         
         self.goods = []
         seq = list(self.project.commodities.keys())
         seq.sort()
         for i in seq:
-            index_now = self.project.commodities[i][-1]
-            itemname_now = '-'.join(self.project.commodities[i][0].split('\n'))
+            index_now = self.project.commodities[i].no
+            itemname_now = '-'.join(self.project.commodities[i].name.split('\n'))
             self.goods.append('.'.join([index_now, itemname_now]))
         
 
@@ -44,24 +44,24 @@ class Directory(object):
         for i in ['.舆情应对方案', '.风险防范化解方案', '.物资中主要标的的生产企业三体系资料', '.其它说明和资料']:
             level_3.append(i)
 
-        path_0 = '\\'.join([self.root, '投标文件-{}'.format(self.name)])  # 确定根目录路径
-        path_1 = '\\'.join([path_0, level_1[0]])
-        path_2 = '\\'.join([path_1, level_2[1]])
-        path_3 = '\\'.join([path_2, '3.物资投标响应相关文件'])
+        path_0 = os.path.join(self.root, '投标文件-{}'.format(self.name))  # 确定根目录路径
+        path_1 = os.path.join(path_0, level_1[0])
+        path_2 = os.path.join(path_1, level_2[1])
+        path_3 = os.path.join(path_2, '3.物资投标响应相关文件')
 
         for dirnow in level_1:  # 创建根目录及一级目录
-            os.makedirs('\\'.join([path_0, dirnow]))
+            os.makedirs(os.path.join(path_0, dirnow))
 
         for dirnow in level_2:  # 创建二级目录
-            os.mkdir('\\'.join([path_1, dirnow]))
+            os.mkdir(os.path.join(path_1, dirnow))
 
         for i in range(len(level_3)): # 创建三级目录
             dirnow = ''.join([str(i + 1), level_3[i]])
-            pathnow = '\\'.join([path_2, dirnow])
+            pathnow = os.path.join(path_2, dirnow)
             os.mkdir(pathnow)
 
         for dirnow in self.goods:  # 写入物资名文件夹
-            pathnow = '\\'.join([path_3, dirnow])
+            pathnow = os.path.join(path_3, dirnow)
             os.mkdir(pathnow)
 
         
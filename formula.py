@@ -0,0 +1,790 @@
+from __future__ import annotations
+
+import os
+import re
+import shutil
+import zipfile
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from openpyxl import load_workbook
+from openpyxl.formula import Tokenizer
+from openpyxl.formula.tokenizer import Token
+from openpyxl.utils.cell import range_boundaries
+from openpyxl.utils.datetime import to_excel
+
+Cell = Tuple[str, int, int]  # (工作表名, 行号, 列号)
+
+
+class FormulaError(ValueError):
+    """公式中出现了计算器不支持的语法或函数。"""
+
+
+class ExcelError:
+    """公式的错误结果，例如 #N/A、#VALUE!。"""
+
+    __slots__ = ("code",)
+
+    def __init__(self, code: str) -> None:
+        self.code = code
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ExcelError) and other.code == self.code
+
+    def __hash__(self) -> int:
+        return hash(self.code)
+
+    def __repr__(self) -> str:
+        return self.code
+
+
+NA = ExcelError("#N/A")
+VALUE = ExcelError("#VALUE!")
+REF = ExcelError("#REF!")
+DIV0 = ExcelError("#DIV/0!")
+NUM = ExcelError("#NUM!")
+
+
+class _Raised(Exception):
+    """计算过程中遇到错误值时沿调用链向上传递，在单元格一级转换为错误结果。"""
+
+    def __init__(self, error: ExcelError) -> None:
+        super().__init__(error.code)
+        self.error = error
+
+
+class Ref:
+    """单元格或矩形区域引用。"""
+
+    __slots__ = ("sheet", "min_row", "min_col", "max_row", "max_col")
+
+    def __init__(self, sheet: str, min_row: int, min_col: int, max_row: int, max_col: int) -> None:
+        self.sheet = sheet
+        self.min_row = min_row
+        self.min_col = min_col
+        self.max_row = max_row
+        self.max_col = max_col
+
+    @property
+    def is_cell(self) -> bool:
+        return self.min_row == self.max_row and self.min_col == self.max_col
+
+    def cells(self) -> Iterator[Tuple[int, int]]:
+        for row in range(self.min_row, self.max_row + 1):
+            for col in range(self.min_col, self.max_col + 1):
+                yield row, col
+
+    def key(self) -> Tuple:
+        return self.sheet, self.min_row, self.min_col, self.max_row, self.max_col
+
+
+def parse_ref(text: str, sheet: str) -> Ref:
+    """解析 A1、$A$1:B2、Sheet!A1、'带空格的表名'!A1 形式的引用，未写表名时使用 sheet。"""
+    if "!" in text:
+        sheet, text = text.rsplit("!", 1)
+        if sheet.startswith("'") and sheet.endswith("'"):
+            sheet = sheet[1:-1].replace("''", "'")
+    try:
+        min_col, min_row, max_col, max_row = range_boundaries(text.replace("$", ""))
+    except ValueError:
+        raise FormulaError(f"不支持的引用：{text}") from None
+    if None in (min_col, min_row, max_col, max_row):
+        raise FormulaError(f"不支持整行或整列引用：{text}")
+    return Ref(sheet, min_row, min_col, max_row, max_col)
+
+
+# ---- 数据类型转换，规则与 Excel 一致 ----
+
+def _check(value):
+    if isinstance(value, ExcelError):
+        raise _Raised(value)
+    return value
+
+
+def _number(value) -> float:
+    _check(value)
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str) and value.strip():
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    raise _Raised(VALUE)
+
+
+def _text(value) -> str:
+    _check(value)
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float):
+        if value.is_integer() and abs(value) < 1e15:
+            return str(int(value))
+        return f"{value:.15g}"
+    return str(value)
+
+
+def _boolean(value) -> bool:
+    _check(value)
+    if value is None:
+        return False
+    if isinstance(value, str):
+        if value.upper() in ("TRUE", "FALSE"):
+            return value.upper() == "TRUE"
+        raise _Raised(VALUE)
+    return bool(value)
+
+
+def _constant(value):
+    """把 openpyxl 读出的日期时间转换为 Excel 序列值，其他常量保持不变。"""
+    if isinstance(value, (datetime, date, time, timedelta)):
+        return to_excel(value)
+    return value
+
+
+def _type_rank(value) -> int:
+    if isinstance(value, bool):
+        return 2
+    if isinstance(value, str):
+        return 1
+    return 0
+
+
+def _compare(left, right) -> int:
+    _check(left)
+    _check(right)
+    if left is None:
+        left = "" if isinstance(right, str) else 0
+    if right is None:
+        right = "" if isinstance(left, str) else 0
+    rank_left, rank_right = _type_rank(left), _type_rank(right)
+    if rank_left != rank_right:
+        return -1 if rank_left < rank_right else 1
+    if isinstance(left, str):
+        left, right = left.lower(), right.lower()
+    return (left > right) - (left < right)
+
+
+def _round(value: float, digits: int):
+    quantum = Decimal(1).scaleb(-digits)
+    # 与 Excel 一样先按十五位有效数字取值，再四舍五入（远离零）
+    result = Decimal(f"{float(value):.15g}").quantize(quantum, rounding=ROUND_HALF_UP)
+    return float(result)
+
+
+# ---- 运算符 ----
+
+def _divide(left, right):
+    divisor = _number(right)
+    if divisor == 0:
+        raise _Raised(DIV0)
+    return _number(left) / divisor
+
+
+def _power(left, right):
+    try:
+        result = _number(left) ** _number(right)
+    except (OverflowError, ZeroDivisionError):
+        raise _Raised(NUM) from None
+    if isinstance(result, complex):
+        raise _Raised(NUM)
+    return result
+
+
+_INFIX = {
+    "+": (3, lambda a, b: _number(a) + _number(b)),
+    "-": (3, lambda a, b: _number(a) - _number(b)),
+    "*": (4, lambda a, b: _number(a) * _number(b)),
+    "/": (4, _divide),
+    "^": (5, _power),
+    "&": (2, lambda a, b: _text(a) + _text(b)),
+    "=": (1, lambda a, b: _compare(a, b) == 0),
+    "<>": (1, lambda a, b: _compare(a, b) != 0),
+    "<": (1, lambda a, b: _compare(a, b) < 0),
+    ">": (1, lambda a, b: _compare(a, b) > 0),
+    "<=": (1, lambda a, b: _compare(a, b) <= 0),
+    ">=": (1, lambda a, b: _compare(a, b) >= 0),
+}
+_PREFIX_PRECEDENCE = 6
+_ERRORS = {error.code: error for error in (NA, VALUE, REF, DIV0, NUM, ExcelError("#NAME?"), ExcelError("#NULL!"))}
+
+
+# ---- 工作表函数，参数为惰性求值的表达式 ----
+
+def _numbers(ev: "Evaluator", args, cell: Cell) -> Iterator[float]:
+    """SUM、PRODUCT 的参数：区域中只取数值，直接给出的参数按数值转换。"""
+    for arg in args:
+        value = arg(ev, cell)
+        if isinstance(value, Ref):
+            for row, col in value.cells():
+                item = _check(ev.cell_value(value.sheet, row, col))
+                if isinstance(item, (int, float)) and not isinstance(item, bool):
+                    yield item
+        else:
+            yield _number(value)
+
+
+def _fn_sum(ev, args, cell):
+    return sum(_numbers(ev, args, cell))
+
+
+def _fn_product(ev, args, cell):
+    result, found = 1, False
+    for value in _numbers(ev, args, cell):
+        result *= value
+        found = True
+    return result if found else 0
+
+
+def _fn_round(ev, args, cell):
+    if len(args) != 2:
+        raise FormulaError("ROUND 需要两个参数")
+    return _round(_number(ev.scalar(args[0], cell)), int(_number(ev.scalar(args[1], cell))))
+
+
+def _fn_if(ev, args, cell):
+    if not 1 <= len(args) <= 3:
+        raise FormulaError("IF 参数个数不正确")
+    if _boolean(ev.scalar(args[0], cell)):
+        return args[1](ev, cell) if len(args) > 1 else True
+    return args[2](ev, cell) if len(args) > 2 else False
+
+
+def _fn_index(ev, args, cell):
+    if not 2 <= len(args) <= 3:
+        raise FormulaError("INDEX 参数个数不正确")
+    ref = args[0](ev, cell)
+    if not isinstance(ref, Ref):
+        raise _Raised(VALUE)
+    first = int(_number(ev.scalar(args[1], cell)))
+    second = int(_number(ev.scalar(args[2], cell))) if len(args) == 3 else None
+    rows = ref.max_row - ref.min_row + 1
+    cols = ref.max_col - ref.min_col + 1
+    if second is None:
+        if rows == 1 and cols > 1:
+            row, col = 1, first  # 单行区域时唯一的序号表示列
+        elif cols == 1:
+            row, col = first, 1
+        else:
+            raise _Raised(REF)
+    else:
+        row, col = first, second
+    if not (1 <= row <= rows and 1 <= col <= cols):
+        raise _Raised(REF)
+    return Ref(ref.sheet, ref.min_row + row - 1, ref.min_col + col - 1, ref.min_row + row - 1, ref.min_col + col - 1)
+
+
+def _fn_match(ev, args, cell):
+    if not 2 <= len(args) <= 3:
+        raise FormulaError("MATCH 参数个数不正确")
+    lookup = _check(ev.scalar(args[0], cell))
+    ref = args[1](ev, cell)
+    if not isinstance(ref, Ref) or (ref.min_row != ref.max_row and ref.min_col != ref.max_col):
+        raise _Raised(NA)
+    match_type = int(_number(ev.scalar(args[2], cell))) if len(args) == 3 else 1
+    candidate = None
+    for position, (row, col) in enumerate(ref.cells(), start=1):
+        value = ev.cell_value(ref.sheet, row, col)
+        if value is None or isinstance(value, ExcelError) or _type_rank(value) != _type_rank(lookup):
+            continue
+        order = _compare(value, lookup)
+        if match_type == 0:
+            if order == 0:
+                return position
+        elif match_type > 0:
+            if order > 0:
+                break
+            candidate = position
+        else:
+            if order < 0:
+                break
+            candidate = position
+    if candidate is None:
+        raise _Raised(NA)
+    return candidate
+
+
+def _fn_indirect(ev, args, cell):
+    if len(args) not in (1, 2):
+        raise FormulaError("INDIRECT 参数个数不正确")
+    text = _text(ev.scalar(args[0], cell))
+    try:
+        ref = parse_ref(text, cell[0])
+    except FormulaError:
+        raise _Raised(REF) from None
+    if ref.sheet not in ev.sheets:
+        raise _Raised(REF)
+    return ref
+
+
+def _fn_row(ev, args, cell):
+    if not args:
+        return cell[1]
+    ref = args[0](ev, cell)
+    if not isinstance(ref, Ref):
+        raise _Raised(VALUE)
+    return ref.min_row
+
+
+def _fn_char(ev, args, cell):
+    code = int(_number(ev.scalar(args[0], cell)))
+    if not 1 <= code <= 255:
+        raise _Raised(VALUE)
+    return chr(code)
+
+
+FUNCTIONS: Dict[str, Callable] = {
+    "SUM": _fn_sum,
+    "PRODUCT": _fn_product,
+    "ROUND": _fn_round,
+    "IF": _fn_if,
+    "INDEX": _fn_index,
+    "MATCH": _fn_match,
+    "INDIRECT": _fn_indirect,
+    "ROW": _fn_row,
+    "CHAR": _fn_char,
+}
+
+
+# ---- 公式编译：openpyxl 分词后按运算符优先级生成闭包 ----
+
+class _Parser:
+    def __init__(self, formula: str, sheet: str) -> None:
+        self.formula = formula
+        self.sheet = sheet
+        self.tokens = [token for token in Tokenizer(formula).items if token.type != Token.WSPACE]
+        self.position = 0
+        self.refs: List[Ref] = []
+
+    def parse(self):
+        expression = self._expression(0)
+        if self.position != len(self.tokens):
+            raise FormulaError(f"无法解析公式：{self.formula}")
+        return expression
+
+    def _peek(self) -> Optional[Token]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _next(self) -> Token:
+        token = self._peek()
+        if token is None:
+            raise FormulaError(f"公式不完整：{self.formula}")
+        self.position += 1
+        return token
+
+    def _expression(self, min_precedence: int):
+        left = self._operand()
+        while True:
+            token = self._peek()
+            if token is None:
+                return left
+            if token.type == Token.OP_POST:  # 百分号
+                self.position += 1
+                left = (lambda inner: lambda ev, cell: _number(ev.scalar(inner, cell)) / 100)(left)
+                continue
+            if token.type != Token.OP_IN or token.value not in _INFIX:
+                return left
+            precedence, operate = _INFIX[token.value]
+            if precedence < min_precedence:
+                return left
+            self.position += 1
+            right = self._expression(precedence + 1)
+            left = (
+                lambda a, b, op: lambda ev, cell: op(ev.scalar(a, cell), ev.scalar(b, cell))
+            )(left, right, operate)
+
+    def _operand(self):
+        token = self._next()
+        if token.type == Token.OP_PRE:
+            inner = self._expression(_PREFIX_PRECEDENCE)
+            if token.value == "-":
+                return lambda ev, cell: -_number(ev.scalar(inner, cell))
+            return lambda ev, cell: _number(ev.scalar(inner, cell))
+        if token.type == Token.PAREN and token.subtype == Token.OPEN:
+            inner = self._expression(0)
+            closing = self._next()
+            if closing.type != Token.PAREN:
+                raise FormulaError(f"括号不匹配：{self.formula}")
+            return inner
+        if token.type == Token.FUNC and token.subtype == Token.OPEN:
+            return self._function(token.value[:-1].upper())
+        if token.type == Token.OPERAND:
+            return self._literal(token)
+        raise FormulaError(f"无法解析公式：{self.formula}")
+
+    def _function(self, name: str):
+        function = FUNCTIONS.get(name)
+        if function is None:
+            raise FormulaError(f"不支持的函数：{name}")
+        args = []
+        if self._peek() is not None and self._peek().type == Token.FUNC and self._peek().subtype == Token.CLOSE:
+            self.position += 1
+        else:
+            while True:
+                token = self._peek()
+                if token is not None and (token.type == Token.SEP or token.subtype == Token.CLOSE):
+                    args.append(lambda ev, cell: None)  # 省略的参数
+                else:
+                    args.append(self._expression(0))
+                token = self._next()
+                if token.type == Token.FUNC and token.subtype == Token.CLOSE:
+                    break
+                if token.type != Token.SEP or token.subtype != Token.ARG:
+                    raise FormulaError(f"无法解析公式：{self.formula}")
+        return lambda ev, cell: function(ev, args, cell)
+
+    def _literal(self, token: Token):
+        if token.subtype == Token.NUMBER:
+            number = float(token.value)
+            value = int(number) if number.is_integer() and "." not in token.value and "E" not in token.value.upper() else number
+            return lambda ev, cell: value
+        if token.subtype == Token.TEXT:
+            text = token.value[1:-1].replace('""', '"')
+            return lambda ev, cell: text
+        if token.subtype == Token.LOGICAL:
+            flag = token.value.upper() == "TRUE"
+            return lambda ev, cell: flag
+        if token.subtype == Token.ERROR:
+            error = _ERRORS.get(token.value.upper(), VALUE)
+            return lambda ev, cell: error
+        ref = parse_ref(token.value, self.sheet)
+        self.refs.append(ref)
+        return lambda ev, cell: ref
+
+
+def compile_formula(formula: str, sheet: str):
+    """编译公式，返回 (计算函数, 静态引用列表)；INDIRECT 产生的引用在计算时才能确定，不在列表中。"""
+    parser = _Parser(formula, sheet)
+    return parser.parse(), parser.refs
+
+
+# ---- 工作簿计算 ----
+
+class Evaluator:
+    """按依赖关系的拓扑顺序计算工作簿中的全部公式。
+
+    sheets 为 {工作表名: {(行, 列): 值}}，公式以 "=" 开头的字符串表示。循环引用所在的强连通分量在 iterate 为真时
+    按 Excel 的迭代计算规则反复计算，直到两次结果之差小于 iterate_delta 或达到 iterate_count 次；
+    否则结果记为 0，并记录在 cycles 中。
+    """
+
+    def __init__(
+        self,
+        sheets: Dict[str, Dict[Tuple[int, int], object]],
+        iterate: bool = False,
+        iterate_count: int = 100,
+        iterate_delta: float = 0.001,
+    ) -> None:
+        self.sheets = sheets
+        self.iterate = iterate
+        self.iterate_count = iterate_count
+        self.iterate_delta = iterate_delta
+        self.values: Dict[Cell, object] = {}
+        self.cycles: List[List[Cell]] = []
+        self._formulas: Dict[Cell, Callable] = {}
+        self._precedents: Dict[Cell, List[Ref]] = {}
+        self._columns: Dict[str, Dict[int, List[int]]] = {}  # 公式单元格按列索引的行号，用于查找区域内的公式
+        self._active: set = set()
+
+        for sheet, cells in sheets.items():
+            columns = self._columns[sheet] = {}
+            for (row, col), value in cells.items():
+                if isinstance(value, str) and value.startswith("="):
+                    key = (sheet, row, col)
+                    self._formulas[key], self._precedents[key] = compile_formula(value, sheet)
+                    columns.setdefault(col, []).append(row)
+            for rows in columns.values():
+                rows.sort()
+
+    @classmethod
+    def from_workbook(cls, workbook) -> "Evaluator":
+        """从 openpyxl 工作簿（普通或 read_only 模式）读取内容和迭代计算设置。"""
+        sheets = {}
+        for ws in workbook.worksheets:
+            cells = sheets[ws.title] = {}
+            for row in ws.iter_rows():
+                for cell in row:
+                    value = cell.value
+                    if value is None:
+                        continue
+                    if cell.data_type == "f" and not isinstance(value, str):
+                        raise FormulaError(f"不支持数组公式：{ws.title}!{cell.coordinate}")
+                    cells[(cell.row, cell.column)] = _constant(value)
+        calculation = workbook.calculation
+        return cls(
+            sheets,
+            iterate=bool(calculation.iterate),
+            iterate_count=calculation.iterateCount or 100,
+            iterate_delta=calculation.iterateDelta or 0.001,
+        )
+
+    @property
+    def formula_cells(self) -> List[Cell]:
+        return list(self._formulas)
+
+    def precedents(self, key: Cell) -> List[Ref]:
+        """公式中直接写出的引用（单元格或区域），INDIRECT 等动态引用不在其中。"""
+        return list(self._precedents[key])
+
+    def formula_precedents(self, key: Cell) -> List[Cell]:
+        """公式直接引用的公式单元格，区域展开为其中的公式单元格。"""
+        result = []
+        for node in self._successors(key):
+            result.extend(self._successors(node) if node[0] == "range" else [node])
+        return result
+
+    def components(self) -> List[Tuple[List[Cell], bool]]:
+        """公式单元格的强连通分量及其是否构成循环引用，按先计算被引用单元格的顺序排列。"""
+        return list(self._components())
+
+    def scalar(self, expression, cell: Cell):
+        value = expression(self, cell)
+        if isinstance(value, Ref):
+            return self._dereference(value, cell)
+        return value
+
+    def cell_value(self, sheet: str, row: int, col: int):
+        key = (sheet, row, col)
+        if key in self._formulas:
+            if key not in self.values:
+                self._evaluate_on_demand(key)
+            return self.values[key]
+        cells = self.sheets.get(sheet)
+        if cells is None:
+            raise _Raised(REF)
+        return cells.get((row, col))
+
+    def evaluate(self) -> Dict[Cell, object]:
+        """计算全部公式。values 中已有的结果（按需计算过的或预先给定的）不再重复计算。"""
+        for component, cyclic in self._components():
+            if all(key in self.values for key in component):
+                continue
+            if not cyclic:
+                self._store(component[0])
+            elif self.iterate:
+                self._iterate(component)
+            else:
+                for key in component:
+                    self.values[key] = 0
+                self.cycles.append(component)
+        return self.values
+
+    def _dereference(self, ref: Ref, cell: Cell):
+        if ref.is_cell:
+            return self.cell_value(ref.sheet, ref.min_row, ref.min_col)
+        # 区域用在需要单个值的地方时取与公式所在行（或列）相交的单元格
+        if ref.min_col == ref.max_col and ref.min_row <= cell[1] <= ref.max_row and ref.sheet == cell[0]:
+            return self.cell_value(ref.sheet, cell[1], ref.min_col)
+        if ref.min_row == ref.max_row and ref.min_col <= cell[2] <= ref.max_col and ref.sheet == cell[0]:
+            return self.cell_value(ref.sheet, ref.min_row, cell[2])
+        raise _Raised(VALUE)
+
+    def _calculate(self, key: Cell):
+        try:
+            value = self._formulas[key](self, key)
+            if isinstance(value, Ref):
+                value = self._dereference(value, key)
+            return 0 if value is None else value  # 引用空单元格的公式结果为 0
+        except _Raised as raised:
+            return raised.error
+
+    def _store(self, key: Cell) -> None:
+        self._active.add(key)
+        try:
+            self.values[key] = self._calculate(key)
+        finally:
+            self._active.discard(key)
+
+    def _evaluate_on_demand(self, key: Cell) -> None:
+        """INDIRECT 等动态引用指向尚未计算的公式时，先计算该公式。"""
+        if key in self._active:  # 动态引用形成的循环
+            self.values[key] = 0
+            self.cycles.append([key])
+            return
+        self._store(key)
+
+    def _iterate(self, component: List[Cell]) -> None:
+        for key in component:
+            self.values.setdefault(key, 0)
+        for _ in range(self.iterate_count):
+            change = 0.0
+            for key in component:
+                previous = self.values[key]
+                current = self.values[key] = self._calculate(key)
+                if isinstance(previous, (int, float)) and isinstance(current, (int, float)):
+                    change = max(change, abs(current - previous))
+                elif previous != current:
+                    change = float("inf")
+            if change < self.iterate_delta:
+                break
+
+    def _successors(self, node) -> List:
+        if node[0] == "range":
+            sheet, min_row, min_col, max_row, max_col = node[1]
+            result = []
+            for col, rows in self._columns.get(sheet, {}).items():
+                if min_col <= col <= max_col:
+                    result.extend((sheet, row, col) for row in rows[bisect_left(rows, min_row):bisect_right(rows, max_row)])
+            return result
+        result = []
+        for ref in self._precedents[node]:
+            if ref.is_cell:
+                key = (ref.sheet, ref.min_row, ref.min_col)
+                if key in self._formulas:
+                    result.append(key)
+            else:
+                result.append(("range", ref.key()))
+        return result
+
+    def _components(self) -> Iterator[Tuple[List[Cell], bool]]:
+        """Tarjan 算法（非递归）求强连通分量，按先计算被引用单元格的顺序给出。"""
+        index: Dict = {}
+        lowlink: Dict = {}
+        on_stack = set()
+        stack: List = []
+        counter = 0
+        for root in self._formulas:
+            if root in index:
+                continue
+            work = [(root, iter(self._successors(root)))]
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, successors = work[-1]
+                advanced = False
+                for successor in successors:
+                    if successor not in index:
+                        index[successor] = lowlink[successor] = counter
+                        counter += 1
+                        stack.append(successor)
+                        on_stack.add(successor)
+                        work.append((successor, iter(self._successors(successor))))
+                        advanced = True
+                        break
+                    if successor in on_stack:
+                        lowlink[node] = min(lowlink[node], index[successor])
+                if advanced:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    members = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        members.append(member)
+                        if member == node:
+                            break
+                    cells = [member for member in members if member[0] != "range"]
+                    if cells:
+                        cyclic = len(members) > 1 or node in self._successors(node)
+                        yield cells, cyclic
+
+
+# ---- 写回缓存值 ----
+
+_FORMULA_CELL = re.compile(
+    r"<c\b([^>]*)>(<f\b[^>]*/>|<f\b[^>]*>.*?</f>)(?:<v\b[^>]*/>|<v\b[^>]*>.*?</v>)?</c>", re.DOTALL
+)
+_REF_ATTRIBUTE = re.compile(r'\br="([A-Z]+)(\d+)"')
+_TYPE_ATTRIBUTE = re.compile(r'\s+t="[^"]*"')
+
+
+def _column_index(letters: str) -> int:
+    result = 0
+    for letter in letters:
+        result = result * 26 + ord(letter) - 64
+    return result
+
+
+def _cached(value) -> Tuple[Optional[str], str]:
+    """返回 (单元格类型属性, <v> 中的文本)。"""
+    if isinstance(value, ExcelError):
+        return "e", value.code
+    if isinstance(value, bool):
+        return "b", "1" if value else "0"
+    if isinstance(value, str):
+        return "str", escape(value)
+    if isinstance(value, float):
+        return None, _text(value) if value.is_integer() and abs(value) < 1e15 else repr(value)
+    return None, str(value)
+
+
+def _fill_sheet(xml: str, sheet: str, values: Dict[Cell, object]) -> str:
+    def replace(match):
+        attributes, formula = match.group(1), match.group(2)
+        ref = _REF_ATTRIBUTE.search(attributes)
+        if ref is None:
+            return match.group(0)
+        key = (sheet, int(ref.group(2)), _column_index(ref.group(1)))
+        if key not in values:
+            return match.group(0)
+        cell_type, text = _cached(values[key])
+        attributes = _TYPE_ATTRIBUTE.sub("", attributes)
+        if cell_type:
+            attributes += f' t="{cell_type}"'
+        return f"<c{attributes}>{formula}<v>{text}</v></c>"
+
+    return _FORMULA_CELL.sub(replace, xml)
+
+
+def _temp_file(output: str) -> str:
+    """在 output 所在目录新建临时文件，权限与普通新建文件相同（0666 经 umask 处理），不用 mkstemp 的 0600。"""
+    folder = os.path.dirname(os.path.abspath(output))
+    while True:
+        name = os.path.join(folder, f".{os.path.basename(output)}.{os.urandom(4).hex()}.tmp")
+        try:
+            os.close(os.open(name, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+        except FileExistsError:
+            continue
+        return name
+
+
+def fill_cached_values(
+    filename: str, output: Optional[str] = None, prepare: Optional[Callable[[Evaluator], None]] = None
+) -> Evaluator:
+    """计算 xlsx 中的全部公式并把结果作为缓存值写回，load_workbook(data_only=True) 即可读到计算结果。
+
+    只改动工作表中公式单元格的 <v> 和类型属性，其余内容原样保留；output 为空时覆盖原文件。
+    prepare 在计算前调用，可以向 evaluator.values 预先写入已知的结果。
+    """
+    workbook = load_workbook(filename, read_only=True)
+    try:
+        evaluator = Evaluator.from_workbook(workbook)
+        parts = {ws._worksheet_path: ws.title for ws in workbook.worksheets}
+    finally:
+        workbook.close()
+    if prepare is not None:
+        prepare(evaluator)
+    values = evaluator.evaluate()
+
+    output = output or filename
+    temp_name = _temp_file(output)
+    try:
+        with zipfile.ZipFile(filename) as source, zipfile.ZipFile(temp_name, "w", zipfile.ZIP_DEFLATED) as target:
+            for info in source.infolist():
+                data = source.read(info.filename)
+                sheet = parts.get(info.filename) or parts.get("/" + info.filename)
+                if sheet is not None:
+                    data = _fill_sheet(data.decode("utf-8"), sheet, values).encode("utf-8")
+                target.writestr(info, data)
+        if os.path.exists(output):  # 覆盖已有文件时保留其权限
+            shutil.copymode(output, temp_name)
+        os.replace(temp_name, output)
+    except BaseException:
+        os.unlink(temp_name)
+        raise
+    return evaluator
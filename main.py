@@ -1,14 +1,16 @@
 from __future__ import annotations
 
 import re
-from os import listdir
+from os import environ, listdir
 from os.path import exists
-from typing import Iterable, List, Optional
+from typing import Iterable, List, Optional, Tuple
 
+from cachecheck import StaleCacheError
 from content import Content
 from cover import Cover
 from directory import Directory
-from project import Project
+from pipeline import Task, run_tasks
+from project import Project, load_project
 from quotation import Quotation
 from separate import Separate
 
@@ -24,6 +26,9 @@ MENU_TEXT = """
 
 VALID_OPTIONS = "12345"
 
+# 设置 BIDDING_NO_CACHE=1 时跳过项目解析缓存，强制重新读取 project*.docx
+NO_CACHE_ENV = "BIDDING_NO_CACHE"
+
 
 def find_project_doc() -> str:
     doc_pattern = re.compile(r"^project.*\.docx$")
@@ -69,7 +74,8 @@ def prompt_yes_no(message: str) -> bool:
 def build_project_context(selected: Iterable[str]) -> Optional[Project]:
     if not any(option in {"1", "2", "3", "4"} for option in selected):
         return None
-    return Project(find_project_doc())
+    use_cache = environ.get(NO_CACHE_ENV, "").strip() not in {"1", "true", "yes"}
+    return load_project(find_project_doc(), parser="xml", use_cache=use_cache)
 1
 
 def quotation_filename(project: Project) -> str:
@@ -90,62 +96,129 @@ def directory_root(project: Project) -> str:
     return f"投标文件-{project.name}"
 
 
-def run_selected_actions(selected: List[str]) -> None:
-    project = build_project_context(selected)
-    generated_quotation: Optional[str] = None
+# 选项 -> 输出文件或目录名，生成前据此询问是否覆盖
+TARGETS = {"1": quotation_filename, "2": content_filename, "3": cover_filename, "4": directory_root}
+
+
+def generate_quotation(project: Project) -> Tuple[str, int]:
+    """生成报价表，返回文件名和仍在使用的易失函数个数。"""
+    quotation = Quotation(project)
+    filename = quotation.generate()
+    return filename, sum(quotation.volatile_counts.values())
+
+
+def generate_content(project: Project) -> str:
+    return Content(project).generate_content()
+
+
+def generate_cover(project: Project) -> str:
+    Cover(project).generate()
+    return cover_filename(project)
+
+
+def make_directory(project: Project) -> bool:
+    """创建空白本文件夹结构，目录已存在时返回 False。"""
+    try:
+        Directory(project).make_dir()
+    except FileExistsError:
+        return False
+    return True
 
-    quotation = Quotation(project) if project is not None else None
-    content = Content(project) if project is not None else None
-    cover = Cover(project) if project is not None else None
-    directory = Directory(project) if project is not None else None
-    separate = Separate()
 
+# 选项 -> (任务函数, 任务类型)：报价表、目录、封面的生成以 CPU 为主，放在进程池中；创建文件夹只涉及文件系统，放在线程中
+TASKS = {
+    "1": (generate_quotation, "process"),
+    "2": (generate_content, "process"),
+    "3": (generate_cover, "process"),
+    "4": (make_directory, "thread"),
+}
+
+
+def confirm_targets(selected: List[str], project: Project) -> List[str]:
+    """开始生成之前逐个询问已存在的输出是否覆盖，返回确认要执行的生成选项；生成过程中不再等待输入。"""
+    confirmed = []
     for option in selected:
-        if option == "1":
-            target = quotation_filename(project)
-            if exists(target) and not prompt_yes_no(f"!!! {target} 已存在，是否覆盖（Y/N）>>> "):
-                print(f"<<< 已跳过：{target} >>>")
-                continue
-            generated_quotation = quotation.generate()
+        if option not in TARGETS:
+            continue
+        target = TARGETS[option](project)
+        question = "是否继续创建目录" if option == "4" else "是否覆盖"
+        if exists(target) and not prompt_yes_no(f"!!! {target} 已存在，{question}（Y/N）>>> "):
+            print(f"<<< 已跳过：{target} >>>")
+            continue
+        confirmed.append(option)
+    return confirmed
+
+
+def run_generators(options: List[str], project: Project) -> Optional[str]:
+    """同时执行选项 1-4 的生成任务，按选项顺序输出结果，返回生成的报价表文件名。"""
+    if any(option in {"1", "2", "4"} for option in options):
+        project.load_tables()  # 物资清单在主进程中读取一次，各工作进程直接使用，不再各自解析文档
+    tasks = [Task(option, TASKS[option][0], (project,), TASKS[option][1]) for option in options]
+    generated_quotation: Optional[str] = None
+    for option, result in zip(options, run_tasks(tasks)):
+        target = TARGETS[option](project)
+        if result.error is not None:
+            print(f"<<< 生成失败：{target}：{result.error} >>>")
+        elif option == "1":
+            generated_quotation, volatile = result.value
             print(f"<<< 已生成报价表：{generated_quotation} >>>")
-
+            if volatile:
+                print(f"<<< 报价表中仍有 {volatile} 个易失函数（INDIRECT 等），编辑时会整体重算 >>>")
+            if project.is_lowprice:
+                print(f"<<< 本项目为低价法，可用 python sweep.py {generated_quotation} 扫描报价方案 >>>")
         elif option == "2":
-            target = content_filename(project)
-            if exists(target) and not prompt_yes_no(f"!!! {target} 已存在，是否覆盖（Y/N）>>> "):
-                print(f"<<< 已跳过：{target} >>>")
-                continue
-            output = content.generate_content()
-            print(f"<<< 已生成目录：{output} >>>")
-
+            print(f"<<< 已生成目录：{result.value} >>>")
         elif option == "3":
-            target = cover_filename(project)
-            if exists(target) and not prompt_yes_no(f"!!! {target} 已存在，是否覆盖（Y/N）>>> "):
-                print(f"<<< 已跳过：{target} >>>")
-                continue
-            cover.generate()
-            print(f"<<< 已生成封面：{target} >>>")
-
-        elif option == "4":
-            target = directory_root(project)
-            if exists(target) and not prompt_yes_no(f"!!! {target} 已存在，是否继续创建目录（Y/N）>>> "):
-                print(f"<<< 已跳过：{target} >>>")
-                continue
-            try:
-                directory.make_dir()
-                print(f"<<< 已创建目录结构：{target} >>>")
-            except FileExistsError:
-                print(f"<<< 目录结构已存在，未重复创建：{target} >>>")
-
-        elif option == "5":
-            workbook_name = generated_quotation
-            if workbook_name is None:
-                workbook_name = separate._find_workbook_name()
-            output_files = separate.generate(workbook_name)
-            if output_files:
-                print(f"<<< 已拆分报价表，共生成 {len(output_files)} 个文件 >>>")
-            else:
-                print("<<< 未找到可拆分的报价表工作表 >>>")
+            print(f"<<< 已生成封面：{result.value} >>>")
+        elif result.value:
+            print(f"<<< 已创建目录结构：{target} >>>")
+        else:
+            print(f"<<< 目录结构已存在，未重复创建：{target} >>>")
+    return generated_quotation
+
 
+def split_quotation(generated_quotation: Optional[str]) -> None:
+    """拆分刚生成的报价表；本次没有生成时拆分当前目录中最近修改的报价表。"""
+    separate = Separate()
+    with separate.recalculator:  # 拆分结束时结束重算用的外部进程
+        workbook_name = generated_quotation or separate._find_workbook_name()
+        try:
+            output_files = separate.generate(workbook_name, incremental=True)
+        except StaleCacheError as exc:
+            print(f"!!! {exc} !!!")
+            if not prompt_yes_no("!!! 是否仍然拆分（Y/N）>>> "):
+                print("<<< 已跳过拆分 >>>")
+                return
+            output_files = separate.generate(workbook_name, incremental=True, allow_stale=True)
+        for name, reason in getattr(separate.recalculator, "failures", {}).items():
+            print(f"<<< 未使用 {name} 重算公式：{reason} >>>")
+        if output_files:
+            for output_name in separate.written:
+                print(f"<<< 已更新：{output_name} >>>")
+            print(
+                f"<<< 已拆分报价表，共 {len(output_files)} 个文件，"
+                f"更新 {len(separate.written)} 个，{len(separate.skipped)} 个内容未变化 >>>"
+            )
+        else:
+            print("<<< 未找到可拆分的报价表工作表 >>>")
+
+
+def run_selected_actions(selected: List[str]) -> None:
+    # 所选的生成功能先统一确认覆盖，再同时执行；拆分用到刚生成的报价表，在生成全部完成后进行。
+    # Project 只读取所选功能用到的表格。
+    project = build_project_context(selected)
+    options: List[str] = []
+    generated_quotation: Optional[str] = None
+    if project is not None:
+        options = confirm_targets(selected, project)
+        if options:
+            generated_quotation = run_generators(options, project)
+
+    if "5" in selected:
+        if "1" in options and generated_quotation is None:
+            print("<<< 报价表生成失败，已跳过拆分 >>>")
+            return
+        split_quotation(generated_quotation)
 
 def main() -> None:
     try:
@@ -0,0 +1,428 @@
+"""供应商组合优化：在全部厂家备用的备选供应商中，按认证、交货期、得分等约束选出投标总价最低的组合，
+并改写排名（AD 列）使报价表选中这些供应商。
+
+    python optimizer.py 投标报价表-xxx.xlsx --main-certs --deliver-by 2026-12-31 --min-score 85 \\
+        --max-changes 10 --apply -o 优化后.xlsx
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from time import perf_counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from openpyxl.utils import column_index_from_string
+from openpyxl.utils.datetime import from_excel
+
+from formula import FormulaError
+from pricing import SERVICE_BASE_RATE, SERVICE_TIERS
+from sweep import SUPPLIERS, Scenario, ScenarioSweep, _label
+
+SYSTEM_SHEET = "16.三体系一览表"
+CERTS = {  # 认证名称: (证书列, 有效期列)
+    "质量体系": ("R", "S"),
+    "环境体系": ("T", "U"),
+    "职业健康": ("V", "W"),
+    "节能": ("X", "Y"),
+    "环境标志": ("Z", "AA"),
+}
+SYSTEM_CERTS = ("质量体系", "环境体系", "职业健康")  # 主要标的须具备的三体系认证
+SCORE_COLUMNS = {"AE": "性价比", "AF": "得分", "AG": "性能", "AH": "质量保证", "AI": "三体系", "AJ": "售后"}
+DELIVERY_COLUMN = "Q"
+_ABSENT = {"", "无", "-", "/", "否", "—"}
+
+
+@dataclass
+class Constraints:
+    """选择供应商时的约束，未给出的项不限制。"""
+
+    main_certs: bool = False  # 主要标的（三体系一览表中的物资）须具备三体系认证
+    certs: Sequence[str] = ()  # 全部物资须具备的认证
+    valid_on: Optional[date] = None  # 证书须在该日期仍然有效，默认为当天
+    deliver_by: Optional[date] = None  # 最迟交货日期
+    start: Optional[date] = None  # 交货期按天数填写时的起算日期，默认为当天
+    min_score: Optional[float] = None  # 所选供应商的平均得分下限
+    score_column: str = "AF"
+    max_changes: Optional[int] = None  # 最多更换供应商的物资个数（序号和品名相同的物资计一次）
+
+
+@dataclass
+class Solution:
+    choices: Optional[np.ndarray]  # 各选择在备选中的序号，0 为当前供应商；没有找到可行组合时为 None
+    cost: float  # 优化目标：按当前服务费档位线性化后的总价
+    optimal: bool  # 是否搜索完毕（节点数未超过上限），即结果为最优或确实没有可行组合
+    nodes: int
+    infeasible: Dict[int, List[str]] = field(default_factory=dict)  # 不满足约束的备选：{选择序号: 原因}
+
+
+def solve(
+    costs: np.ndarray,
+    feasible: np.ndarray,
+    scores: Optional[np.ndarray] = None,
+    min_score: Optional[float] = None,
+    changes: Optional[np.ndarray] = None,
+    max_changes: Optional[int] = None,
+    max_nodes: int = 1_000_000,
+) -> Tuple[Optional[np.ndarray], float, bool, int]:
+    """分组多选一的最小化问题：每组在 feasible 的备选中选一个，使 costs 之和最小，
+    并满足 scores 之和不小于 min_score、changes 之和不超过 max_changes。
+
+    数组均为 (组数, 备选数)。用分支定界求解：两个耦合约束先做拉格朗日松弛，乘子由二分求得，
+    松弛问题的最优值作为各节点的下界；按下界剪枝后只展开少量节点，数百组时也很快。
+    返回 (各组选择, 目标值, 是否搜索完毕, 节点数)；没有找到可行解时各组选择为 None，
+    搜索完毕时说明确实不存在可行解。
+    """
+    costs = np.where(feasible, costs, np.inf)
+    count = len(costs)
+    scores = np.zeros(costs.shape) if scores is None or min_score is None else np.where(feasible, scores, 0.0)
+    min_score = -np.inf if min_score is None else min_score
+    changes = np.zeros(costs.shape) if changes is None or max_changes is None else np.where(feasible, changes, 0.0)
+    max_changes = np.inf if max_changes is None else max_changes
+    if not np.all(feasible.any(axis=1)):
+        return None, np.inf, True, 0
+
+    def relaxed(lam: float, mu: float) -> np.ndarray:
+        return costs - lam * scores + mu * changes  # 不可选的备选费用为 inf
+
+    def picked(lam: float, mu: float) -> Tuple[float, float]:
+        choice = np.argmin(relaxed(lam, mu), axis=1)
+        rows = np.arange(count)
+        return scores[rows, choice].sum(), changes[rows, choice].sum()
+
+    def multiplier(gap) -> float:
+        """二分求使约束恰好转为满足的乘子；gap(乘子) 随乘子增大而减小，大于 0 表示约束不满足。"""
+        if gap(0.0) <= 0:
+            return 0.0
+        high = 1.0
+        while gap(high) > 0 and high < 1e15:
+            high *= 2
+        low = 0.0
+        for _ in range(60):
+            middle = (low + high) / 2
+            low, high = (middle, high) if gap(middle) > 0 else (low, middle)
+        return high
+
+    lam = mu = 0.0
+    for _ in range(4):  # 两个乘子交替求解
+        if np.isfinite(min_score):
+            lam = multiplier(lambda value: min_score - picked(value, mu)[0])
+        if np.isfinite(max_changes):
+            mu = multiplier(lambda value: picked(lam, value)[1] - max_changes)
+
+    # 得分上界同样按更换个数的约束松弛：ν ≥ 0 时 max Σ s ≤ Σ max(s − ν·d) + ν·剩余可更换个数
+    nu = 0.0
+    if np.isfinite(min_score) and np.isfinite(max_changes):
+        def most_changes(value: float) -> float:
+            choice = np.argmax(np.where(feasible, scores - value * changes, -np.inf), axis=1)
+            return changes[np.arange(count), choice].sum() - max_changes
+
+        nu = multiplier(most_changes)
+
+    reduced = relaxed(lam, mu)
+    ranked = np.sort(reduced, axis=1)
+    with np.errstate(invalid="ignore"):
+        regret = ranked[:, 1] - ranked[:, 0] if ranked.shape[1] > 1 else np.zeros(count)
+    regret = np.where(np.isfinite(regret), regret, 0)
+    order = np.argsort(-regret, kind="stable")  # 先分支选择差别大的组
+
+    def suffix(values: np.ndarray) -> List[float]:
+        return np.concatenate([np.cumsum(values[order][::-1])[::-1], [0.0]]).tolist()
+
+    rest_reduced = suffix(reduced.min(axis=1))
+    rest_cost = suffix(costs.min(axis=1))
+    rest_score = suffix(np.where(feasible, scores, -np.inf).max(axis=1))
+    rest_score_relaxed = suffix(np.where(feasible, scores - nu * changes, -np.inf).max(axis=1))
+    rest_changes = suffix(np.where(feasible, changes, np.inf).min(axis=1))
+    options = [
+        [(j, costs[g, j], scores[g, j], changes[g, j]) for j in np.argsort(reduced[g], kind="stable") if feasible[g, j]]
+        for g in order.tolist()
+    ]
+    tolerance = 1e-9 * max(1.0, float(np.abs(costs[feasible]).sum()))
+
+    best_cost = np.inf
+    best_path = None
+    nodes = 0
+    stack = [(0, 0.0, 0.0, 0.0, None)]  # (深度, 已选费用, 已选得分, 已更换个数, 已选路径)
+    while stack:
+        depth, cost, score, changed, path = stack.pop()
+        nodes += 1
+        if nodes > max_nodes:
+            break
+        if depth == count:
+            if cost < best_cost:
+                best_cost, best_path = cost, path
+            continue
+        children = []
+        for j, option_cost, option_score, option_change in options[depth]:
+            child = (depth + 1, cost + option_cost, score + option_score, changed + option_change)
+            if child[2] + rest_score[depth + 1] < min_score - 1e-9 or child[3] + rest_changes[depth + 1] > max_changes:
+                continue
+            if nu and child[2] + rest_score_relaxed[depth + 1] + nu * (max_changes - child[3]) < min_score - 1e-9:
+                continue
+            bound = max(
+                child[1] + rest_cost[depth + 1],
+                child[1] + rest_reduced[depth + 1]
+                + (lam * (min_score - child[2]) if lam else 0.0)
+                - (mu * (max_changes - child[3]) if mu else 0.0),
+            )
+            if bound < best_cost - tolerance:
+                children.append((*child, (j, path)))
+        stack.extend(reversed(children))  # 下界最小的先展开
+
+    if best_path is None:
+        return None, np.inf, nodes <= max_nodes, nodes
+    choices = np.zeros(count, dtype=int)
+    for g in order[::-1].tolist():
+        j, best_path = best_path
+        choices[g] = j
+    return choices, float(best_cost), nodes <= max_nodes, nodes
+
+
+class SupplierOptimizer:
+    """读取报价表中各物资的备选供应商（见 ScenarioSweep），按约束选出总价最低的组合。
+
+    投标总价随各物资价款单调增加，但服务费分段、退税率因物资而异，不是简单的价款之和。优化目标取
+    价款 ×（1 + 当前档位的服务费率 − 该物资的退税比例），与总价的差别只在服务费跨档和取整上；
+    选出组合后再用 PricingModel 按报价表公式核算实际总价。
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.sweep = ScenarioSweep(filename)
+        sweep = self.sweep
+        self.main_items = {
+            _label(value)
+            for (row, col), value in sweep.evaluator.sheets.get(SYSTEM_SHEET, {}).items()
+            if col == 2 and row > 2 and value is not None
+        }
+
+    def value(self, row: int, column: str):
+        return self.sweep.evaluator.cell_value(SUPPLIERS, row, column_index_from_string(column))
+
+    def feasibility(self, constraints: Constraints) -> Tuple[np.ndarray, Dict[Tuple[int, int], List[str]]]:
+        """返回各备选是否满足逐项约束，以及不满足时的原因。"""
+        sweep = self.sweep
+        today = date.today()
+        valid_on = constraints.valid_on or today
+        feasible = np.arange(sweep.rows.shape[1]) < sweep.counts[:, None]
+        reasons: Dict[Tuple[int, int], List[str]] = {}
+        for group, (number, _) in enumerate(sweep.group_labels):
+            required = list(constraints.certs)
+            if constraints.main_certs and number in self.main_items:
+                required += [name for name in SYSTEM_CERTS if name not in required]
+            for choice in range(sweep.counts[group]):
+                row = int(sweep.rows[group, choice])
+                problems = [f"缺少{name}认证" for name in required if not self._certified(row, name, valid_on)]
+                if constraints.deliver_by is not None:
+                    delivery = _delivery_date(self.value(row, DELIVERY_COLUMN), constraints.start or today)
+                    if delivery is None:
+                        problems.append("交货期无法识别")
+                    elif delivery > constraints.deliver_by:
+                        problems.append(f"交货期 {delivery:%Y-%m-%d} 晚于要求")
+                if problems:
+                    feasible[group, choice] = False
+                    reasons[(group, choice)] = problems
+        return feasible, reasons
+
+    def _certified(self, row: int, name: str, valid_on: date) -> bool:
+        cert_column, date_column = CERTS[name]
+        cert = self.value(row, cert_column)
+        if cert is None or str(cert).strip() in _ABSENT:
+            return False
+        expiry = _parse_date(self.value(row, date_column))
+        return expiry is None or expiry >= valid_on  # 有效期为空或“长期”时视为有效
+
+    def costs(self) -> np.ndarray:
+        """各备选的线性化总价（见类说明），按选择汇总序号和品名相同的各行物资。"""
+        sweep = self.sweep
+        goods_total = float(sweep.base.unit_prices @ sweep.base.quantities)
+        service_rate = next((rate for start, rate, _ in SERVICE_TIERS if goods_total > start), SERVICE_BASE_RATE)
+        vat = np.broadcast_to(sweep.base.vat_rates, (sweep.item_count,))
+        consumption = np.broadcast_to(sweep.base.consumption_rates, (sweep.item_count,))
+        weights = 1 + service_rate - vat / (100 + vat) - consumption / (100 + consumption)
+        group_weights = np.bincount(sweep.labels, weights=weights, minlength=len(sweep.counts))
+        return sweep.prices * sweep.quantities * group_weights[:, None]
+
+    def scores(self, column: str) -> np.ndarray:
+        """各备选的得分，按选择中的物资行数加权，未填写时为 0。"""
+        sweep = self.sweep
+        scores = np.zeros(sweep.rows.shape)
+        for group in range(len(sweep.counts)):
+            for choice in range(sweep.counts[group]):
+                score = self.value(int(sweep.rows[group, choice]), column)
+                if isinstance(score, (int, float)) and not isinstance(score, bool):
+                    scores[group, choice] = score
+        return scores * np.bincount(sweep.labels, minlength=len(sweep.counts))[:, None]
+
+    def optimize(self, constraints: Constraints, max_nodes: int = 1_000_000) -> Solution:
+        """求解；逐项约束下某些物资没有可选供应商时，Solution.infeasible 给出各备选不满足的原因。"""
+        sweep = self.sweep
+        feasible, reasons = self.feasibility(constraints)
+        blocked = {
+            group: [f"第 {sweep.rows[group, choice]} 行：{'、'.join(reasons[(group, choice)])}" for choice in range(sweep.counts[group])]
+            for group in np.flatnonzero(~feasible.any(axis=1)).tolist()
+        }
+        if blocked:
+            return Solution(None, np.inf, True, 0, blocked)
+
+        min_score = None
+        if constraints.min_score is not None:
+            min_score = constraints.min_score * sweep.item_count
+        return Solution(*solve(
+            self.costs(),
+            feasible,
+            self.scores(constraints.score_column) if min_score is not None else None,
+            min_score,
+            (np.arange(sweep.rows.shape[1]) > 0).astype(float)[None, :].repeat(len(sweep.counts), axis=0),
+            constraints.max_changes,
+            max_nodes,
+        ))
+
+    def scenario(self, choices: np.ndarray) -> Scenario:
+        """把供应商组合换算成可写回报价表的方案，汇率等参数保持不变。"""
+        sweep = self.sweep
+        result = sweep.model(np.stack([np.zeros_like(choices), choices])).compute()
+        groups = np.arange(len(sweep.counts))
+        return Scenario(
+            rate=sweep.rate,
+            insurance_rate=sweep.insurance_rate,
+            refund_rate=None,
+            freight={},
+            rows=tuple(sweep.rows[groups, choices].tolist()),
+            total=float(result.grand_total[1]),
+            refund=float(result.refund_total[1]),
+            score=float(sweep.scores[groups, choices][sweep.labels].sum()),
+            changed=int(np.count_nonzero(choices)),
+        )
+
+
+def _parse_date(value) -> Optional[date]:
+    """识别日期：Excel 序列值、datetime 或 2026-12-31、2026年12月31日 之类的文本。"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and value > 10000:
+        return from_excel(value).date()
+    if isinstance(value, str):
+        match = re.search(r"(\d{4})\D+(\d{1,2})\D+(\d{1,2})", value)
+        if match:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    return None
+
+
+def _delivery_date(value, start: date) -> Optional[date]:
+    """交货期可以是日期，也可以是天数（如 45、合同签订后45天），天数从 start 起算。"""
+    parsed = _parse_date(value)
+    if parsed is not None:
+        return parsed
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        days = value
+    else:
+        match = re.search(r"(\d+)\s*(?:个)?(天|日|周|个月|月)", str(value or ""))
+        if not match:
+            return None
+        days = int(match.group(1)) * {"天": 1, "日": 1, "周": 7, "月": 30}[match.group(2).lstrip("个")]
+    return date.fromordinal(start.toordinal() + int(days))
+
+
+def _date_option(text: str) -> date:
+    parsed = _parse_date(text)
+    if parsed is None:
+        raise argparse.ArgumentTypeError(f"无法识别的日期：{text}")
+    return parsed
+
+
+def format_solution(optimizer: SupplierOptimizer, solution: Solution, scenario: Scenario, current: Scenario) -> str:
+    sweep = optimizer.sweep
+    headers = ["序号", "品名", "原供应商", "单价", "新供应商", "单价"]
+    lines = []
+    for group in np.flatnonzero(solution.choices).tolist():
+        old_row, new_row = int(sweep.rows[group, 0]), int(sweep.rows[group, solution.choices[group]])
+        lines.append([
+            *sweep.group_labels[group],
+            _supplier_name(optimizer, old_row),
+            f"{sweep.prices[group, 0]:,.2f}",
+            _supplier_name(optimizer, new_row),
+            f"{sweep.prices[group, solution.choices[group]]:,.2f}",
+        ])
+    widths = [max(len(str(row[i])) for row in [headers, *lines]) for i in range(len(headers))]
+    rows = [headers, ["-" * width for width in widths], *lines]
+    table = "\n".join("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)) for row in rows)
+    return (
+        f"{table}\n投标总价：{current.total:,.2f} -> {scenario.total:,.2f}"
+        f"（{scenario.total - current.total:+,.2f}），更换供应商 {scenario.changed} 项"
+    )
+
+
+def _supplier_name(optimizer: SupplierOptimizer, row: int) -> str:
+    for column in ("L", "M", "H"):  # 生产厂商、供货商、品牌
+        value = optimizer.value(row, column)
+        if value not in (None, ""):
+            return str(value)
+    return f"第 {row} 行"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="供应商组合优化：按认证、交货期和得分约束选出投标总价最低的供应商组合。")
+    parser.add_argument("workbook", help="已生成并填写了备选供应商的报价表")
+    parser.add_argument("--main-certs", action="store_true", help="主要标的须具备有效的三体系认证")
+    parser.add_argument("--certs", nargs="+", default=[], choices=list(CERTS), help="全部物资须具备的认证")
+    parser.add_argument("--valid-on", type=_date_option, help="证书须在该日期仍然有效，默认为当天")
+    parser.add_argument("--deliver-by", type=_date_option, help="最迟交货日期")
+    parser.add_argument("--start", type=_date_option, help="交货期按天数填写时的起算日期，默认为当天")
+    parser.add_argument("--min-score", type=float, help="所选供应商的平均得分下限")
+    parser.add_argument("--score-column", default="AF", choices=list(SCORE_COLUMNS), help="得分所在列，默认为 AF（得分）")
+    parser.add_argument("--max-changes", type=int, help="最多更换供应商的物资个数")
+    parser.add_argument("--max-nodes", type=int, default=1_000_000, help="分支定界搜索的节点上限")
+    parser.add_argument("--apply", action="store_true", help="把结果写回报价表（改写全部厂家备用的排名）")
+    parser.add_argument("-o", "--output", help="写回时的输出文件，默认为 <报价表>-优化.xlsx")
+    args = parser.parse_args(argv)
+
+    started = perf_counter()
+    try:
+        optimizer = SupplierOptimizer(args.workbook)
+    except (OSError, FormulaError) as exc:
+        print(f"<<< 无法读取报价表：{exc} >>>")
+        return 1
+    constraints = Constraints(
+        main_certs=args.main_certs,
+        certs=args.certs,
+        valid_on=args.valid_on,
+        deliver_by=args.deliver_by,
+        start=args.start,
+        min_score=args.min_score,
+        score_column=args.score_column,
+        max_changes=args.max_changes,
+    )
+    solution = optimizer.optimize(constraints, args.max_nodes)
+    if solution.infeasible:
+        for group, problems in solution.infeasible.items():
+            number, name = optimizer.sweep.group_labels[group]
+            print(f"<<< 物资 {number} {name} 没有满足约束的供应商：{'；'.join(problems)} >>>")
+        return 1
+    if solution.choices is None:
+        if solution.optimal:
+            print("<<< 没有同时满足得分和更换数量约束的供应商组合 >>>")
+        else:
+            print(f"<<< 搜索 {solution.nodes - 1} 个节点后仍未找到满足约束的组合，可放宽约束或增大 --max-nodes >>>")
+        return 1
+
+    current = optimizer.scenario(np.zeros_like(solution.choices))
+    scenario = optimizer.scenario(solution.choices)
+    print(format_solution(optimizer, solution, scenario, current))
+    status = "已证明最优" if solution.optimal else "达到节点上限，为当前找到的最好结果"
+    print(f"<<< 搜索 {solution.nodes} 个节点，{status}，用时 {perf_counter() - started:.2f}s >>>")
+
+    if args.apply:
+        stem, ext = os.path.splitext(args.workbook)
+        output = optimizer.sweep.apply(scenario, args.output or f"{stem}-优化{ext}")
+        print(f"<<< 已写回报价表：{output} >>>")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
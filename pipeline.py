@@ -0,0 +1,79 @@
+"""互不依赖的生成任务同时执行：CPU 密集的任务（openpyxl、python-docx 生成文件）放在进程池中，
+文件系统操作（创建文件夹结构）放在线程池中，总耗时接近最慢的一个任务。
+
+任务函数和参数要能在进程间传递（模块顶层的函数，参数可以 pickle）。只有一个任务时直接在当前进程中执行。
+
+    results = run_tasks([Task("报价表", generate_quotation, (project,)), Task("文件夹", make_dir, (project,), "thread")])
+"""
+from __future__ import annotations
+
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+KINDS = ("process", "thread")
+
+
+@dataclass
+class Task:
+    name: str
+    function: Callable
+    args: Tuple = ()
+    kind: str = "process"  # process：在进程池中执行；thread：在线程池中执行
+
+
+@dataclass
+class TaskResult:
+    name: str
+    value: object = None
+    error: Optional[BaseException] = None
+    seconds: float = 0.0  # 任务本身的耗时，不含等待和进程启动
+
+
+def _timed(function: Callable, args: Tuple) -> Tuple[object, float]:
+    started = perf_counter()
+    value = function(*args)
+    return value, perf_counter() - started
+
+
+def run_tasks(tasks: List[Task], workers: Optional[int] = None) -> List[TaskResult]:
+    """同时执行 tasks，全部完成后按任务顺序返回结果；单个任务出错不影响其他任务，异常记在结果的 error 中。
+
+    workers 为进程池的进程数，默认为 CPU 核数（不超过进程任务数）；线程任务各用一个线程。
+    """
+    for task in tasks:
+        if task.kind not in KINDS:
+            raise ValueError(f"未知的任务类型：{task.kind}")
+    if len(tasks) == 1:
+        task = tasks[0]
+        try:
+            value, seconds = _timed(task.function, task.args)
+        except Exception as exc:
+            return [TaskResult(task.name, error=exc)]
+        return [TaskResult(task.name, value, seconds=seconds)]
+
+    processes = sum(1 for task in tasks if task.kind == "process")
+    threads = len(tasks) - processes
+    futures: Dict[int, Future] = {}
+    with ExitStack() as stack:
+        pools = {}
+        if processes:
+            max_workers = min(workers or os.cpu_count() or 1, processes)
+            pools["process"] = stack.enter_context(ProcessPoolExecutor(max_workers=max_workers))
+        if threads:
+            pools["thread"] = stack.enter_context(ThreadPoolExecutor(max_workers=threads))
+        for index, task in enumerate(tasks):
+            futures[index] = pools[task.kind].submit(_timed, task.function, task.args)
+
+        results = []
+        for index, task in enumerate(tasks):
+            try:
+                value, seconds = futures[index].result()
+            except Exception as exc:
+                results.append(TaskResult(task.name, error=exc))
+            else:
+                results.append(TaskResult(task.name, value, seconds=seconds))
+    return results
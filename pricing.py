@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict
+
+import numpy as np
+
+# 报价表公式中使用的费率，quotation.py 生成公式时引用同一组常量
+SERVICE_TIERS = (  # 实施服务费分段累进：(起点, 超出部分费率, 起点以下的费用)
+    (50000000, 0.0075, 835000),
+    (20000000, 0.01, 535000),
+    (10000000, 0.02, 335000),
+    (5000000, 0.03, 185000),
+    (2000000, 0.035, 80000),
+)
+SERVICE_BASE_RATE = 0.04
+STAMP_DUTY_RATE = 0.0003  # 税金中的印花税
+OUTPUT_VAT_RATE = 0.13  # 税金中按总价计算的销项增值税
+ITEM_VAT = 13  # 物资的退抵增值税率(%)
+FEE_VAT = 6  # 运输、保险、检验费用的退抵增值税率(%)
+
+
+def excel_round(values, digits: int = 0) -> np.ndarray:
+    """按 Excel ROUND 的规则四舍五入（远离零），可直接作用于整个数组。
+
+    Excel 按十五位有效数字判断进位，3.03+0.005 这类二进制下略小于 5 的尾数仍然进位；
+    这里把与 .5 相差不到第十五位有效数字半个单位的值视为恰好 .5，与 formula.py 的 ROUND 一致。
+    """
+    values = np.asarray(values, dtype=float)
+    flat = values.reshape(-1)
+    scale = 10.0 ** digits
+    scaled = np.abs(flat) * scale
+    result = np.floor(scaled)
+    fraction = scaled - result
+    carry = fraction >= 0.5
+    # 只对接近 .5 的少数值计算第十五位有效数字的容差，5e-15 * scaled 不小于该容差
+    near = ~carry & (fraction > 0.5 - 5e-15 * scaled) & (scaled < 1e14)
+    if near.any():
+        tolerance = 0.5 * 10.0 ** (np.floor(np.log10(scaled[near])) - 14)
+        carry[near] = fraction[near] > 0.5 - tolerance
+    result += carry
+    result /= scale
+    return np.copysign(result, flat).reshape(values.shape)
+
+
+def service_fee(goods_total) -> np.ndarray:
+    """按 SERVICE_TIERS 计算实施服务费，与报价表中的嵌套 IF 公式一致。"""
+    goods_total = np.asarray(goods_total, dtype=float)
+    conditions = [goods_total > start for start, _, _ in SERVICE_TIERS]
+    choices = [(goods_total - start) * rate + base for start, rate, base in SERVICE_TIERS]
+    return np.select(conditions, choices, goods_total * SERVICE_BASE_RATE)
+
+
+def _sum(values: np.ndarray) -> np.ndarray:
+    """沿最后一维逐项累加，与 Excel 的 SUM 相同；np.sum 的成对求和在末位上可能不同。"""
+    if values.shape[-1] == 0:
+        return np.zeros(values.shape[:-1])
+    return np.cumsum(values, axis=-1)[..., -1]
+
+
+def _join(items: np.ndarray, fees: np.ndarray) -> np.ndarray:
+    """把物资各行和三项费用行接成退抵税额表的一列，前导的方案维度按广播对齐。"""
+    lead = np.broadcast_shapes(items.shape[:-1], fees.shape[:-1])
+    return np.concatenate(
+        [np.broadcast_to(items, lead + items.shape[-1:]), np.broadcast_to(fees, lead + fees.shape[-1:])], axis=-1
+    )
+
+
+def _refund(paid: np.ndarray, rate) -> np.ndarray:
+    return excel_round(paid / (1 + rate / 100) * rate / 100, 2)
+
+
+@dataclass
+class PricingResult:
+    """报价计算结果。物资相关的数组最后一维为物资，其余维度与输入广播后的方案维度一致。"""
+
+    goods: np.ndarray  # 商品购买价款（E 列）
+    domestic: np.ndarray  # 国内运杂费（F 列）
+    inspection: np.ndarray  # 物资检验费（I 列）
+    insurance: np.ndarray  # 运输保险费（J 列）
+    freight: np.ndarray  # 国外运费（K 列）
+    service: np.ndarray  # 实施服务费（L 列）
+    tax: np.ndarray  # 税金（M 列）
+    line_totals: np.ndarray  # 各物资合计（N 列）
+    totals: Dict[str, np.ndarray]  # 对内分项报价表合计行，按列字母
+    service_total: np.ndarray  # 实施服务费总额
+    tax_total: np.ndarray  # 税金总额
+    summary_total: np.ndarray  # 对内分项报价表汇总行的合计（E 到 M 列合计之和）
+    paid: np.ndarray  # 退抵税额表：物资、运输、保险、检验各行的含税购买价款
+    vat_refunds: np.ndarray  # 同上，退抵增值税额
+    consumption_refunds: np.ndarray  # 同上，退抵消费税额
+    refunds: np.ndarray  # 同上，退抵税额合计
+    refund_totals: Dict[str, np.ndarray]  # 退抵税额表共计行，按列字母
+    refund_total: np.ndarray
+    grand_total: np.ndarray  # 投标报价总表共计
+    iterations: int  # 税金与总价循环引用的迭代次数，closed_form 时为 0
+
+
+class PricingModel:
+    """报价表计价部分的向量化模型：由单价、数量、各项费用和税率一次算出全部分项、退税额和总价。
+
+    计算方式与报价表中的公式逐一对应，取整采用 Excel ROUND 的规则。税金依赖投标总价、投标总价又包含税金，
+    这一循环引用按工作簿的迭代计算设置从 0 开始反复计算，直到两次税金之差小于 iterate_delta；
+    closed_form 为真时与无循环引用的报价表（Quotation.generate(tax_mode="closed")）一致，税金直接取线性方程的解。
+    vat_rates、consumption_rates 按物资给出，fee_vat、fee_consumption_rates 为运输、保险、检验三行的税率，
+    也都可以是单个值。单价、数量等输入可以带有前导的方案维度，所有方案一起计算。
+    """
+
+    def __init__(
+        self,
+        unit_prices,
+        quantities,
+        *,
+        vat_rates=ITEM_VAT,
+        consumption_rates=0,
+        domestic=0,
+        inspection=0,
+        insurance=0,
+        freight=0,
+        other_fees=0,
+        tech_total=0,
+        training_total=0,
+        fee_vat=FEE_VAT,
+        fee_consumption_rates=0,
+        iterate_count: int = 100,
+        iterate_delta: float = 0.001,
+        closed_form: bool = False,
+    ) -> None:
+        self.unit_prices = np.asarray(unit_prices, dtype=float)
+        self.quantities = np.asarray(quantities, dtype=float)
+        self.vat_rates = np.asarray(vat_rates, dtype=float)
+        self.consumption_rates = np.asarray(consumption_rates, dtype=float)
+        self.domestic = np.asarray(domestic, dtype=float)
+        self.inspection = np.asarray(inspection, dtype=float)
+        self.insurance = np.asarray(insurance, dtype=float)
+        self.freight = np.asarray(freight, dtype=float)
+        self.other_fees = np.asarray(other_fees, dtype=float)
+        self.tech_total = np.asarray(tech_total, dtype=float)
+        self.training_total = np.asarray(training_total, dtype=float)
+        self.fee_vat = np.asarray(fee_vat, dtype=float)
+        self.fee_consumption_rates = np.asarray(fee_consumption_rates, dtype=float)
+        self.iterate_count = iterate_count
+        self.iterate_delta = iterate_delta
+        self.closed_form = closed_form
+
+    def compute(self) -> PricingResult:
+        with np.errstate(divide="ignore", invalid="ignore"):  # 物资总价为 0 时结果为 nan，与 Excel 的 #DIV/0! 对应
+            return self._compute()
+
+    def _compute(self) -> PricingResult:
+        goods = self.unit_prices * self.quantities
+        goods_total = _sum(goods)
+        share = goods / goods_total[..., None]
+
+        def allocate(amount):
+            return excel_round(share * np.asarray(amount)[..., None], 2)
+
+        domestic = allocate(self.domestic)
+        inspection = allocate(self.inspection)
+        insurance = allocate(self.insurance)
+        freight = allocate(self.freight)
+        service_total = service_fee(goods_total)
+        service = allocate(service_total)
+        totals = {
+            "E": goods_total,
+            "F": _sum(domestic),
+            "I": _sum(inspection),
+            "J": _sum(insurance),
+            "K": _sum(freight),
+            "L": _sum(service),
+        }
+        before_tax = _sum(np.stack(np.broadcast_arrays(*(totals[col] for col in "EFIJK")), axis=-1))
+
+        # 退抵税额表：各物资按购买价款，运输、保险、检验按对内分项报价表的合计
+        fees = np.stack(np.broadcast_arrays(totals["K"], totals["J"], totals["I"]), axis=-1)
+        _, fee_vat, fee_consumption = np.broadcast_arrays(fees, self.fee_vat, self.fee_consumption_rates)
+        _, vat, consumption = np.broadcast_arrays(goods, self.vat_rates, self.consumption_rates)
+        paid = _join(goods, fees)
+        vat_refunds = _refund(paid, _join(vat, fee_vat))
+        consumption_refunds = _refund(paid, _join(consumption, fee_consumption))
+        refunds = vat_refunds + consumption_refunds
+        refund_total = _sum(refunds)
+
+        extras = [self.tech_total, self.training_total, self.other_fees]
+        untaxed = self._line_totals(goods, domestic, inspection, insurance, freight, service)  # E 到 L 列
+
+        def iterate(tax_total):
+            tax = allocate(tax_total)
+            line_totals = untaxed + tax
+            grand_total = self._grand_total(_sum(line_totals), extras, refund_total)
+            updated = excel_round(
+                (before_tax + grand_total) * STAMP_DUTY_RATE + grand_total / (1 + OUTPUT_VAT_RATE) * OUTPUT_VAT_RATE, 2
+            )
+            return tax, line_totals, grand_total, updated
+
+        if self.closed_form:
+            iteration = 0
+            tax_total = self._closed_tax(totals, before_tax, extras, refund_total)
+        else:
+            tax_total = np.zeros(goods_total.shape)
+            for iteration in range(1, self.iterate_count + 1):
+                updated = iterate(tax_total)[3]
+                if iteration == 1:
+                    updated = self._warm_start(updated, goods, before_tax, _sum(untaxed), extras, refund_total)
+                converged = not np.any(np.abs(updated - tax_total) >= self.iterate_delta)  # nan 视为已收敛
+                tax_total = updated
+                if converged:
+                    break
+        tax, line_totals, grand_total, _ = iterate(tax_total)
+        totals["M"] = _sum(tax)
+        totals["N"] = _sum(line_totals)
+        summary_total = before_tax + totals["L"] + totals["M"]
+
+        return PricingResult(
+            goods=goods,
+            domestic=domestic,
+            inspection=inspection,
+            insurance=insurance,
+            freight=freight,
+            service=service,
+            tax=tax,
+            line_totals=line_totals,
+            totals=totals,
+            service_total=service_total,
+            tax_total=tax_total,
+            summary_total=summary_total,
+            paid=paid,
+            vat_refunds=vat_refunds,
+            consumption_refunds=consumption_refunds,
+            refunds=refunds,
+            refund_totals={"C": _sum(paid), "E": _sum(vat_refunds), "G": _sum(consumption_refunds), "H": refund_total},
+            refund_total=refund_total,
+            grand_total=grand_total,
+            iterations=iteration,
+        )
+
+    @staticmethod
+    def _line_totals(*columns) -> np.ndarray:
+        total = columns[0]
+        for column in columns[1:]:  # 按 E 到 M 列的顺序累加
+            total = total + column
+        return total
+
+    @staticmethod
+    def _warm_start(first, goods, before_tax, untaxed_total, extras, refund_total) -> np.ndarray:
+        """从 0 开始迭代时税金单调递增，收敛到不小于 0 的最小不动点。按不取整的线性关系估出不动点，
+        减去各项取整误差的上界后仍不超过该不动点，从这里继续迭代结果不变，只是少算十来轮。"""
+        slope = STAMP_DUTY_RATE + OUTPUT_VAT_RATE / (1 + OUTPUT_VAT_RATE)
+        others = untaxed_total - refund_total
+        for extra in extras:
+            others = others + extra
+        estimate = (before_tax * STAMP_DUTY_RATE + slope * others) / (1 - slope)
+        error = slope * 0.005 * goods.shape[-1] + 0.005  # 各物资分摊和税金本身的取整误差
+        bound = estimate - error / (1 - slope) - 0.01 - 1e-9 * np.abs(estimate)
+        usable = (first >= 0) & np.all(goods >= 0, axis=-1)  # 分摊比例非负时迭代才是单调的
+        return np.where(usable & (bound > first), bound, first)
+
+    @staticmethod
+    def _closed_tax(totals, before_tax, extras, refund_total) -> np.ndarray:
+        """税金 = (物资价款至国外运费合计 + 总价) × 印花税率 + 总价 / 1.13 × 0.13，总价 = 不含税金的部分 + 税金，
+        解出税金后取整；运算顺序与 Quotation 写出的公式相同，结果逐位一致。"""
+        untaxed_total = _sum(np.stack(np.broadcast_arrays(*(totals[col] for col in "EFIJKL")), axis=-1))
+        others = untaxed_total + _sum(np.stack(np.broadcast_arrays(*extras), axis=-1)) - refund_total
+        rate = STAMP_DUTY_RATE + OUTPUT_VAT_RATE / (1 + OUTPUT_VAT_RATE)
+        return excel_round(
+            (before_tax * STAMP_DUTY_RATE + others * rate) / (1 - STAMP_DUTY_RATE - OUTPUT_VAT_RATE / (1 + OUTPUT_VAT_RATE)), 2
+        )
+
+    @staticmethod
+    def _grand_total(goods_total, extras, refund_total) -> np.ndarray:
+        total = goods_total
+        for extra in extras:
+            total = total + extra
+        return total - refund_total
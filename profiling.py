@@ -0,0 +1,97 @@
+"""报价表生成过程的分阶段统计：每个工作表的构建和最后的保存分别记录耗时、写入的单元格数、合并区域数和内存峰值。
+
+    profiler = StageProfiler()
+    Quotation(project).generate(profiler=profiler)
+    print(profiler.format_table())
+    profiler.write_json("报价表耗时.json")
+"""
+from __future__ import annotations
+
+import json
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from time import perf_counter
+from typing import Dict, List, Optional
+
+
+@dataclass
+class StageRecord:
+    name: str  # 阶段名称，工作表构建为工作表名
+    method: str  # 执行该阶段的方法，如 _build_inner_quote、save
+    seconds: float
+    cells: Optional[int] = None  # 写入的单元格数（含合并区域中的单元格），保存等阶段为 None
+    merged: Optional[int] = None  # 合并区域数
+    peak_memory: Optional[int] = None  # 该阶段内 Python 内存分配的峰值（字节），未统计内存时为 None
+
+    def count(self, ws) -> None:
+        """统计 openpyxl 工作表或 streaming.BufferedSheet（写出之前）中的单元格和合并区域。"""
+        self.cells = len(ws._cells)
+        merged = getattr(ws, "merged_ranges", None)
+        self.merged = len(merged if merged is not None else ws.merged_cells.ranges)
+
+
+class StageProfiler:
+    """按阶段记录耗时和内存，传给 Quotation.generate(profiler=...) 使用；不传时生成过程不做任何统计。
+
+    memory 为真时用 tracemalloc 统计各阶段的内存峰值；tracemalloc 会让生成慢上数倍，只比较耗时时应关闭。
+    """
+
+    def __init__(self, memory: bool = True) -> None:
+        self.memory = memory
+        self.records: List[StageRecord] = []
+
+    @contextmanager
+    def stage(self, name: str, method: str):
+        """记录一个阶段，返回该阶段的 StageRecord；构建工作表的阶段在写出前调用 record.count(ws) 统计单元格。"""
+        record = StageRecord(name, method, 0.0)
+        started_tracing = self.memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.memory:
+            tracemalloc.reset_peak()
+        started = perf_counter()
+        try:
+            yield record
+        finally:
+            record.seconds = perf_counter() - started
+            if self.memory:
+                record.peak_memory = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+            self.records.append(record)
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(record.seconds for record in self.records)
+
+    def to_dict(self) -> Dict:
+        return {
+            "total_seconds": self.total_seconds,
+            "memory": self.memory,
+            "stages": [asdict(record) for record in self.records],
+        }
+
+    def write_json(self, filename: str) -> None:
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def format_table(self) -> str:
+        headers = ["阶段", "方法", "耗时", "占比", "单元格", "合并区域", "内存峰值"]
+        total = self.total_seconds or 1.0
+        lines = [
+            [
+                record.name,
+                record.method,
+                f"{record.seconds:.3f}s",
+                f"{record.seconds / total:.1%}",
+                "-" if record.cells is None else str(record.cells),
+                "-" if record.merged is None else str(record.merged),
+                "-" if record.peak_memory is None else f"{record.peak_memory / 1048576:.1f}MB",
+            ]
+            for record in self.records
+        ]
+        lines.append(["合计", "", f"{self.total_seconds:.3f}s", "", "", "", ""])
+        widths = [max(len(str(row[i])) for row in [headers, *lines]) for i in range(len(headers))]
+        rows = [headers, ["-" * width for width in widths], *lines]
+        return "\n".join("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows)
@@ -1,152 +1,462 @@
+import hashlib
+import json
+import os
+import re
+import zipfile
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from xml.etree.ElementTree import iterparse
+
 from docx import Document
 
 
+_W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_BODY_DEPTH = 2  # w:document > w:body
+PARSER_VERSION = 3  # 解析结果结构变化时递增，旧缓存自动失效
+
+
 def _parse_index_list(raw, *, sort_indices=False):
     text = str(raw or '').strip()
     if not text or text.lower() == 'n':
         return []
     indexes = list(map(int, text.split()))
     return sorted(indexes) if sort_indices else indexes
-
-
-class Project(object):
-    """通过Word文档建立项目对象保存项目信息"""
-
-    def __init__(self, document_name):
-        self.name = None  # 项目名称
-        self.code = None  # 招标编号
-        self.date = None  # 开标日期
-        self.destination = None  # 运抵目的地
-        self.trans = None  # 运输方式
-        self.trans_time = None  # 发运时间
-        self.totalsum = 0  # 对外货值
-        self.is_lowprice = False  # 是否为低价法
-        self.sec_comlist = False  # 是否有供货清单二
-        self.is_tech = False  # 是否有技术服务
-        self.is_qa = False  # 是否有售后
-        self.is_cc = False  # 是否来华培训
-        self.techinfo = []  # 存放技术服务信息，格式为[人数，天数]
-        self.training_days = 0  # 来华培训天数
-        self.training_num = 0  # 来华培训人数
-        self.qc = []  # 法检物资序号
-        self.main_item = [] # 主要标的
-        self.commodities = {}  # 存放物资信息字典
-        self.commodities2 = {}  # 存放供货清单二物资
-        self.demand_info = []
-        document = Document(document_name)
-        table_info = document.tables[0]  # 读取项目基本信息
-        table_item1 = document.tables[1]  # 读取供货清单1
-        table_demand = document.tables[2]   # 读取服务需求
-        project_info = []
-        for cell in table_info.column_cells(1):
-            project_info.append(cell.text)
-
-        table_demand_length = len(table_demand.rows)
-        for index in range(table_demand_length):  # 从第1行开始读取表格
-            temp = []
-            row_now = table_demand.row_cells(index)
-            for cell in row_now:
-                temp.append(cell.text.strip())
-            self.demand_info.append(temp)          
-
-        table_item1_length = len(table_item1.rows)
-        for index in range(1, table_item1_length):  # 从第2行开始读取表格
-            temp = []
-            row_now = table_item1.row_cells(index)
-            length_row = len(row_now)
-            for i in range(1, length_row):  # 将每行信息放入暂存数组
-                temp.append(row_now[i].text.strip())
-            temp.append(row_now[0].text.strip())  # 把物资编号放在最后一位
-            self.commodities[index] = temp
-
-        self.name, self.code, self.date, self.destination, self.trans, self.trans_time = project_info[0:6]
-        self.totalsum = int(project_info[6])
-
-        if project_info[7] in 'yY':
-            self.is_lowprice = True
-        if project_info[8] in 'yY':
-            self.sec_comlist = True
-            # table3 = document.tables[2]
-            # self.commodities2 = {}  # 存放供货清单二物资
-            # # 读取供货清单二
-            # table3_length = len(table3.rows)
-            # for index in range(1, table3_length):  # 从第2行开始读取表格
-            #     temp = []
-            #     row_now = table3.row_cells(index)
-            #     length_row = len(row_now)
-            #     for i in range(1, length_row - 1):  # 将每行信息放入暂存数组
-            #         if i == 6:
-            #             amount = ''
-            #             the_unit = ''
-            #             for d in row_now[i].text:
-            #                 if d.isdigit():
-            #                     amount += d
-            #             the_unit = row_now[i].text.replace(amount, '')
-            #             temp.append(amount)
-            #             temp.append(the_unit)
-            #         else:
-            #             temp.append(row_now[i].text)
-            #     price = ''
-            #     for d in row_now[length_row - 1].text:
-            #         if d.isdigit() or d == '.':
-            #             price += d
-            #     temp.append(float(price))  # 将金额转换为float
-            #     temp.append(row_now[0].text)  # 把物资编号放在最后一位
-            #     self.commodities2[index] = temp
-
-        if project_info[9] in 'yY':
-            self.is_tech = True
-            self.techinfo += list(map(int, project_info[10:12]))
-        if project_info[12] in 'yY':
-            self.is_qa = True
-        if project_info[13] in 'yY':
-            self.is_cc = True
-            self.training_days = int(project_info[15])  # 读取来华陪训天数
-            self.training_num = int(project_info[14])  # 读取来华培训人数
+
+
+def _parse_quantity(raw) -> Optional[int]:  # 用于统计物资数量，将字符串转化为int
+    if raw is None:
+        return 1
+    if isinstance(raw, int):
+        return raw
+    if isinstance(raw, float):
+        return int(raw)
+    text = str(raw).strip().replace(",", "")
+    m = re.search(r"-?\d+", text)
+    if not m:
+        return None
+    return int(m.group(0))
+
+
+@dataclass(slots=True)
+class Commodity:
+    """供货清单中的一项物资，解析时一次性拆分字段并把数量转换为整数。
+
+    仍支持按旧列表格式的下标访问（[0] 品名 …… [-1] 物资编号），兼容旧代码。
+    """
+
+    no: str  # 物资编号
+    name: str  # 品名
+    hs_code: str  # HS编码
+    unit: str  # 单位
+    quantity: Optional[int]  # 数量，无法识别时为 None
+    spec: str  # 规格参数
+    inspection: str  # 检验标准
+    raw: Tuple[str, ...]  # 原始字段：品名、HS编码、单位、数量、规格、检验标准……，物资编号在最后一位
+
+    @classmethod
+    def from_row(cls, raw) -> "Commodity":
+        raw = tuple(raw)
+        fields = raw[:-1]
+
+        def field(index):
+            return fields[index] if index < len(fields) else ''
+
+        return cls(
+            no=raw[-1],
+            name=field(0),
+            hs_code=field(1),
+            unit=field(2),
+            quantity=_parse_quantity(field(3)) if len(fields) > 3 else 1,
+            spec=field(4),
+            inspection=field(5),
+            raw=raw,
+        )
+
+    @property
+    def quantity_text(self) -> str:
+        return self.raw[3] if len(self.raw) > 4 else ''
+
+    def __getitem__(self, index):
+        return self.raw[index]
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __iter__(self):
+        return iter(self.raw)
+
+
+def _read_tables_docx(document_name, wanted=None):
+    """通过 python-docx 读取正文表格，每个表格返回按布局网格展开的单元格文本；wanted 为需要读取的表格序号。"""
+    document = Document(document_name)
+    for table_index, table in enumerate(document.tables):
+        if wanted is None or table_index in wanted:
+            yield [[cell.text for cell in table.row_cells(index)] for index in range(len(table.rows))]
+
+
+def _run_text(run):
+    parts = []
+    for child in run:
+        tag = child.tag
+        if tag == _W_NS + 't':
+            parts.append(child.text or '')
+        elif tag in (_W_NS + 'tab', _W_NS + 'ptab'):
+            parts.append('\t')
+        elif tag == _W_NS + 'br':
+            if child.get(_W_NS + 'type', 'textWrapping') == 'textWrapping':
+                parts.append('\n')
+        elif tag == _W_NS + 'cr':
+            parts.append('\n')
+        elif tag == _W_NS + 'noBreakHyphen':
+            parts.append('-')
+    return ''.join(parts)
+
+
+def _paragraph_text(paragraph):
+    parts = []
+    for child in paragraph:
+        if child.tag == _W_NS + 'r':
+            parts.append(_run_text(child))
+        elif child.tag == _W_NS + 'hyperlink':
+            parts.extend(_run_text(run) for run in child.findall(_W_NS + 'r'))
+    return ''.join(parts)
+
+
+def _row_cells_xml(tr, previous):
+    """按 python-docx 的规则展开一行：横向合并重复左侧单元格，纵向合并沿用上一行同列单元格。"""
+    cells = []
+    for tc in tr.findall(_W_NS + 'tc'):
+        span = 1
+        v_merge = None
+        tc_pr = tc.find(_W_NS + 'tcPr')
+        if tc_pr is not None:
+            grid_span = tc_pr.find(_W_NS + 'gridSpan')
+            if grid_span is not None:
+                span = int(grid_span.get(_W_NS + 'val', 1))
+            v_merge_el = tc_pr.find(_W_NS + 'vMerge')
+            if v_merge_el is not None:
+                v_merge = v_merge_el.get(_W_NS + 'val', 'continue')
+        if v_merge == 'continue':
+            for _ in range(span):
+                col = len(cells)
+                cells.append(previous[col] if col < len(previous) else '')
+            continue
+        text = '\n'.join(_paragraph_text(p) for p in tc.findall(_W_NS + 'p'))
+        cells.extend([text] * span)
+    return cells
+
+
+def _read_tables_xml(document_name, wanted=None):
+    """直接流式解析 word/document.xml 中的正文表格，逐行展开后立即释放 XML 节点，内存占用与行数无关。
+
+    wanted 为需要读取的表格序号，其余表格只跳过不展开，读完所需表格后不再继续解析文档。
+    """
+    remaining = None if wanted is None else set(wanted)
+    with zipfile.ZipFile(document_name) as archive, archive.open('word/document.xml') as stream:
+        depth = 0
+        body = None
+        table_index = -1
+        rows = None
+        previous = []
+        for event, elem in iterparse(stream, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if depth == _BODY_DEPTH:
+                    body = elem
+                elif depth == _BODY_DEPTH + 1 and elem.tag == _W_NS + 'tbl':
+                    table_index += 1
+                    rows = [] if remaining is None or table_index in remaining else None
+                    previous = []
+                continue
+
+            level = depth
+            depth -= 1
+            if level == _BODY_DEPTH + 2 and elem.tag == _W_NS + 'tr':
+                if rows is not None:
+                    previous = _row_cells_xml(elem, previous)
+                    rows.append(previous)
+                elem.clear()
+            elif level == _BODY_DEPTH + 1:
+                if rows is not None:
+                    yield rows
+                    rows = None
+                    if remaining is not None:
+                        remaining.discard(table_index)
+                        if not remaining:
+                            return
+                body.clear()  # 正文中已处理完的段落和表格不再保留
+
+
+_TABLE_READERS = {
+    'docx': _read_tables_docx,
+    'xml': _read_tables_xml,
+}
+
+_INFO_TABLE = 0  # 项目基本信息
+_ITEM_TABLE = 1  # 供货清单1
+_DEMAND_TABLE = 2  # 服务需求
+
+
+class Project(object):
+    """通过Word文档建立项目对象保存项目信息
+
+    创建时只读取项目基本信息表格，物资清单和服务需求在首次访问 commodities、demand_info 时才读取。
+    """
+
+    def __init__(self, document_name, parser='docx'):
+        if parser not in _TABLE_READERS:
+            raise ValueError(f'未知的解析模式：{parser}')
+        self._document_name = document_name
+        self._parser = parser
+        self._commodities = None  # 存放物资信息字典，值为 Commodity
+        self._demand_info = None  # 存放服务需求
+        self._cache_target = None  # 解析结果缓存位置，由 load_project 设置
+        self.name = None  # 项目名称
+        self.code = None  # 招标编号
+        self.date = None  # 开标日期
+        self.destination = None  # 运抵目的地
+        self.trans = None  # 运输方式
+        self.trans_time = None  # 发运时间
+        self.totalsum = 0  # 对外货值
+        self.is_lowprice = False  # 是否为低价法
+        self.sec_comlist = False  # 是否有供货清单二
+        self.is_tech = False  # 是否有技术服务
+        self.is_qa = False  # 是否有售后
+        self.is_cc = False  # 是否来华培训
+        self.techinfo = []  # 存放技术服务信息，格式为[人数，天数]
+        self.training_days = 0  # 来华培训天数
+        self.training_num = 0  # 来华培训人数
+        self.qc = []  # 法检物资序号
+        self.main_item = [] # 主要标的
+        self.commodities2 = {}  # 存放供货清单二物资
+        project_info = [row[1] for row in self._read_table(_INFO_TABLE)]
+
+        self.name, self.code, self.date, self.destination, self.trans, self.trans_time = project_info[0:6]
+        self.totalsum = int(project_info[6])
+
+        if project_info[7] in 'yY':
+            self.is_lowprice = True
+        if project_info[8] in 'yY':
+            self.sec_comlist = True
+            # table3 = document.tables[2]
+            # self.commodities2 = {}  # 存放供货清单二物资
+            # # 读取供货清单二
+            # table3_length = len(table3.rows)
+            # for index in range(1, table3_length):  # 从第2行开始读取表格
+            #     temp = []
+            #     row_now = table3.row_cells(index)
+            #     length_row = len(row_now)
+            #     for i in range(1, length_row - 1):  # 将每行信息放入暂存数组
+            #         if i == 6:
+            #             amount = ''
+            #             the_unit = ''
+            #             for d in row_now[i].text:
+            #                 if d.isdigit():
+            #                     amount += d
+            #             the_unit = row_now[i].text.replace(amount, '')
+            #             temp.append(amount)
+            #             temp.append(the_unit)
+            #         else:
+            #             temp.append(row_now[i].text)
+            #     price = ''
+            #     for d in row_now[length_row - 1].text:
+            #         if d.isdigit() or d == '.':
+            #             price += d
+            #     temp.append(float(price))  # 将金额转换为float
+            #     temp.append(row_now[0].text)  # 把物资编号放在最后一位
+            #     self.commodities2[index] = temp
+
+        if project_info[9] in 'yY':
+            self.is_tech = True
+            self.techinfo += list(map(int, project_info[10:12]))
+        if project_info[12] in 'yY':
+            self.is_qa = True
+        if project_info[13] in 'yY':
+            self.is_cc = True
+            self.training_days = int(project_info[15])  # 读取来华陪训天数
+            self.training_num = int(project_info[14])  # 读取来华培训人数
         self.qc = _parse_index_list(project_info[-2], sort_indices=True)
         self.main_item = _parse_index_list(project_info[-1])
-
-    def show_info(self):
-        print('项目名称:', self.name)
-        print('项目代码:', self.code)
-        print('开标日期:', self.date)
-        print('目的地:', self.destination)
-        print('运输方式:', self.trans)
-        print('运输时间:', self.trans_time)
-        print('对外货值：', self.totalsum)
-        print('是否为低价法', '是' if self.is_lowprice is True else '否')
-        print('是否有供货清单二', '是' if self.sec_comlist is True else '否')
-        print('是否有技术服务:', '是' if self.is_tech is True else '否')
-        print('是否有售后服务:', '是' if self.is_qa is True else '否')
-        print('是否有来华培训', '是' if self.is_cc is True else '否')
-        if self.is_tech:
-            print('技术服务人数:', self.techinfo[0])
-            print('技术服务天数:', self.techinfo[1])
-        if self.is_cc:
-            print('来华培训人数：', self.training_num)
-            print('来华培训天数：', self.training_days)
-        if len(self.qc) > 0:
-            print('法检物资：', self.qc)
-        print('主要标的有', self.main_item)
-
-    def show_commodity(self):
-        temp_list = sorted(list(self.commodities.keys()))
-        for i in temp_list:
-            print(i, self.commodities[i])
-            # for j in self.commodities[i]:
-            #     print(j)
-    
-    def show_demand(self):
-        print(self.demand_info)
-
-    # def show_commodity2(self):
-    #     temp_list = sorted(list(self.commodities2.keys()))
-    #     for i in temp_list:
-    #         print(self.commodities2[i])
-    #         # for j in self.commodities2[i]:
-    #         #     print(j)
-
-# project = Project("project-[Project Name].docx")
-# project.show_info()
-# project.show_commodity()
+
+    def _read_table(self, index):
+        tables = _TABLE_READERS[self._parser](self._document_name, wanted={index})
+        try:
+            return next(tables)
+        finally:
+            tables.close()
+
+    def _save_cache(self):
+        if self._cache_target is not None:
+            _write_cache(*self._cache_target, self.to_fields())
+
+    @property
+    def commodities(self):
+        if self._commodities is None:
+            table_item1 = self._read_table(_ITEM_TABLE)
+            commodities = {}
+            for index in range(1, len(table_item1)):  # 从第2行开始读取表格
+                row_now = table_item1[index]
+                temp = [text.strip() for text in row_now[1:]]  # 将每行信息放入暂存数组
+                temp.append(row_now[0].strip())  # 把物资编号放在最后一位
+                commodities[index] = Commodity.from_row(temp)
+            self._commodities = commodities
+            self._save_cache()
+        return self._commodities
+
+    @commodities.setter
+    def commodities(self, value):
+        self._commodities = value
+
+    @property
+    def demand_info(self):
+        if self._demand_info is None:
+            self._demand_info = [
+                [text.strip() for text in row] for row in self._read_table(_DEMAND_TABLE)  # 从第1行开始读取表格
+            ]
+            self._save_cache()
+        return self._demand_info
+
+    @demand_info.setter
+    def demand_info(self, value):
+        self._demand_info = value
+
+    def load_tables(self, demand_info=False):
+        """立即读取物资清单（demand_info 为真时还有服务需求），不再等到首次访问。
+
+        Project 要传给其他进程使用时先在主进程中调用，各进程直接使用读取结果，不再各自解析文档。
+        """
+        self.commodities  # 属性在首次访问时读取表格并写入解析缓存
+        if demand_info:
+            self.demand_info
+
+    def to_fields(self):
+        """导出可序列化的解析结果，供缓存使用；尚未读取的表格不导出。"""
+        fields = {key: value for key, value in vars(self).items() if not key.startswith('_')}
+        fields['commodities2'] = {str(key): value for key, value in self.commodities2.items()}
+        if self._commodities is not None:
+            fields['commodities'] = {str(key): list(value.raw) for key, value in self._commodities.items()}
+        if self._demand_info is not None:
+            fields['demand_info'] = self._demand_info
+        return fields
+
+    @classmethod
+    def from_fields(cls, fields, document_name=None, parser='docx'):
+        """根据 to_fields 导出的数据还原项目对象；缓存中没有的表格仍从 document_name 按需读取。"""
+        fields = dict(fields)
+        commodities = fields.pop('commodities', None)
+        demand_info = fields.pop('demand_info', None)
+        project = cls.__new__(cls)
+        project._document_name = document_name
+        project._parser = parser
+        project._commodities = None
+        project._demand_info = demand_info
+        project._cache_target = None
+        vars(project).update(fields)
+        project.commodities2 = {int(key): value for key, value in fields['commodities2'].items()}
+        if commodities is not None:
+            project._commodities = {int(key): Commodity.from_row(value) for key, value in commodities.items()}
+        return project
+
+    def show_info(self):
+        print('项目名称:', self.name)
+        print('项目代码:', self.code)
+        print('开标日期:', self.date)
+        print('目的地:', self.destination)
+        print('运输方式:', self.trans)
+        print('运输时间:', self.trans_time)
+        print('对外货值：', self.totalsum)
+        print('是否为低价法', '是' if self.is_lowprice is True else '否')
+        print('是否有供货清单二', '是' if self.sec_comlist is True else '否')
+        print('是否有技术服务:', '是' if self.is_tech is True else '否')
+        print('是否有售后服务:', '是' if self.is_qa is True else '否')
+        print('是否有来华培训', '是' if self.is_cc is True else '否')
+        if self.is_tech:
+            print('技术服务人数:', self.techinfo[0])
+            print('技术服务天数:', self.techinfo[1])
+        if self.is_cc:
+            print('来华培训人数：', self.training_num)
+            print('来华培训天数：', self.training_days)
+        if len(self.qc) > 0:
+            print('法检物资：', self.qc)
+        print('主要标的有', self.main_item)
+
+    def show_commodity(self):
+        temp_list = sorted(list(self.commodities.keys()))
+        for i in temp_list:
+            print(i, self.commodities[i])
+            # for j in self.commodities[i]:
+            #     print(j)
+    
+    def show_demand(self):
+        print(self.demand_info)
+
+    # def show_commodity2(self):
+    #     temp_list = sorted(list(self.commodities2.keys()))
+    #     for i in temp_list:
+    #         print(self.commodities2[i])
+    #         # for j in self.commodities2[i]:
+    #         #     print(j)
+
+
+def _document_digest(document_name):
+    digest = hashlib.sha256()
+    with open(document_name, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_path(document_name):
+    folder, name = os.path.split(os.path.abspath(document_name))
+    return os.path.join(folder, f'.{name}.cache.json')
+
+
+def _read_cache(path, digest):
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('sha256') != digest or data.get('parser_version') != PARSER_VERSION:
+        return None
+    return data.get('fields')
+
+
+def _write_cache(path, digest, fields):
+    data = {'sha256': digest, 'parser_version': PARSER_VERSION, 'fields': fields}
+    temp_path = f'{path}.tmp'
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+    except OSError:
+        pass  # 缓存写入失败不影响本次解析结果
+
+
+def load_project(document_name, parser='docx', use_cache=True):
+    """读取项目文档；文档内容（SHA-256）和解析版本未变化时直接使用旁路缓存中的解析结果。
+
+    缓存按表格分段保存，首次访问时才读取的表格会在读取后补写进缓存。
+    """
+    if not use_cache:
+        return Project(document_name, parser=parser)
+
+    path = _cache_path(document_name)
+    digest = _document_digest(document_name)
+    fields = _read_cache(path, digest)
+    project = None
+    if fields is not None:
+        try:
+            project = Project.from_fields(fields, document_name, parser=parser)
+        except (KeyError, TypeError, ValueError):
+            project = None  # 缓存内容损坏时重新解析
+    if project is None:
+        project = Project(document_name, parser=parser)
+        _write_cache(path, digest, project.to_fields())
+    project._cache_target = (path, digest)  # 之后按需读取的表格也写回缓存
+    return project
+
+# project = Project("project-[Project Name].docx")
+# project.show_info()
+# project.show_commodity()
 # # #
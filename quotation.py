@@ -1,13 +1,185 @@
 from __future__ import annotations
 
+import math
 import re
 from datetime import date, datetime
 from typing import Dict, Iterable, List, Optional
 
 from openpyxl import Workbook
 from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import column_index_from_string
+from openpyxl.utils.cell import coordinate_to_tuple
+
+from formula import Evaluator, FormulaError, fill_cached_values
+from pricing import (
+    FEE_VAT,
+    ITEM_VAT,
+    OUTPUT_VAT_RATE,
+    SERVICE_BASE_RATE,
+    SERVICE_TIERS,
+    STAMP_DUTY_RATE,
+    PricingModel,
+    PricingResult,
+)
+from profiling import StageProfiler
+from spreadsheetml import XmlSheet, XmlWorkbook
+from streaming import BufferedSheet
+from styles import StyleRegistry
+
+
+class QuotationLayout:
+    """报价表中计价相关单元格的位置：生成时记录，或用 detect 从已有报价表中识别。"""
+
+    INNER = "2.物资对内分项报价表"
+    TAX = "3.各项物资退抵税额表"
+    TOTAL = "1.投标报价总表"
+
+    def __init__(self, item_count: int, is_tech: bool, is_cc: bool, total_row: int, closed_form: bool = False) -> None:
+        self.item_count = item_count
+        self.is_tech = is_tech
+        self.is_cc = is_cc
+        self.total_row = total_row  # 投标报价总表的共计行
+        self.closed_form = closed_form  # 税金是否按无循环引用的公式直接求解
+        self.inner_total_row = 5 + item_count
+        self.summary_row = self.inner_total_row + 5
+        self.tax_total_row = 7 + item_count
+        self.fee_rows = range(4 + item_count, 7 + item_count)  # 退抵税额表中的运输、保险、检验
+
+    @classmethod
+    def detect(cls, sheets: Dict[str, Dict]) -> "QuotationLayout":
+        """从 formula.Evaluator.sheets 形式的工作簿内容中识别各表的行号，结构与生成时不一致时抛出 FormulaError。"""
+        selector = sheets.get("物资选择", {})
+        item_count = sum(1 for (row, col) in selector if col == 3)
+        total = sheets.get(cls.TOTAL, {})
+        total_rows = [row for (row, col), value in total.items() if col == 2 and value == "共计"]
+        total_row = total_rows[0] if total_rows else 0
+        tax_formula = str(sheets.get(cls.INNER, {}).get((5 + item_count + 5, 13), ""))
+        layout = cls(
+            item_count,
+            "4.技术服务费报价表" in sheets,
+            any(title.endswith("来华培训费报价表") for title in sheets),
+            total_row,
+            f"投标报价总表'!C{total_row})" not in tax_formula,  # 按总价计算税金时引用总表的共计
+        )
+        checks = (
+            (cls.INNER, layout.inner_total_row, 1, "合计"),
+            (cls.TAX, layout.tax_total_row, 1, "共计"),
+            (cls.TOTAL, layout.total_row, 2, "共计"),
+        )
+        for sheet, row, col, label in checks:
+            if sheets.get(sheet, {}).get((row, col)) != label:
+                raise FormulaError(f"报价表结构与生成时不一致：{sheet} 第 {row} 行不是{label}行")
+        return layout
+
+    def pricing_model(self, evaluator: Evaluator) -> PricingModel:
+        """从报价表读取单价、数量、退税率和各项费用，建立向量化的报价计算模型。
+
+        evaluator 为该报价表的公式计算器，输入单元格中的公式按需计算；输入不是数值时抛出 FormulaError。
+        """
+        count = self.item_count
+        inner, tax, total = self.INNER, self.TAX, self.TOTAL
+        summary_row = self.summary_row
+        fee_rows = self.fee_rows
+
+        def number(sheet: str, ref: str) -> float:
+            return cell_number(evaluator, sheet, ref)
+
+        def column(sheet: str, col: str, rows: Iterable[int]) -> List[float]:
+            return [number(sheet, f"{col}{row}") for row in rows]
+
+        extras = {"tech_total": 0, "training_total": 0}
+        row = 5  # 总表中物资价格之后依次为技术服务费、来华培训费、其他费用
+        if self.is_tech:
+            extras["tech_total"] = number(total, f"C{row}")
+            row += 1
+        if self.is_cc:
+            extras["training_total"] = number(total, f"C{row}")
+            row += 1
+        return PricingModel(
+            column(inner, "C", range(5, 5 + count)),
+            column(inner, "D", range(5, 5 + count)),
+            vat_rates=column(tax, "D", range(4, 4 + count)),
+            consumption_rates=column(tax, "F", range(4, 4 + count)),
+            fee_vat=column(tax, "D", fee_rows),
+            fee_consumption_rates=column(tax, "F", fee_rows),
+            domestic=number(inner, f"F{summary_row}"),
+            inspection=number(inner, f"I{summary_row}"),
+            insurance=number(inner, f"J{summary_row}"),
+            freight=number(inner, f"K{summary_row}"),
+            other_fees=number(total, f"C{row}"),
+            **extras,
+            iterate_count=evaluator.iterate_count,
+            iterate_delta=evaluator.iterate_delta,
+            closed_form=self.closed_form,
+        )
+
+    def pricing_cells(self, result: PricingResult) -> Dict[tuple, float]:
+        """把计算结果对应到报价表中的单元格，键与 formula.Evaluator 相同：(工作表名, 行号, 列号)。"""
+        inner, tax, total = self.INNER, self.TAX, self.TOTAL
+        inner_total_row = self.inner_total_row
+        summary_row = self.summary_row
+        cells: Dict[tuple, float] = {}
+
+        columns = {
+            "E": result.goods,
+            "F": result.domestic,
+            "I": result.inspection,
+            "J": result.insurance,
+            "K": result.freight,
+            "L": result.service,
+            "M": result.tax,
+            "N": result.line_totals,
+        }
+        for col, values in columns.items():
+            col_index = column_index_from_string(col)
+            for row, value in enumerate(values.tolist(), start=5):
+                cells[(inner, row, col_index)] = value
+            cells[(inner, inner_total_row, col_index)] = float(result.totals[col])
+        cells[(inner, summary_row, 12)] = float(result.service_total)
+        cells[(inner, summary_row, 13)] = float(result.tax_total)
+        cells[(inner, summary_row, 14)] = float(result.summary_total)
+        cells[(inner, summary_row + 1, 12)] = float(result.service_total)
+
+        refunds = {"C": result.paid, "E": result.vat_refunds, "G": result.consumption_refunds, "H": result.refunds}
+        for col, values in refunds.items():
+            col_index = column_index_from_string(col)
+            for row, value in enumerate(values.tolist(), start=4):
+                cells[(tax, row, col_index)] = value
+            cells[(tax, self.tax_total_row, col_index)] = float(result.refund_totals[col])
+
+        cells[(total, 4, 3)] = float(result.totals["N"])
+        cells[(total, self.total_row - 1, 3)] = float(result.refund_total)
+        cells[(total, self.total_row, 3)] = float(result.grand_total)
+        return cells
+
+    def prepare_values(self, evaluator: Evaluator) -> None:
+        """写缓存值前先用报价计算模型算出分项、退税和总价，税金与总价的循环引用不再逐格迭代。
+
+        用作 fill_cached_values 的 prepare 参数。
+        """
+        if not evaluator.iterate and not self.closed_form:  # 未开启迭代计算时循环引用的结果由计算器按 Excel 的方式处理
+            return
+        try:
+            result = self.pricing_model(evaluator).compute()
+        except FormulaError:
+            return
+        if not math.isfinite(float(result.grand_total)):
+            return
+        evaluator.values.update(self.pricing_cells(result))
 
 
+def cell_number(evaluator: Evaluator, sheet: str, ref: str) -> float:
+    """按数值读取单元格，公式按需计算；空单元格为 0，无法转换为数值时抛出 FormulaError。"""
+    value = evaluator.cell_value(sheet, *coordinate_to_tuple(ref))
+    if value is None:
+        return 0
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise FormulaError(f"报价计算模型的输入不是数值：{sheet}!{ref}") from None
+
 
 class Quotation:
     """通过 project 实例创建报价表（不依赖模板）。"""
@@ -18,11 +190,20 @@ class Quotation:
     DATE_FORMAT = 'yyyy"年"m"月"d"日"'
     INTEGER_FORMAT = "0"
     PERCENT_FORMAT = "0.00%"
+    BACKENDS = ("openpyxl", "write_only", "xml")
+    LOOKUPS = ("direct", "indirect")
+    TAX_MODES = ("iterative", "closed")
+    VOLATILE_PATTERN = re.compile(r"\b(?:INDIRECT|OFFSET|NOW|TODAY|RAND|RANDBETWEEN|CELL|INFO)\s*\(", re.IGNORECASE)
 
     def __init__(self, project) -> None:
         self.project = project
         self._all_suppliers_last_row = 1
         self._total_sheet_total_row = 9
+        self._tax_total_row = 7
+        self.layout: Optional[QuotationLayout] = None  # 最近一次生成的报价表中计价单元格的位置
+        self._lookup = "direct"
+        self._tax_mode = "iterative"
+        self.volatile_counts: Dict[str, int] = {}  # 最近一次生成时各工作表中易失函数的个数
 
         self.title_font = Font(name="宋体", size=16, bold=True)
         self.header_font = Font(name="宋体", size=12, bold=True)
@@ -38,6 +219,22 @@ class Quotation:
         self.header_fill = PatternFill("solid", fgColor="808080")
         self.yellow_fill = PatternFill("solid", fgColor="FFFFFF00")
 
+        self.styles = StyleRegistry()  # 常用组合预先登记，构建时按名称写入
+        self.styles.define("header", font=self.header_font, alignment=self.center, border=self.border)
+        self.styles.define("normal", font=self.normal_font, alignment=self.center, border=self.border)
+        self.styles.derive("left-wrap", "normal", alignment=self.left)
+        self.styles.derive("right", "normal", alignment=self.right)
+        self.styles.derive("money", "normal", number_format=self.MONEY_FORMAT)
+        self.styles.derive("money-right", "right", number_format=self.MONEY_FORMAT)
+        self.styles.derive("header-money-right", "money-right", font=self.header_font)
+        self.styles.derive("integer", "normal", number_format=self.INTEGER_FORMAT)
+        self.styles.define("align-left", alignment=self.left)
+        self.styles.define("align-center", alignment=self.center)
+        self.styles.define("align-right", alignment=self.right)
+        self.styles.define("border", border=self.border)
+        self.styles.define("diag-border", border=self.diag_border)
+        self.styles.define("small-left", font=self._font(10), alignment=self.left)
+
     @staticmethod
     def _safe_name(name: str) -> str:  # 用于生成文件名，过滤掉无法使用的字符
         invalid = '<>:"/\\|?*'
@@ -58,28 +255,33 @@ class Quotation:
                 return date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
         return date.today()
 
-    @staticmethod
-    def _parse_quantity(raw) -> Optional[int]:  # 用于统计物资数量，将字符串转化为int
-        if raw is None:
-            return 1
-        if isinstance(raw, int):
-            return raw
-        if isinstance(raw, float):
-            return int(raw)
-        text = str(raw).strip().replace(",", "")
-        m = re.search(r"-?\d+", text)
-        if not m:
-            return None
-        return int(m.group(0))
-
     def _font(self, size: int = 12, *, name: str = "宋体", bold: bool = False) -> Font:
-        return Font(name=name, size=size, bold=bold)
+        return self.styles.intern(Font, name=name, size=size, bold=bold)
 
     def _alignment(self, horizontal: str = "center", *, wrap: bool = True) -> Alignment:
-        return Alignment(horizontal=horizontal, vertical="center", wrap_text=wrap)
+        return self.styles.intern(Alignment, horizontal=horizontal, vertical="center", wrap_text=wrap)
 
     def _border(self, **sides) -> Border:
-        return Border(**{name: self.thin_side for name in sides})
+        return self.styles.intern(Border, **{name: self.thin_side for name in sides})
+
+    def _selected(self, column: str, key_ref: str, key) -> str:
+        """物资选择表中某一物资所在行的单元格引用。
+
+        direct 模式在生成时直接写成 物资选择!C{序号}；indirect 模式保留按序号单元格拼接地址的 INDIRECT 写法，
+        后者为易失函数，表格每次编辑都会整体重算。
+        """
+        if self._lookup == "indirect":
+            return f'INDIRECT("物资选择!{column}"&{key_ref})'
+        return f"物资选择!{column}{key}"
+
+    @classmethod
+    def _count_volatile(cls, ws) -> int:
+        total = 0
+        for cell in ws._cells.values():
+            value = cell.value
+            if isinstance(value, str) and value.startswith("="):
+                total += len(cls.VOLATILE_PATTERN.findall(value))
+        return total
 
     def _set_columns(self, ws, widths: Dict[str, float]) -> None:  #设置当前worksheet的列宽
         for col, width in widths.items():
@@ -93,6 +295,12 @@ class Quotation:
         for cell_range in ranges:
             ws.merge_cells(cell_range)
 
+    def _share_formulas(self, ws, columns: Iterable[str], row_start: int, row_end: int) -> None:
+        """各列中逐行平移的同一公式登记为共享公式，只有 xml 输出方式按共享公式写出，其余方式忽略。"""
+        if isinstance(ws, XmlSheet) and row_end > row_start:
+            for col in columns:
+                ws.share_formula(f"{col}{row_start}:{col}{row_end}")
+
     def _write_entries(self, ws, entries: Dict[str, object]) -> None:
         for cell_ref, value in entries.items():
             ws[cell_ref] = value
@@ -107,16 +315,9 @@ class Quotation:
         fill: Optional[PatternFill] = None,
         number_format: Optional[str] = None,
     ) -> None:
-        if font is not None:
-            cell.font = font
-        if alignment is not None:
-            cell.alignment = alignment
-        if border is not None:
-            cell.border = border
-        if fill is not None:
-            cell.fill = fill
-        if number_format is not None:
-            cell.number_format = number_format
+        self.styles.apply(
+            cell, font=font, alignment=alignment, border=border, fill=fill, number_format=number_format
+        )
 
     def _style_range(
         self,
@@ -143,16 +344,7 @@ class Quotation:
 
     def _style_row(self, ws, row: int, col_start: int, col_end: int, header: bool = False) -> None:
         #  用于修改指定worksheet行号的从几列到几列的样式
-        for col in range(col_start, col_end + 1):
-            cell = ws.cell(row, col)
-            self._style_cell(
-                cell,
-                font=self.header_font if header else self.normal_font,
-                alignment=self.center,
-                border=self.border,
-            )
-            # if header:
-            #     cell.fill = self.header_fill
+        self.styles.stamp_row(ws, row, col_start, col_end, "header" if header else "normal")
 
     def _build_all_suppliers(self, ws, items: Dict) -> None:
         ws.title = "全部厂家备用"
@@ -241,13 +433,14 @@ class Quotation:
         keys = sorted(items.keys())
         for key in keys:
             idx = key + 1
-            ws[f"A{idx}"] = items[key][-1]
-            ws[f"B{idx}"] = items[key][0]
-            ws[f"C{idx}"] = items[key][1]
-            ws[f"D{idx}"] = items[key][2]
-            ws[f"E{idx}"] = self._parse_quantity(items[key][3])
-            ws[f"F{idx}"] = items[key][4]
-            ws[f"G{idx}"] = items[key][5]
+            item = items[key]
+            ws[f"A{idx}"] = item.no
+            ws[f"B{idx}"] = item.name
+            ws[f"C{idx}"] = item.hs_code
+            ws[f"D{idx}"] = item.unit
+            ws[f"E{idx}"] = item.quantity
+            ws[f"F{idx}"] = item.spec
+            ws[f"G{idx}"] = item.inspection
             ws[f"H{idx}"] = ""
             ws[f"I{idx}"] = ""
             ws[f"J{idx}"] = 1
@@ -281,9 +474,10 @@ class Quotation:
             ws[f"AJ{idx}"] = ""
             ws[f"AL{idx}"] = f"=A{idx}&B{idx}&AD{idx}"
             self._style_row(ws, idx, 1, len(headers), header=False)
-            ws[f"F{idx}"].alignment = self.left
-            ws.row_dimensions[idx].height = max(24, min(120, (str(items[key][4]).count("\n") + 1) * 16))
+            self.styles.stamp(ws[f"F{idx}"], "align-left")
+            ws.row_dimensions[idx].height = max(24, min(120, (item.spec.count("\n") + 1) * 16))
         self._all_suppliers_last_row = (max(keys) + 1) if keys else 1
+        self._share_formulas(ws, ["K", "AL"], 2, self._all_suppliers_last_row)
 
 
     def _build_selector(self, ws, items: Dict) -> None:
@@ -292,8 +486,8 @@ class Quotation:
         keys = sorted(items.keys())
         row_num = len(keys) + 5
         for key in keys:
-            ws[f"A{key}"] = items[key][-1]
-            ws[f"B{key}"] = items[key][0]
+            ws[f"A{key}"] = items[key].no
+            ws[f"B{key}"] = items[key].name
             ws[f"C{key}"] = f'=MATCH(A{key}&B{key}&1,全部厂家备用!AL$1:AL${row_num},0)'
             self._style_row(ws, key, 1, 3, header=False)
 
@@ -565,9 +759,9 @@ class Quotation:
             idx = row - 3
             if idx < len(keys):
                 key = keys[idx]
-                ws[f"M{row}"] = items[key][-1]
-                ws[f"N{row}"] = items[key][0]
-                ws[f"O{row}"] = self._parse_quantity(items[key][2])
+                ws[f"M{row}"] = items[key].no
+                ws[f"N{row}"] = items[key].name
+                ws[f"O{row}"] = items[key].quantity
                 ws[f"T{row}"] = f"=PRODUCT(Q{row}:S{row})"
                 ws[f"V{row}"] = f"=U{row}*P{row}"
 
@@ -847,14 +1041,11 @@ class Quotation:
             ws[f"L{row}"] = f"=ROUND(E{row}/E${total_row}*L${summary_row},2)"
             ws[f"M{row}"] = f"=ROUND(E{row}/E${total_row}*M${summary_row},2)"
             ws[f"N{row}"] = f"=SUM(E{row}:M{row})"
-            self._style_row(ws, row, 2, 14, header=False)
-            ws[f"B{row}"].alignment = self.left
-            ws[f"C{row}"].number_format = "#,##0.00"
-            ws[f"D{row}"].number_format = "0"
-            for col in "EFGHIJKLMN":
-                ws[f"{col}{row}"].number_format = "#,##0.00"
+            self.styles.stamp(ws[f"B{row}"], "left-wrap")
+            self.styles.stamp(ws[f"D{row}"], "integer")
             for col in "CEFGHIJKLMN":
-                ws[f"{col}{row}"].alignment = self.right
+                self.styles.stamp(ws[f"{col}{row}"], "money-right")
+        self._share_formulas(ws, "BEFIJKLMN", item_start, item_end)
 
         ws[f"A{total_row}"] = "合计"
         ws[f"A{total_row}"].font = self.header_font
@@ -891,15 +1082,28 @@ class Quotation:
         if self.project.is_cc:
             totalprice_row += 1
 
-        ws[f"M{summary_row}"] = f"=ROUND((SUM(E{total_row}:K{total_row})+'1.投标报价总表'!C{totalprice_row})*0.0003+'1.投标报价总表'!C{totalprice_row}/1.13*0.13,2)"
+        if self._tax_mode == "closed":
+            # 总价 = 不含税金的部分 + 税金，直接解出税金，不再引用总表的共计，工作簿中没有循环引用
+            others = (
+                f"SUM(E{total_row}:L{total_row})+SUM('1.投标报价总表'!C5:C{totalprice_row - 2})"
+                f"-'1.投标报价总表'!C{totalprice_row - 1}"
+            )
+            vat = f"{OUTPUT_VAT_RATE}/{1 + OUTPUT_VAT_RATE}"
+            ws[f"M{summary_row}"] = (
+                f"=ROUND((SUM(E{total_row}:K{total_row})*{STAMP_DUTY_RATE}+({others})*({STAMP_DUTY_RATE}+{vat}))"
+                f"/(1-{STAMP_DUTY_RATE}-{vat}),2)"
+            )
+        else:
+            bid_total = f"'1.投标报价总表'!C{totalprice_row}"
+            ws[f"M{summary_row}"] = (
+                f"=ROUND((SUM(E{total_row}:K{total_row})+{bid_total})*{STAMP_DUTY_RATE}"
+                f"+{bid_total}/{1 + OUTPUT_VAT_RATE}*{OUTPUT_VAT_RATE},2)"
+            )
         ws[f"N{summary_row}"] = f"=SUM(E{total_row}:M{total_row})"
-        ws[f"L{service_row}"] = (
-            f"=IF(E{total_row}>50000000,(E{total_row}-50000000)*0.0075+835000,"
-            f"IF(E{total_row}>20000000,(E{total_row}-20000000)*0.01+535000,"
-            f"IF(E{total_row}>10000000,(E{total_row}-10000000)*0.02+335000,"
-            f"IF(E{total_row}>5000000,(E{total_row}-5000000)*0.03+185000,"
-            f"IF(E{total_row}>2000000,(E{total_row}-2000000)*0.035+80000,E{total_row}*0.04)))))"
-        )
+        service = f"E{total_row}*{SERVICE_BASE_RATE}"
+        for start, rate, base in reversed(SERVICE_TIERS):  # 费率与 pricing.py 共用，由低到高嵌套
+            service = f"IF(E{total_row}>{start},(E{total_row}-{start})*{rate}+{base},{service})"
+        ws[f"L{service_row}"] = f"={service}"
 
         # self._style_row(ws, summary_row, 6, 14, header=False)
         # ws[f"F{summary_row}"].number_format = "#,##0.00"
@@ -979,16 +1183,17 @@ class Quotation:
             ws[f"A{row}"] = f"=物资选择!A{i}"
             ws[f"B{row}"] = f"=物资选择!B{i}"
             ws[f"C{row}"] = f"='2.物资对内分项报价表'!E{4 + i}"
-            ws[f"D{row}"] = 13
+            ws[f"D{row}"] = ITEM_VAT
             ws[f"E{row}"] = f"=ROUND(C{row}/(1+D{row}/100)*D{row}/100,2)"
             ws[f"F{row}"] = 0
             ws[f"G{row}"] = f"=ROUND(C{row}/(1+F{row}/100)*F{row}/100,2)"
             ws[f"H{row}"] = f"=E{row}+G{row}"
             self._style_row(ws, row, 1, 8, header=False)
+        self._share_formulas(ws, "ABCEGH", item_start, item_end)
 
         ws[f"B{trans_row}"] = "运输"
         ws[f"C{trans_row}"] = f"='2.物资对内分项报价表'!K{inner_total_row}"
-        ws[f"D{trans_row}"] = 6
+        ws[f"D{trans_row}"] = FEE_VAT
         ws[f"E{trans_row}"] = f"=ROUND(C{trans_row}/(1+D{trans_row}/100)*D{trans_row}/100,2)"
         ws[f"F{trans_row}"] = 0
         ws[f"G{trans_row}"] = f"=ROUND(C{trans_row}/(1+F{trans_row}/100)*F{trans_row}/100,2)"
@@ -996,7 +1201,7 @@ class Quotation:
 
         ws[f"B{insurance_row}"] = "保险"
         ws[f"C{insurance_row}"] = f"='2.物资对内分项报价表'!J{inner_total_row}"
-        ws[f"D{insurance_row}"] = 6
+        ws[f"D{insurance_row}"] = FEE_VAT
         ws[f"E{insurance_row}"] = f"=ROUND(C{insurance_row}/(1+D{insurance_row}/100)*D{insurance_row}/100,2)"
         ws[f"F{insurance_row}"] = 0
         ws[f"G{insurance_row}"] = f"=ROUND(C{insurance_row}/(1+F{insurance_row}/100)*F{insurance_row}/100,2)"
@@ -1004,7 +1209,7 @@ class Quotation:
 
         ws[f"B{inspect_row}"] = "第三方检验"
         ws[f"C{inspect_row}"] = f"='2.物资对内分项报价表'!I{inner_total_row}"
-        ws[f"D{inspect_row}"] = 6
+        ws[f"D{inspect_row}"] = FEE_VAT
         ws[f"E{inspect_row}"] = f"=ROUND(C{inspect_row}/(1+D{inspect_row}/100)*D{inspect_row}/100,2)"
         ws[f"F{inspect_row}"] = 0
         ws[f"G{inspect_row}"] = f"=ROUND(C{inspect_row}/(1+F{inspect_row}/100)*F{inspect_row}/100,2)"
@@ -1516,7 +1721,6 @@ class Quotation:
         ws.title = "2.采购需求偏离表(物资部分)"
         supplier_last_row = max(getattr(self, "_all_suppliers_last_row", 1), 1)
         sorted_keys = sorted(items.keys())
-        small_font = self._font(10)
         title_font = self._font(14, bold=True)
         left_wrap = self.left
         center_wrap = self.center
@@ -1573,8 +1777,7 @@ class Quotation:
 
         for idx, key in enumerate(sorted_keys):
             row_base = 6 + idx * 9
-            spec_text = items[key][4] if len(items[key]) > 4 else ""
-            spec_lines = max(str(spec_text).count("\n") + 1, 1)
+            spec_lines = max(items[key].spec.count("\n") + 1, 1)
             self._set_row_heights(ws, {row_base + offset: 15 for offset in range(9)})
             ws.row_dimensions[row_base + 3].height = max(30, spec_lines * 14)
             merged_ranges.append(f"A{row_base}:A{row_base + 8}")
@@ -1610,32 +1813,18 @@ class Quotation:
         for ref in ["A2", "C2", "A3", "C3"]:
             self._style_cell(ws[ref], font=self.header_font, alignment=left_wrap)
 
-        self._style_range(
-            ws,
-            4,
-            blank_row - 1,
-            1,
-            8,
-            font=self.normal_font,
-            alignment=center_wrap,
-            border=self.border,
-        )
+        self.styles.stamp_range(ws, 4, blank_row - 1, 1, 8, "normal")
 
         for row in range(4, blank_row):
             for col in [3, 4, 5, 6]:
-                ws.cell(row, col).alignment = left_wrap
+                self.styles.stamp(ws.cell(row, col), "align-left")
 
         for idx, key in enumerate(sorted_keys):
             row_base = 6 + idx * 9
             item = items[key]
-            item_name = item[0] if len(item) > 0 else ""
-            hs_code = item[1] if len(item) > 1 else ""
-            quantity = item[2] if len(item) > 2 else ""
-            unit = item[3] if len(item) > 3 else ""
-            spec_text = item[4] if len(item) > 4 else ""
-            inspection = item[5] if len(item) > 5 else ""
 
             ws[f"A{row_base}"] = idx + 1
+            choice = self._selected("C", f"A{row_base}", idx + 1)
             ws[f"B{row_base}"] = f'="物资"&A{row_base}'
 
             for offset, label in enumerate(label_rows):
@@ -1643,53 +1832,51 @@ class Quotation:
             for offset, label in enumerate(response_labels):
                 ws[f"E{row_base + offset}"] = label
 
-            ws[f"D{row_base}"] = item_name
-            ws[f"D{row_base + 1}"] = f"{unit}{quantity}"
-            ws[f"D{row_base + 2}"] = hs_code
-            ws[f"D{row_base + 3}"] = spec_text
-            ws[f"D{row_base + 4}"] = inspection
-            ws[f"D{row_base + 5}"].border = self.diag_border
-            ws[f"D{row_base + 6}"].border = self.diag_border
-            ws[f"D{row_base + 7}"].border = self.diag_border
+            ws[f"D{row_base}"] = item.name
+            ws[f"D{row_base + 1}"] = f"{item.quantity_text}{item.unit}"
+            ws[f"D{row_base + 2}"] = item.hs_code
+            ws[f"D{row_base + 3}"] = item.spec
+            ws[f"D{row_base + 4}"] = item.inspection
+            for offset in (5, 6, 7):
+                self.styles.stamp(ws[f"D{row_base + offset}"], "diag-border")
             ws[f"D{row_base + 8}"] = "无"
 
-            ws[f"F{row_base}"] = f'=INDIRECT("物资选择!B"&A{row_base})'
+            ws[f"F{row_base}"] = f"={self._selected('B', f'A{row_base}', idx + 1)}"
             ws[f"F{row_base + 1}"] = (
-                f'=INDEX(全部厂家备用!E$1:E${supplier_last_row},INDIRECT("物资选择!C"&A{row_base}))'
-                f'&INDEX(全部厂家备用!D$1:D${supplier_last_row},INDIRECT("物资选择!C"&A{row_base}))'
+                f'=INDEX(全部厂家备用!E$1:E${supplier_last_row},{choice})'
+                f'&INDEX(全部厂家备用!D$1:D${supplier_last_row},{choice})'
             )
             ws[f"F{row_base + 2}"] = (
-                f'=INDEX(全部厂家备用!C$1:C${supplier_last_row},INDIRECT("物资选择!C"&A{row_base}))'
+                f'=INDEX(全部厂家备用!C$1:C${supplier_last_row},{choice})'
             )
             ws[f"F{row_base + 3}"] = (
-                f'="型号："&INDEX(全部厂家备用!I$1:I${supplier_last_row},INDIRECT("物资选择!C"&A{row_base}))'
-                f'&CHAR(10)&INDEX(全部厂家备用!F$1:F${supplier_last_row},INDIRECT("物资选择!C"&A{row_base}))'
+                f'="型号："&INDEX(全部厂家备用!I$1:I${supplier_last_row},{choice})'
+                f'&CHAR(10)&INDEX(全部厂家备用!F$1:F${supplier_last_row},{choice})'
             )
             ws[f"F{row_base + 4}"] = (
-                f'=INDEX(全部厂家备用!G$1:G${supplier_last_row},INDIRECT("物资选择!C"&A{row_base}))'
+                f'=INDEX(全部厂家备用!G$1:G${supplier_last_row},{choice})'
             )
             ws[f"F{row_base + 5}"] = (
-                f'=INDEX(全部厂家备用!H$1:H${supplier_last_row},INDIRECT("物资选择!C"&A{row_base}))'
+                f'=INDEX(全部厂家备用!H$1:H${supplier_last_row},{choice})'
             )
             ws[f"F{row_base + 6}"] = (
-                f'=INDEX(全部厂家备用!L$1:L${supplier_last_row},INDIRECT("物资选择!C"&A{row_base}))'
+                f'=INDEX(全部厂家备用!L$1:L${supplier_last_row},{choice})'
             )
             ws[f"F{row_base + 7}"] = (
-                f'=INDEX(全部厂家备用!M$1:M${supplier_last_row},INDIRECT("物资选择!C"&A{row_base}))'
+                f'=INDEX(全部厂家备用!M$1:M${supplier_last_row},{choice})'
             )
             ws[f"F{row_base + 8}"] = (
-                f'=INDEX(全部厂家备用!O$1:O${supplier_last_row},INDIRECT("物资选择!C"&A{row_base}))'
+                f'=INDEX(全部厂家备用!O$1:O${supplier_last_row},{choice})'
             )
             ws[f"H{row_base + 3}"] = (
-                f'=INDEX(全部厂家备用!AB$1:AB${supplier_last_row},INDIRECT("物资选择!C"&A{row_base}))'
+                f'=INDEX(全部厂家备用!AB$1:AB${supplier_last_row},{choice})'
             )
 
             for offset in range(9):
                 ws[f"G{row_base + offset}"] = "无偏离"
 
             for ref in [f"D{row_base + 3}", f"F{row_base + 3}", f"H{row_base + 3}"]:
-                ws[ref].font = small_font
-                ws[ref].alignment = left_wrap
+                self.styles.stamp(ws[ref], "small-left")
 
         ws[f"F{stamp_row}"] = "投标人盖章："
         ws[f"F{date_row}"] = "日期："
@@ -1759,71 +1946,150 @@ class Quotation:
                 ws.row_dimensions[current_row].height = 30
                 ws[f"A{current_row}"] = "=ROW()-2"
                 ws[f"B{current_row}"] = item_no
-                ws[f"C{current_row}"] = f'=INDIRECT("物资选择!B"&B{current_row})'
+                choice = self._selected("C", f"B{current_row}", item_no)
+                ws[f"C{current_row}"] = f"={self._selected('B', f'B{current_row}', item_no)}"
                 ws[f"D{current_row}"] = (
-                    f'=INDEX(全部厂家备用!H$1:H${supplier_last_row},INDIRECT("物资选择!C"&B{current_row}))'
+                    f'=INDEX(全部厂家备用!H$1:H${supplier_last_row},{choice})'
                 )
                 ws[f"E{current_row}"] = (
-                    f'=INDEX(全部厂家备用!I$1:I${supplier_last_row},INDIRECT("物资选择!C"&B{current_row}))'
+                    f'=INDEX(全部厂家备用!I$1:I${supplier_last_row},{choice})'
                 )
                 ws[f"F{current_row}"] = (
-                    f'=INDEX(全部厂家备用!L$1:L${supplier_last_row},INDIRECT("物资选择!C"&B{current_row}))'
+                    f'=INDEX(全部厂家备用!L$1:L${supplier_last_row},{choice})'
                 )
                 ws[f"G{current_row}"] = cert_name
                 ws[f"H{current_row}"] = (
-                    f'=INDEX(全部厂家备用!{cert_col}$1:{cert_col}${supplier_last_row},INDIRECT("物资选择!C"&B{current_row}))'
+                    f'=INDEX(全部厂家备用!{cert_col}$1:{cert_col}${supplier_last_row},{choice})'
                 )
                 ws[f"I{current_row}"] = (
-                    f'=INDEX(全部厂家备用!{date_col}$1:{date_col}${supplier_last_row},INDIRECT("物资选择!C"&B{current_row}))'
+                    f'=INDEX(全部厂家备用!{date_col}$1:{date_col}${supplier_last_row},{choice})'
                 )
                 ws[f"I{current_row}"].number_format = 'yyyy"年"m"月"d"日"'
 
-                for col in range(1, 10):
-                    cell = ws.cell(current_row, col)
-                    cell.font = self.normal_font
-                    cell.alignment = self.center
-                    cell.border = self.border
+                self.styles.stamp_row(ws, current_row, 1, 9, "normal")
                 current_row += 1
 
 
-    def generate(self, filename: Optional[str] = None) -> str:
+    def generate(
+        self,
+        filename: Optional[str] = None,
+        backend: str = "openpyxl",
+        lookup: str = "direct",
+        cache_values: bool = False,
+        tax_mode: str = "iterative",
+        profiler: Optional[StageProfiler] = None,
+        shared_formulas: bool = True,
+    ) -> str:
+        """生成报价表。
+
+        backend 为 "openpyxl" 时使用普通内存工作簿；为 "write_only" 时各工作表先写入轻量缓冲，
+        构建完成后立即按行顺序流式写入 write_only 工作簿并释放，适合物资数量很多的项目，输出内容与普通模式一致；
+        为 "xml" 时同样先写入轻量缓冲，再由 spreadsheetml.XmlWorkbook 直接拼接工作表 XML，不创建 openpyxl 单元格对象，
+        字符串写入共享字符串表，单元格内容和样式与普通模式一致，速度最快、占用内存最少。
+        shared_formulas 为真时 xml 输出方式把物资行中逐行相同的公式（对内分项报价表、退抵税额表和全部厂家备用的 K、AL 列）
+        写成共享公式，每列只保存一次公式文本，其余输出方式不支持共享公式，忽略该参数。
+        lookup 为 "direct" 时按物资序号直接引用物资选择表，为 "indirect" 时使用旧的 INDIRECT 写法，计算结果相同。
+        生成后各工作表中剩余的易失函数个数记录在 volatile_counts 中。
+        cache_values 为真时保存后用内置公式计算器写入各公式的缓存值，不经过 Excel 也能读到计算结果。
+        tax_mode 为 "iterative" 时税金按投标总价计算，形成循环引用，需开启迭代计算；为 "closed" 时税金直接写成
+        线性方程的解，工作簿中没有循环引用，关闭迭代计算，与迭代结果最多相差分摊取整带来的几分钱。
+        profiler 为 profiling.StageProfiler 时按工作表记录构建耗时、单元格数和内存，保存和写缓存值也各记一段。
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"未知的报价表输出方式：{backend}")
+        if lookup not in self.LOOKUPS:
+            raise ValueError(f"未知的公式引用方式：{lookup}")
+        if tax_mode not in self.TAX_MODES:
+            raise ValueError(f"未知的税金计算方式：{tax_mode}")
+        self._lookup = lookup
+        self._tax_mode = tax_mode
+        self.volatile_counts = {}
         items = self.project.commodities
         bid_date = self._parse_date(self.project.date)
+        streaming = backend != "openpyxl"
+
+        titles = [
+            "全部厂家备用",
+            "运输费用",
+            "其他费用",
+            "3.开标一览表",
+            "2.采购需求偏离表(物资部分)",
+            "1.投标报价总表",
+            "2.物资对内分项报价表",
+            "3.各项物资退抵税额表",
+        ]
+        if self.project.is_tech:
+            titles.append("4.技术服务费报价表")
+        if self.project.is_cc:
+            titles.append("5.来华培训费报价表")
+        titles.extend(["16.三体系一览表", "物资选择"])
+
+        if backend == "xml":
+            wb = XmlWorkbook(shared_formulas)
+            sheets = {title: wb.create_sheet(title) for title in titles}
+        elif streaming:
+            wb = Workbook(write_only=True)
+            sheets = {title: BufferedSheet(wb.create_sheet(title)) for title in titles}
+        else:
+            wb = Workbook()
+            wb.active.title = titles[0]
+            sheets = {titles[0]: wb.active, **{title: wb.create_sheet(title) for title in titles[1:]}}
+
+        def build(title: str, builder, *args):
+            if profiler is None:
+                return construct(title, builder, *args)
+            with profiler.stage(title, builder.__name__) as record:
+                return construct(title, builder, *args, record=record)
+
+        def construct(title: str, builder, *args, record=None):
+            result = builder(sheets[title], *args)
+            self.volatile_counts[title] = self._count_volatile(sheets[title])
+            if record is not None:
+                record.count(sheets[title])
+            if streaming:
+                sheets[title].flush()  # 写出后释放该表的缓冲内容
+            return result
+
+        build("全部厂家备用", self._build_all_suppliers, items)
+        build("物资选择", self._build_selector, items)
+        build("2.采购需求偏离表(物资部分)", self._build_procurement_deviation_sheet, items)
+        build("运输费用", self._build_fee_input, items)
+        build("其他费用", self._build_other_fees)
+        inner_total_row = build("2.物资对内分项报价表", self._build_inner_quote, len(items))
+        build("3.各项物资退抵税额表", self._build_tax_sheet, len(items), inner_total_row)
+        build("16.三体系一览表", self._build_system_sheet)
+        if self.project.is_tech:
+            build("4.技术服务费报价表", self._build_tech_sheet)
+        if self.project.is_cc:
+            build("5.来华培训费报价表", self._build_train_sheet)
+        build("1.投标报价总表", self._build_total_sheet, inner_total_row, self._tax_total_row, bid_date)
+        build("3.开标一览表", self._build_opening_sheet, bid_date)
 
-        wb = Workbook()
-        ws_all = wb.active
-        ws_fee = wb.create_sheet("运输费用")
-        ws_other_fee = wb.create_sheet("其他费用")
-        ws_open = wb.create_sheet("3.开标一览表")
-        ws_procurement = wb.create_sheet("2.采购需求偏离表(物资部分)")
-        ws_total = wb.create_sheet("1.投标报价总表")
-        ws_inner = wb.create_sheet("2.物资对内分项报价表")
-        ws_tax = wb.create_sheet("3.各项物资退抵税额表")
-        ws_tech = wb.create_sheet("4.技术服务费报价表") if self.project.is_tech else None
-        ws_train = wb.create_sheet("5.来华培训费报价表") if self.project.is_cc else None
-        ws_system = wb.create_sheet("16.三体系一览表")
-        ws_pick = wb.create_sheet("物资选择")
-
-        self._build_all_suppliers(ws_all, items)
-        self._build_selector(ws_pick, items)
-        self._build_procurement_deviation_sheet(ws_procurement, items)
-        self._build_fee_input(ws_fee, items)
-        self._build_other_fees(ws_other_fee)
-        inner_total_row = self._build_inner_quote(ws_inner, len(items))
-        self._build_tax_sheet(ws_tax, len(items), inner_total_row)
-        self._build_system_sheet(ws_system)
-        if ws_tech is not None:
-            self._build_tech_sheet(ws_tech)
-        if ws_train is not None:
-            self._build_train_sheet(ws_train)
-        self._build_total_sheet(ws_total, inner_total_row, self._tax_total_row, bid_date)
-        self._build_opening_sheet(ws_open, bid_date)
+        closed_form = tax_mode == "closed"
+        self.layout = QuotationLayout(
+            len(items), self.project.is_tech, self.project.is_cc, self._total_sheet_total_row, closed_form
+        )
 
         wb.calculation.fullCalcOnLoad = True
-        wb.calculation.iterate = True
-        wb.calculation.iterateCount = 100
-        wb.calculation.iterateDelta = 0.001
+        wb.calculation.iterate = not closed_form
+        if not closed_form:
+            wb.calculation.iterateCount = 100
+            wb.calculation.iterateDelta = 0.001
         if not filename:
             filename = f"投标报价表-{self._safe_name(self.project.name)}.xlsx"
-        wb.save(filename)
+        if profiler is None:
+            wb.save(filename)
+        else:
+            with profiler.stage("保存", "save"):
+                wb.save(filename)
+        if cache_values:
+            if profiler is None:
+                fill_cached_values(filename, prepare=self.layout.prepare_values)
+            else:
+                with profiler.stage("写入缓存值", "fill_cached_values"):
+                    fill_cached_values(filename, prepare=self.layout.prepare_values)
         return filename
+
+    def pricing_model(self, evaluator: Evaluator) -> PricingModel:
+        """从最近一次生成的报价表读取输入，建立向量化的报价计算模型，见 QuotationLayout.pricing_model。"""
+        return self.layout.pricing_model(evaluator)
@@ -0,0 +1,350 @@
+"""报价表公式的重算方式：打开 xlsx、重算全部公式并保存，使 load_workbook(data_only=True) 能读到计算结果。
+
+- excel：通过 PowerShell 调用 Microsoft Excel（仅 Windows），一批文件共用一个 Excel 进程
+- libreoffice：若干常驻的无界面 soffice 进程，经本地 UNO 套接字打开、重算并保存，一批文件只启动一次
+- formula：内置的 formula.py 计算器
+- none：不重算，保留文件中已有的缓存值
+- auto：依次尝试 excel、formula
+
+重算方式由环境变量 BIDDING_RECALC 选择，默认为 auto；BIDDING_RECALC_WORKERS 为 libreoffice 的进程数，
+BIDDING_SOFFICE 为 soffice 可执行文件的路径。各方式失败时抛出 RecalculationError，不会静默退回到旧的缓存值。
+
+    with recalculator_from_config() as recalculator:
+        recalculator.recalculate_many(["投标报价表-甲.xlsx", "投标报价表-乙.xlsx"])
+"""
+from __future__ import annotations
+
+import atexit
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from os.path import abspath
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from formula import FormulaError, fill_cached_values
+
+RECALC_ENV = "BIDDING_RECALC"
+WORKERS_ENV = "BIDDING_RECALC_WORKERS"
+SOFFICE_ENV = "BIDDING_SOFFICE"
+
+
+class RecalculationError(RuntimeError):
+    """重算公式失败，消息中说明失败的方式和原因。"""
+
+
+class Recalculator(ABC):
+    """重算方式的接口；持有外部进程的实现应在 close 时结束进程，可以用作上下文管理器。"""
+
+    name = ""
+    recalculates = True  # 为假时不改动缓存值，拆分前不记录重算时的输入
+
+    @abstractmethod
+    def recalculate(self, filename: str) -> None:
+        """重算 filename 中的全部公式并保存，失败时抛出 RecalculationError。"""
+
+    def recalculate_many(self, filenames: List[str]) -> None:
+        for filename in filenames:
+            self.recalculate(filename)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "Recalculator":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class NoRecalculator(Recalculator):
+    """不重算，拆分时使用文件中已有的缓存值。"""
+
+    name = "none"
+    recalculates = False
+
+    def recalculate(self, filename: str) -> None:
+        pass
+
+
+class FormulaRecalculator(Recalculator):
+    """用内置的 formula.py 计算公式并写回缓存值。"""
+
+    name = "formula"
+
+    def recalculate(self, filename: str) -> None:
+        try:
+            fill_cached_values(filename)
+        except FormulaError as exc:
+            raise RecalculationError(f"内置计算器无法计算 {filename}：{exc}") from exc
+
+
+class ExcelRecalculator(Recalculator):
+    """通过 PowerShell 调用 Excel 重算并保存；recalculate_many 的所有文件在同一个 Excel 进程中处理。"""
+
+    name = "excel"
+
+    def recalculate(self, filename: str) -> None:
+        self.recalculate_many([filename])
+
+    def recalculate_many(self, filenames: List[str]) -> None:
+        if not filenames:
+            return
+        paths = ", ".join("'" + abspath(filename).replace("'", "''") + "'" for filename in filenames)
+        command = (
+            "$ErrorActionPreference = 'Stop'; "
+            "$excel = $null; "
+            "try { "
+            "$excel = New-Object -ComObject Excel.Application; "
+            "$excel.Visible = $false; "
+            "$excel.DisplayAlerts = $false; "
+            f"foreach ($path in @({paths})) {{ "
+            "$workbook = $excel.Workbooks.Open($path); "
+            "try { $excel.CalculateFullRebuild(); $workbook.Save() } "
+            "finally { $workbook.Close($true) } "
+            "} "
+            "} finally { "
+            "if ($excel -ne $null) { $excel.Quit() }"
+            " }"
+        )
+        try:
+            subprocess.run(
+                ["powershell", "-NoProfile", "-Command", command],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+        except FileNotFoundError as exc:
+            raise RecalculationError("未找到 PowerShell，无法调用 Excel 重算") from exc
+        except subprocess.CalledProcessError as exc:
+            message = (exc.stderr or exc.stdout or "").strip() or f"退出码 {exc.returncode}"
+            raise RecalculationError(f"Excel 重算失败：{message}") from exc
+
+
+class _SofficeWorker:
+    """一个无界面的 soffice 进程及其 UNO 连接，使用单独的用户配置目录，多个进程可以同时运行。"""
+
+    def __init__(self, soffice: str, timeout: float) -> None:
+        import uno  # LibreOffice 自带的 Python 绑定，只有使用 libreoffice 方式时才需要
+
+        self.uno = uno
+        with socket.socket() as probe:  # 由系统分配一个空闲端口
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        self.profile = tempfile.mkdtemp(prefix="bidding-soffice-")
+        try:
+            self.process = subprocess.Popen(
+                [
+                    soffice,
+                    "--headless",
+                    "--invisible",
+                    "--nologo",
+                    "--norestore",
+                    "--nodefault",
+                    f"-env:UserInstallation={Path(self.profile).as_uri()}",
+                    f"--accept=socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext",
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError:
+            shutil.rmtree(self.profile, ignore_errors=True)
+            raise
+        self.desktop = self._connect(port, timeout)
+
+    def _connect(self, port: int, timeout: float):
+        local = self.uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        url = f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext"
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                context = resolver.resolve(url)
+                return context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+            except Exception as exc:  # soffice 尚未开始监听，或已经退出
+                if self.process.poll() is not None:
+                    self.close()
+                    raise RecalculationError(f"soffice 启动失败，退出码 {self.process.returncode}") from exc
+                if time.monotonic() > deadline:
+                    self.close()
+                    raise RecalculationError(f"{timeout:.0f} 秒内未能连接 soffice") from exc
+                time.sleep(0.2)
+
+    def _property(self, name: str, value):
+        from com.sun.star.beans import PropertyValue
+
+        return PropertyValue(name, 0, value, 0)
+
+    def recalculate(self, filename: str) -> None:
+        url = self.uno.systemPathToFileUrl(abspath(filename))
+        document = self.desktop.loadComponentFromURL(url, "_blank", 0, (self._property("Hidden", True),))
+        if document is None:
+            raise RecalculationError(f"LibreOffice 无法打开 {filename}")
+        try:
+            document.calculateAll()
+            document.storeToURL(
+                url,
+                (self._property("FilterName", "Calc MS Excel 2007 XML"), self._property("Overwrite", True)),
+            )
+        finally:
+            document.close(True)
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def close(self) -> None:
+        try:
+            if self.alive():
+                try:
+                    self.desktop.terminate()
+                except Exception:  # 连接已断开，直接结束进程
+                    pass
+                try:
+                    self.process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+                    self.process.wait()
+        finally:
+            shutil.rmtree(self.profile, ignore_errors=True)
+
+
+class LibreOfficeRecalculator(Recalculator):
+    """常驻的无界面 soffice 进程池。进程在第一次重算时启动，此后所有文件复用，close 时结束。
+
+    recalculate_many 把文件分给各个进程同时处理；单个进程在处理中崩溃时重启一次并重试该文件。
+    """
+
+    name = "libreoffice"
+
+    def __init__(self, workers: int = 1, soffice: Optional[str] = None, timeout: float = 60.0) -> None:
+        self.workers = max(1, workers)
+        self.soffice = soffice or os.environ.get(SOFFICE_ENV) or shutil.which("soffice") or "soffice"
+        self.timeout = timeout
+        self._idle: "queue.Queue[_SofficeWorker]" = queue.Queue()
+        self._started: List[_SofficeWorker] = []
+        atexit.register(self.close)  # 调用方忘记 close 时，退出前结束 soffice 进程；close 之后可以再次启动
+
+    def _start(self) -> None:
+        if self._started:
+            return
+        try:
+            for _ in range(self.workers):
+                worker = _SofficeWorker(self.soffice, self.timeout)
+                self._started.append(worker)
+                self._idle.put(worker)
+        except ImportError as exc:
+            self.close()
+            raise RecalculationError("libreoffice 方式需要 LibreOffice 自带的 Python 绑定（uno）") from exc
+        except OSError as exc:
+            self.close()
+            raise RecalculationError(f"无法启动 soffice：{exc}") from exc
+        except BaseException:  # 其余进程连接失败等，结束已经启动的进程
+            self.close()
+            raise
+
+    def recalculate(self, filename: str) -> None:
+        self._start()
+        worker = self._idle.get()
+        try:
+            try:
+                worker.recalculate(filename)
+            except RecalculationError:
+                raise
+            except Exception as exc:
+                if worker.alive():
+                    raise RecalculationError(f"LibreOffice 重算 {filename} 失败：{exc}") from exc
+                dead, worker = worker, None  # 重启失败时不把崩溃的进程放回空闲队列
+                worker = self._restart(dead)
+                try:
+                    worker.recalculate(filename)
+                except Exception as retry:
+                    raise RecalculationError(f"LibreOffice 重算 {filename} 失败：{retry}") from retry
+        finally:
+            if worker is not None:
+                self._idle.put(worker)
+
+    def _restart(self, worker: _SofficeWorker) -> _SofficeWorker:
+        """结束崩溃的进程并启动一个新的替换它；新进程启动失败时进程池少一个进程。"""
+        self._started.remove(worker)
+        worker.close()
+        try:
+            replacement = _SofficeWorker(self.soffice, self.timeout)
+        except Exception as exc:
+            raise RecalculationError(f"soffice 崩溃后未能重新启动：{exc}") from exc
+        self._started.append(replacement)
+        return replacement
+
+    def recalculate_many(self, filenames: List[str]) -> None:
+        self._start()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for future in [executor.submit(self.recalculate, filename) for filename in filenames]:
+                future.result()
+
+    def close(self) -> None:
+        while self._started:
+            self._started.pop().close()
+        self._idle = queue.Queue()
+
+
+class FallbackRecalculator(Recalculator):
+    """依次尝试多个重算方式，第一个成功的为准；全部失败时抛出的异常中列出每个方式的失败原因。
+
+    failures 记录最近一次重算中失败、被后面的方式接替的原因，调用方可以据此提示用户。
+    """
+
+    name = "auto"
+
+    def __init__(self, recalculators: List[Recalculator]) -> None:
+        self.recalculators = recalculators
+        self.failures: Dict[str, str] = {}
+
+    def recalculate(self, filename: str) -> None:
+        self.failures = {}
+        for recalculator in self.recalculators:
+            try:
+                recalculator.recalculate(filename)
+                return
+            except RecalculationError as exc:
+                self.failures[recalculator.name] = str(exc)
+        reasons = "；".join(f"{name}：{reason}" for name, reason in self.failures.items())
+        raise RecalculationError(f"所有重算方式均失败（{reasons}）")
+
+    def close(self) -> None:
+        for recalculator in self.recalculators:
+            recalculator.close()
+
+
+RECALCULATORS = ("auto", "excel", "libreoffice", "formula", "none")
+
+
+def create_recalculator(name: str = "auto", workers: int = 1) -> Recalculator:
+    """按名称创建重算方式，workers 只对 libreoffice 有效。"""
+    if name == "auto":
+        return FallbackRecalculator([ExcelRecalculator(), FormulaRecalculator()])
+    if name == "excel":
+        return ExcelRecalculator()
+    if name == "libreoffice":
+        return LibreOfficeRecalculator(workers)
+    if name == "formula":
+        return FormulaRecalculator()
+    if name == "none":
+        return NoRecalculator()
+    raise ValueError(f"未知的重算方式：{name}，可选 {'、'.join(RECALCULATORS)}")
+
+
+def recalculator_from_config(name: Optional[str] = None, workers: Optional[int] = None) -> Recalculator:
+    """按环境变量 BIDDING_RECALC 和 BIDDING_RECALC_WORKERS 创建重算方式；name、workers 给出时代替对应的环境变量。"""
+    name = name or os.environ.get(RECALC_ENV, "").strip().lower() or "auto"
+    if workers is None:
+        value = os.environ.get(WORKERS_ENV, "").strip()
+        try:
+            workers = int(value) if value else 1
+        except ValueError:
+            raise RecalculationError(f"环境变量 {WORKERS_ENV} 应为整数：{value}") from None
+    return create_recalculator(name, workers)
@@ -1,17 +1,109 @@
+import argparse
+import json
+import multiprocessing
+import os
 import re
-import subprocess
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from os.path import abspath
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from openpyxl import load_workbook
 
+from cachecheck import CacheReport, StaleCacheError, check_cache, record_calculation
+from recalc import (
+    RECALCULATORS,
+    RecalculationError,
+    Recalculator,
+    recalculator_from_config,
+)
+from xlsxpackage import PackageSplitter, workbook_sheet_names
+
+# 增量拆分的记录文件，保存在拆分结果所在的目录（当前目录）中：输出文件名 -> 内容哈希、拆分方式和写出时的文件大小、修改时间
+MANIFEST_NAME = ".拆分记录.json"
+MANIFEST_VERSION = 1
+
+# 工作进程中已读取的拆分来源：(文件名, 拆分方式, openpyxl 工作簿或 PackageSplitter)，同一进程的后续工作表直接复用
+_SOURCE: Optional[Tuple[str, str, object]] = None
+
+
+def _read_manifest(path: str) -> Dict[str, Dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data.get("sheets", {}) if data.get("version") == MANIFEST_VERSION else {}
+
+
+def _write_manifest(path: str, sheets: Dict[str, Dict]) -> None:
+    temp_path = f"{path}.tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "sheets": sheets}, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+    except OSError:
+        pass  # 记录写入失败时下次全部重新拆分
+
+
+def _up_to_date(entry: Optional[Dict], digest: str, backend: str, output_name: str) -> bool:
+    """输出文件存在、未被改动过，且记录中的内容哈希和拆分方式与本次相同。"""
+    if not entry or entry.get("sha256") != digest or entry.get("backend") != backend:
+        return False
+    try:
+        stat = os.stat(output_name)
+    except OSError:
+        return False
+    return stat.st_size == entry.get("size") and stat.st_mtime_ns == entry.get("mtime_ns")
+
+
+def _open_source(filename: str, backend: str):
+    if backend == "package":
+        return PackageSplitter(filename)
+    return load_workbook(filename, data_only=True)
+
+
+def _save_sheet(workbook, sheet, output_name: str) -> None:
+    """让工作簿只保留 sheet 后另存，保存后恢复原有的工作表列表。"""
+    sheets = workbook._sheets
+    active = workbook._active_sheet_index
+    try:
+        workbook._sheets = [sheet]
+        workbook._active_sheet_index = 0
+        workbook.save(output_name)
+    finally:
+        workbook._sheets = sheets
+        workbook._active_sheet_index = active
+
+
+def _export_sheet(filename: str, backend: str, name: str, output_name: str) -> str:
+    """进程池中导出一个工作表；来源在每个进程中只读取一次，fork 启动时直接使用父进程已读取的工作簿。"""
+    global _SOURCE
+    if _SOURCE is None or _SOURCE[:2] != (filename, backend):
+        _SOURCE = (filename, backend, _open_source(filename, backend))
+    source = _SOURCE[2]
+    if backend == "package":
+        source.export(name, output_name)
+    else:
+        _save_sheet(source, source[name], output_name)
+    return output_name
+
 
 class Separate:
     """将报价表按工作表拆分为单独文件，并固化为缓存数值。"""
 
     workbook_pattern = re.compile(r"^投标报价表-?[\w\S]*\.xlsx$")
     sheet_pattern = re.compile(r"^[0-9]{1,2}\.\w*")
+    BACKENDS = ("openpyxl", "package")
+
+    def __init__(self, recalculator: Optional[Recalculator] = None) -> None:
+        # 拆分前刷新公式缓存值的方式，默认按环境变量 BIDDING_RECALC 选择，见 recalc.py；
+        # 拆分多个报价表时传入同一个实例，LibreOffice 等外部进程只启动一次
+        self.recalculator = recalculator if recalculator is not None else recalculator_from_config()
+        self.written: List[str] = []  # 最近一次拆分实际写出的文件
+        self.skipped: List[str] = []  # 最近一次增量拆分中内容未变、没有重写的文件
+        self.cache_report: Optional[CacheReport] = None  # 最近一次拆分前公式缓存值的检查结果
 
     @staticmethod
     def _safe_name(name: str) -> str:
@@ -22,67 +114,215 @@ class Separate:
         return result.strip()
 
     def _find_workbook_name(self) -> str:
-        matches = [
-            path
-            for path in Path.cwd().iterdir()
-            if path.is_file() and re.match(self.workbook_pattern, path.name)
-        ]
-        if matches:
-            latest = max(matches, key=lambda path: path.stat().st_mtime)
-            return latest.name
+        """当前目录中最近修改、且含有可拆分工作表的 投标报价表-*.xlsx。"""
+        matches = sorted(
+            (path for path in Path.cwd().iterdir() if path.is_file() and re.match(self.workbook_pattern, path.name)),
+            key=lambda path: path.stat().st_mtime,
+            reverse=True,
+        )
+        for path in matches:
+            if self._is_quotation(str(path)):
+                return path.name
         raise FileNotFoundError("No 投标报价表-*.xlsx file found in current directory.")
 
-    @staticmethod
-    def _refresh_formula_cache(filename: str) -> None:
-        workbook_path = abspath(filename).replace("'", "''")
-        command = (
-            "$excel = $null; "
-            "$workbook = $null; "
-            "try { "
-            "$excel = New-Object -ComObject Excel.Application; "
-            "$excel.Visible = $false; "
-            "$excel.DisplayAlerts = $false; "
-            f"$workbook = $excel.Workbooks.Open('{workbook_path}'); "
-            "$excel.CalculateFullRebuild(); "
-            "$workbook.Save(); "
-            "} finally { "
-            "if ($workbook -ne $null) { $workbook.Close($true) }; "
-            "if ($excel -ne $null) { $excel.Quit() }"
-            " }"
-        )
+    def _is_quotation(self, filename: str) -> bool:
+        """只读取 workbook.xml 判断文件是否为含有编号工作表的报价表；损坏或未写完的文件视为不是。"""
         try:
-            subprocess.run(
-                ["powershell", "-NoProfile", "-Command", command],
-                check=True,
-                capture_output=True,
-                text=True,
-            )
-        except (FileNotFoundError, subprocess.CalledProcessError):
-            # 未安装 Excel 或当前环境不支持 COM 时，退回到已有缓存值。
-            pass
-
-    def generate(self, workbook_name: Optional[str] = None) -> List[str]:
+            return any(re.match(self.sheet_pattern, name) for name in workbook_sheet_names(filename))
+        except (OSError, KeyError, zipfile.BadZipFile):
+            return False
+
+    def _refresh_formula_cache(self, filename: str) -> None:
+        """按配置的重算方式刷新公式缓存值，失败时抛出 RecalculationError。"""
+        self.recalculator.recalculate(filename)
+
+    def _check_formula_cache(self, filename: str, allow_stale: bool) -> None:
+        """检查缓存值是否缺失或过期；刚重算过时记录当前输入，供之后不重算的拆分比较。"""
+        report = check_cache(filename)
+        if self.recalculator.recalculates:
+            record_calculation(filename, report)
+        self.cache_report = report
+        if not report.ok and not allow_stale:
+            raise StaleCacheError(f"{report.summary()}，拆分结果会是空白或旧的数值")
+
+    def generate(
+        self,
+        workbook_name: Optional[str] = None,
+        backend: str = "openpyxl",
+        workers: Optional[int] = 1,
+        incremental: bool = False,
+        allow_stale: bool = False,
+        output_dir: str = "",
+    ) -> List[str]:
+        """拆分报价表，返回拆分出的全部文件名，顺序与工作表在报价表中的顺序相同。
+
+        backend 为 "openpyxl" 时读取整个工作簿后逐个另存；为 "package" 时直接复制 xlsx 中的工作表部件，
+        公式替换为缓存值，不经过 openpyxl，报价表很大时快得多。
+        workers 为并行导出工作表的进程数，None 为 CPU 核数，1 时在当前进程中依次导出。
+        incremental 为真时按当前目录的拆分记录跳过内容没有变化的工作表。实际写出和跳过的文件分别记在
+        written 和 skipped 中。
+        重算后公式缓存值仍有缺失，或上次重算之后输入有改动时抛出 StaleCacheError；allow_stale 为真时照常拆分，
+        检查结果记在 cache_report 中，由调用方提示。
+        output_dir 为拆分结果和拆分记录所在的目录，默认为当前目录。
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"未知的拆分方式：{backend}")
         filename = workbook_name or self._find_workbook_name()
         self._refresh_formula_cache(filename)
+        self._check_formula_cache(filename, allow_stale)
+        jobs = self._sheet_jobs(filename, output_dir)
+        pending = jobs
+        if incremental:
+            manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+            with PackageSplitter(filename) as splitter:
+                hashes = {output_name: splitter.content_hash(name) for name, output_name in jobs}
+            manifest = _read_manifest(manifest_path)
+            pending = [
+                (name, output_name)
+                for name, output_name in jobs
+                if not _up_to_date(
+                    manifest.get(os.path.basename(output_name)), hashes[output_name], backend, output_name
+                )
+            ]
 
-        workbook = load_workbook(filename, data_only=True)
-        sheet_names = [
-            sheet.title
-            for sheet in workbook.worksheets
-            if re.match(self.sheet_pattern, sheet.title)
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(pending) > 1:
+            self._split_parallel(filename, backend, workers, pending)
+        elif backend == "package":
+            self._split_package(filename, pending)
+        else:
+            self._split(filename, pending)
+        self.written = [output_name for _, output_name in pending]
+        self.skipped = [output_name for _, output_name in jobs if output_name not in self.written]
+
+        if incremental:
+            for output_name in self.written:
+                stat = os.stat(output_name)
+                manifest[os.path.basename(output_name)] = {
+                    "sha256": hashes[output_name],
+                    "backend": backend,
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                }
+            _write_manifest(manifest_path, manifest)
+        return [output_name for _, output_name in jobs]
+
+    def _sheet_jobs(self, filename: str, output_dir: str = "") -> List[Tuple[str, str]]:
+        """需要拆分的工作表及输出文件名：(工作表名, 文件名)，按工作表在报价表中的顺序排列。"""
+        names = workbook_sheet_names(filename)
+        return [
+            (name, os.path.join(output_dir, f"{self._safe_name(name)}.xlsx"))
+            for name in names
+            if re.match(self.sheet_pattern, name)
         ]
-        workbook.close()
 
-        output_files = []
-        for name in sheet_names:
-            wb_now = load_workbook(filename, data_only=True)
-            for sheet in list(wb_now.worksheets):
-                if sheet.title != name:
-                    wb_now.remove(sheet)
+    @staticmethod
+    def _split(filename: str, jobs: List[Tuple[str, str]]) -> None:
+        """只读取一次报价表，依次让工作簿只保留一个工作表并另存，结果与逐个重新读取后删除其余工作表相同。"""
+        if not jobs:
+            return
+        workbook = load_workbook(filename, data_only=True)
+        try:
+            for name, output_name in jobs:
+                _save_sheet(workbook, workbook[name], output_name)
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def _split_package(filename: str, jobs: List[Tuple[str, str]]) -> None:
+        """按 xlsx 包结构拆分，见 xlsxpackage.PackageSplitter。"""
+        with PackageSplitter(filename) as splitter:
+            for name, output_name in jobs:
+                splitter.export(name, output_name)
+
+    @staticmethod
+    def _split_parallel(filename: str, backend: str, workers: int, jobs: List[Tuple[str, str]]) -> None:
+        """用进程池并行导出各工作表，文件名与依次导出时相同。
+
+        openpyxl 读取整个工作簿的开销和导出相当，支持 fork 时在父进程中读取一次，子进程直接共享；
+        否则（如 Windows）每个工作进程各自读取一次。package 方式读取包结构的开销很小，每个工作进程各自打开报价表，
+        避免多个进程共用同一个文件句柄。
+        """
+        global _SOURCE
+        context = None
+        if backend == "openpyxl" and "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+            _SOURCE = (filename, backend, _open_source(filename, backend))
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=context) as executor:
+                futures = [
+                    executor.submit(_export_sheet, filename, backend, name, abspath(output_name))
+                    for name, output_name in jobs
+                ]
+                for future in futures:
+                    future.result()
+        finally:
+            _SOURCE = None
+
+
+def _split_one(separate: Separate, workbook: Optional[str], args, output_dir: str = "") -> bool:
+    """拆分一个报价表并输出结果，失败时返回 False。"""
+    try:
+        output_files = separate.generate(
+            workbook,
+            backend=args.backend,
+            workers=args.workers or None,
+            incremental=not args.full,
+            allow_stale=args.allow_stale,
+            output_dir=output_dir,
+        )
+    except RecalculationError as exc:
+        print(f"<<< 刷新公式缓存失败，未拆分：{exc} >>>")
+        return False
+    except StaleCacheError as exc:
+        print(f"<<< 未拆分：{exc}；确认无误时加 --allow-stale >>>")
+        return False
+    if not separate.cache_report.ok:
+        print(f"!!! 警告：{separate.cache_report.summary()} !!!")
+    for output_name in separate.written:
+        print(f"已更新：{output_name}")
+    for output_name in separate.skipped:
+        print(f"未变化：{output_name}")
+    print(f"<<< 已拆分报价表，共 {len(output_files)} 个文件，更新 {len(separate.written)} 个 >>>")
+    return True
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="将报价表中编号的工作表拆分为单独的 Excel 文件。只有一个报价表时输出到当前目录；"
+        "给出多个报价表时各自输出到报价表旁与其同名的文件夹，共用一组重算进程。"
+    )
+    parser.add_argument("workbooks", nargs="*", help="报价表文件，默认为当前目录中最近修改的 投标报价表-*.xlsx")
+    parser.add_argument("--backend", choices=Separate.BACKENDS, default="openpyxl", help="拆分方式")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="并行导出的进程数，0 为 CPU 核数，默认依次导出")
+    parser.add_argument("--recalc", choices=RECALCULATORS, help="拆分前刷新公式缓存值的方式，默认按环境变量 BIDDING_RECALC")
+    parser.add_argument(
+        "--recalc-workers", type=int, help="libreoffice 重算方式的进程数，默认按环境变量 BIDDING_RECALC_WORKERS"
+    )
+    parser.add_argument("--full", action="store_true", help="全部重新拆分，不跳过内容未变的工作表")
+    parser.add_argument("--allow-stale", action="store_true", help="公式缓存值缺失或过期时仍然拆分")
+    args = parser.parse_args(argv)
+
+    try:
+        recalculator = recalculator_from_config(args.recalc, args.recalc_workers)
+    except RecalculationError as exc:
+        print(f"<<< {exc} >>>")
+        return 1
+    failed = 0
+    with recalculator:  # 所有报价表共用一个重算方式，LibreOffice 等外部进程只启动一次
+        separate = Separate(recalculator)
+        if len(args.workbooks) <= 1:
+            failed += not _split_one(separate, args.workbooks[0] if args.workbooks else None, args)
+        else:
+            for workbook in args.workbooks:
+                output_dir = os.path.splitext(workbook)[0]
+                os.makedirs(output_dir, exist_ok=True)
+                print(f"<<< {workbook} → {output_dir} >>>")
+                failed += not _split_one(separate, workbook, args, output_dir)
+    if len(args.workbooks) > 1:
+        print(f"<<< 共 {len(args.workbooks)} 个报价表，失败 {failed} 个 >>>")
+    return 1 if failed else 0
 
-            output_name = f"{self._safe_name(name)}.xlsx"
-            wb_now.save(output_name)
-            wb_now.close()
-            output_files.append(output_name)
 
-        return output_files
+if __name__ == "__main__":
+    raise SystemExit(main())
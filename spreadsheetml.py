@@ -0,0 +1,299 @@
+"""直接写出 SpreadsheetML 的报价表工作簿，不创建 openpyxl 的单元格对象，也不经过其逐个元素的序列化。
+
+工作表内容沿用 streaming.BufferedSheet 收集，构建完成后按行拼接 sheetData、cols、mergeCells 等 XML 文本写入临时文件；
+保存时与共享字符串表、样式表和工作簿部件一起打包成 xlsx。样式仍登记在一个 openpyxl Workbook 中，
+样式编号和 styles.xml 与 openpyxl 的结果一致。逐行平移的同一公式可以登记为共享公式，只在首个单元格写出公式文本。
+"""
+from __future__ import annotations
+
+import io
+import shutil
+import tempfile
+import zipfile
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+from openpyxl import Workbook
+from openpyxl.cell.cell import ERROR_CODES, ILLEGAL_CHARACTERS_RE
+from openpyxl.compat import NUMERIC_TYPES, safe_string
+from openpyxl.formula.translate import Translator
+from openpyxl.packaging.core import DocumentProperties
+from openpyxl.styles.stylesheet import write_stylesheet
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.utils.datetime import to_excel
+from openpyxl.utils.exceptions import IllegalCharacterError
+from openpyxl.workbook.properties import CalcProperties
+from openpyxl.worksheet.cell_range import CellRange
+from openpyxl.writer.theme import theme_xml
+from openpyxl.xml.functions import tostring
+
+from streaming import BufferedCell, BufferedSheet
+
+SHEET_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PACKAGE_RELS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CONTENT_TYPES = "http://schemas.openxmlformats.org/package/2006/content-types"
+OFFICE_TYPE = "application/vnd.openxmlformats-officedocument"
+
+_TEXT_ENTITIES = {"\r": "&#13;"}
+_DATE_TYPES = (datetime, date, time, timedelta)
+
+
+class XmlWorkbook:
+    """与 openpyxl Workbook 用法相近的最小工作簿：create_sheet、calculation 和 save。"""
+
+    def __init__(self, shared_formulas: bool = True) -> None:
+        self.shared_formulas = shared_formulas  # 为假时登记的共享公式仍逐个写出，用于比较
+        self.styles = Workbook()  # 只用于登记样式，单元格的样式编号指向其中的列表
+        self.calculation = CalcProperties()
+        self.sheets: List[XmlSheet] = []
+        self._strings: Dict[str, int] = {}
+
+    def create_sheet(self, title: str) -> "XmlSheet":
+        sheet = XmlSheet(self, title)
+        self.sheets.append(sheet)
+        return sheet
+
+    def shared_string(self, text: str) -> int:
+        index = self._strings.get(text)
+        if index is None:
+            if ILLEGAL_CHARACTERS_RE.search(text):
+                raise IllegalCharacterError(f"{text} cannot be used in worksheets.")
+            index = self._strings[text] = len(self._strings)
+        return index
+
+    def save(self, filename: str) -> None:
+        for sheet in self.sheets:
+            if sheet.part is None:
+                sheet.flush()
+        with zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("[Content_Types].xml", self._content_types())
+            archive.writestr("_rels/.rels", self._package_rels())
+            archive.writestr("docProps/core.xml", tostring(DocumentProperties().to_tree()))
+            archive.writestr("docProps/app.xml", self._app_properties())
+            archive.writestr("xl/workbook.xml", self._workbook_xml())
+            archive.writestr("xl/_rels/workbook.xml.rels", self._workbook_rels())
+            archive.writestr("xl/styles.xml", tostring(write_stylesheet(self.styles)))
+            archive.writestr("xl/theme/theme1.xml", theme_xml)
+            archive.writestr("xl/sharedStrings.xml", self._shared_strings())
+            for index, sheet in enumerate(self.sheets, start=1):
+                sheet.part.seek(0)
+                with archive.open(f"xl/worksheets/sheet{index}.xml", "w") as target:
+                    shutil.copyfileobj(sheet.part, target)
+                sheet.part.close()
+                sheet.part = None
+
+    def _content_types(self) -> str:
+        overrides = [
+            ("/xl/workbook.xml", f"{OFFICE_TYPE}.spreadsheetml.sheet.main+xml"),
+            ("/xl/styles.xml", f"{OFFICE_TYPE}.spreadsheetml.styles+xml"),
+            ("/xl/theme/theme1.xml", f"{OFFICE_TYPE}.theme+xml"),
+            ("/xl/sharedStrings.xml", f"{OFFICE_TYPE}.spreadsheetml.sharedStrings+xml"),
+            ("/docProps/core.xml", "application/vnd.openxmlformats-package.core-properties+xml"),
+            ("/docProps/app.xml", f"{OFFICE_TYPE}.extended-properties+xml"),
+            *(
+                (f"/xl/worksheets/sheet{index}.xml", f"{OFFICE_TYPE}.spreadsheetml.worksheet+xml")
+                for index in range(1, len(self.sheets) + 1)
+            ),
+        ]
+        return (
+            f'<Types xmlns="{CONTENT_TYPES}">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            + "".join(f'<Override PartName="{part}" ContentType="{kind}"/>' for part, kind in overrides)
+            + "</Types>"
+        )
+
+    @staticmethod
+    def _package_rels() -> str:
+        return (
+            f'<Relationships xmlns="{PACKAGE_RELS}">'
+            f'<Relationship Id="rId1" Type="{REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+            f'<Relationship Id="rId2" Type="{PACKAGE_RELS}/metadata/core-properties" Target="docProps/core.xml"/>'
+            f'<Relationship Id="rId3" Type="{REL_NS}/extended-properties" Target="docProps/app.xml"/>'
+            "</Relationships>"
+        )
+
+    @staticmethod
+    def _app_properties() -> str:
+        return (
+            '<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties">'
+            "<Application>Microsoft Excel</Application></Properties>"
+        )
+
+    def _workbook_xml(self) -> str:
+        sheets = "".join(
+            f'<sheet name={quoteattr(sheet.title)} sheetId="{index}" r:id="rId{index}"/>'
+            for index, sheet in enumerate(self.sheets, start=1)
+        )
+        return (
+            f'<workbook xmlns="{SHEET_MAIN}" xmlns:r="{REL_NS}"><workbookPr/>'
+            '<bookViews><workbookView activeTab="0"/></bookViews>'
+            f"<sheets>{sheets}</sheets>{tostring(self.calculation.to_tree()).decode('utf-8')}</workbook>"
+        )
+
+    def _workbook_rels(self) -> str:
+        count = len(self.sheets)
+        relations = [
+            f'<Relationship Id="rId{index}" Type="{REL_NS}/worksheet" Target="worksheets/sheet{index}.xml"/>'
+            for index in range(1, count + 1)
+        ]
+        relations.append(f'<Relationship Id="rId{count + 1}" Type="{REL_NS}/styles" Target="styles.xml"/>')
+        relations.append(f'<Relationship Id="rId{count + 2}" Type="{REL_NS}/theme" Target="theme/theme1.xml"/>')
+        relations.append(
+            f'<Relationship Id="rId{count + 3}" Type="{REL_NS}/sharedStrings" Target="sharedStrings.xml"/>'
+        )
+        return f'<Relationships xmlns="{PACKAGE_RELS}">{"".join(relations)}</Relationships>'
+
+    def _shared_strings(self) -> str:
+        items = []
+        for text in self._strings:
+            space = ' xml:space="preserve"' if text != text.strip() else ""
+            items.append(f"<si><t{space}>{escape(text, _TEXT_ENTITIES)}</t></si>")
+        count = len(items)
+        return f'<sst xmlns="{SHEET_MAIN}" count="{count}" uniqueCount="{count}">{"".join(items)}</sst>'
+
+
+class XmlSheet(BufferedSheet):
+    """收集方式与 BufferedSheet 相同，flush 时直接拼接工作表 XML 写入临时文件。"""
+
+    def __init__(self, workbook: XmlWorkbook, title: str) -> None:
+        self.parent = workbook.styles  # 单元格按 parent.parent 查找样式列表
+        self.workbook = workbook
+        self.part: Optional[io.BufferedRandom] = None
+        self.shared_ranges: List[CellRange] = []
+        super().__init__(self, title)
+
+    def share_formula(self, range_string: str) -> None:
+        """登记一列中逐行平移的同一公式，如 F5:F104 中的 =ROUND(E5/E$105*F$110,2)，写出为共享公式。"""
+        cell_range = CellRange(range_string)
+        if cell_range.min_col != cell_range.max_col:
+            raise ValueError(f"共享公式只能登记单列区域：{range_string}")
+        if cell_range.max_row > cell_range.min_row:
+            self.shared_ranges.append(cell_range)
+
+    def flush(self) -> None:
+        """按行号顺序写出全部单元格，随后释放缓冲内容。"""
+        rows: Dict[int, Dict[int, BufferedCell]] = {}
+        for (row, column), cell in self._cells.items():
+            rows.setdefault(row, {})[column] = cell
+        heights = {row: dim.height for row, dim in self.row_dimensions.items() if dim.height is not None}
+        widths = sorted(
+            (column_index_from_string(col), dim.width)
+            for col, dim in self.column_dimensions.items()
+            if dim.width is not None
+        )
+        letters = [""] + [get_column_letter(column) for column in range(1, max([0, *map(max, rows.values())]) + 1)]
+        shared = self._shared_formulas() if self.workbook.shared_formulas else {}
+
+        self.part = tempfile.TemporaryFile()
+        out = io.TextIOWrapper(self.part, encoding="utf-8", newline="")
+        out.write(f'<worksheet xmlns="{SHEET_MAIN}"><dimension ref="{self._dimension(rows, letters)}"/>')
+        out.write('<sheetViews><sheetView workbookViewId="0"/></sheetViews>')
+        out.write('<sheetFormatPr baseColWidth="8" defaultRowHeight="15"/>')
+        if widths:
+            out.write("<cols>")
+            out.write(
+                "".join(
+                    f'<col min="{column}" max="{column}" width="{safe_string(width)}" customWidth="1"/>'
+                    for column, width in widths
+                )
+            )
+            out.write("</cols>")
+        out.write("<sheetData>")
+        for row in sorted({*rows, *heights}):
+            height = heights.get(row)
+            attributes = f' ht="{safe_string(height)}" customHeight="1"' if height is not None else ""
+            cells = rows.get(row)
+            if not cells:
+                out.write(f'<row r="{row}"{attributes}/>')
+                continue
+            parts = [f'<row r="{row}"{attributes}>']
+            for column in sorted(cells):
+                parts.append(self._cell_xml(f"{letters[column]}{row}", cells[column], shared.get((row, column))))
+            parts.append("</row>")
+            out.write("".join(parts))
+        out.write("</sheetData>")
+        if self.merged_ranges:
+            out.write(f'<mergeCells count="{len(self.merged_ranges)}">')
+            out.write("".join(f'<mergeCell ref="{cell_range}"/>' for cell_range in self.merged_ranges))
+            out.write("</mergeCells>")
+        for setting in (self.print_options, self.page_margins, self.page_setup):  # 与 openpyxl 相同，只写出非空的设置
+            if setting:
+                out.write(tostring(setting.to_tree()).decode("utf-8"))
+        out.write("</worksheet>")
+        out.flush()
+        out.detach()
+
+        self._cells.clear()
+        self.merged_ranges.clear()
+        self.shared_ranges.clear()
+
+    def _shared_formulas(self) -> Dict[Tuple[int, int], str]:
+        """返回 (行, 列) -> <f> 元素。登记区域中的每个单元格都与首个单元格平移后的公式核对，
+        遇到不同的公式或非公式单元格时在此处断开，各段连续两行以上的相同公式分别共享，其余单元格照常写出公式。"""
+        result: Dict[Tuple[int, int], str] = {}
+        shared = 0  # 共享公式编号 si，在工作表内从 0 开始
+        for cell_range in self.shared_ranges:
+            column, letter = cell_range.min_col, get_column_letter(cell_range.min_col)
+            row, last = cell_range.min_row, cell_range.max_row
+            while row < last:
+                formula = self._formula((row, column))
+                if formula is None:
+                    row += 1
+                    continue
+                translator = Translator(formula, origin=f"{letter}{row}")
+                end = row
+                while end < last:
+                    if self._formula((end + 1, column)) != translator.translate_formula(f"{letter}{end + 1}"):
+                        break
+                    end += 1
+                if end > row:
+                    result[(row, column)] = (
+                        f'<f t="shared" ref="{letter}{row}:{letter}{end}" si="{shared}">'
+                        f"{escape(formula[1:], _TEXT_ENTITIES)}</f>"
+                    )
+                    follower = f'<f t="shared" si="{shared}"/>'
+                    for follow in range(row + 1, end + 1):
+                        result[(follow, column)] = follower
+                    shared += 1
+                row = end + 1
+        return result
+
+    def _formula(self, key: Tuple[int, int]) -> Optional[str]:
+        cell = self._cells.get(key)
+        value = None if cell is None else cell._value
+        return value if isinstance(value, str) and len(value) > 1 and value.startswith("=") else None
+
+    @staticmethod
+    def _dimension(rows: Dict[int, Dict[int, BufferedCell]], letters: List[str]) -> str:
+        if not rows:
+            return "A1"
+        min_col = min(min(cells) for cells in rows.values())
+        max_col = max(max(cells) for cells in rows.values())
+        return f"{letters[min_col]}{min(rows)}:{letters[max_col]}{max(rows)}"
+
+    def _cell_xml(self, ref: str, cell: BufferedCell, shared: Optional[str] = None) -> str:
+        """与 openpyxl 写出单元格的规则一致：'=' 开头的字符串为公式，日期转换为序列号，空字符串只保留样式。
+
+        shared 为共享公式的 <f> 元素，给出时代替公式文本写出。"""
+        style = f' s="{self.parent._cell_styles.add(cell._style)}"' if cell.has_style else ""
+        value = cell._value
+        if value is None or value == "":
+            return f'<c r="{ref}"{style}/>'
+        if isinstance(value, bool):
+            return f'<c r="{ref}"{style} t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, NUMERIC_TYPES):
+            return f'<c r="{ref}"{style}><v>{safe_string(value)}</v></c>'
+        if isinstance(value, str):
+            if len(value) > 1 and value.startswith("="):
+                if shared is not None:
+                    return f'<c r="{ref}"{style}>{shared}<v></v></c>'
+                return f'<c r="{ref}"{style}><f>{escape(value[1:], _TEXT_ENTITIES)}</f><v></v></c>'
+            if value in ERROR_CODES:
+                return f'<c r="{ref}"{style} t="e"><v>{value}</v></c>'
+            return f'<c r="{ref}"{style} t="s"><v>{self.workbook.shared_string(value)}</v></c>'
+        if isinstance(value, _DATE_TYPES):
+            return f'<c r="{ref}"{style}><v>{safe_string(to_excel(value))}</v></c>'
+        raise ValueError(f"Cannot convert {value!r} to Excel")
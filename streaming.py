@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, Optional, Tuple
+
+from openpyxl.cell.cell import TIME_TYPES, WriteOnlyCell, get_time_format
+from openpyxl.styles import Border, is_date_format
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.styles.styleable import StyleableObject
+from openpyxl.utils import column_index_from_string
+from openpyxl.utils.cell import coordinate_from_string
+from openpyxl.worksheet.cell_range import CellRange
+from openpyxl.worksheet.page import PageMargins, PrintOptions, PrintPageSetup
+
+
+class BufferedCell(StyleableObject):
+    """只保存值和样式编号的轻量单元格，样式直接登记到目标工作簿，接口与 openpyxl Cell 一致。"""
+
+    __slots__ = ("_value", "merged")
+
+    def __init__(self, worksheet, merged: bool = False) -> None:
+        super().__init__(worksheet)
+        self._value = None
+        self.merged = merged  # 合并区域中除左上角以外的单元格
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value) -> None:
+        if self.merged:
+            raise AttributeError("Cell is part of a merged range and read-only")
+        if isinstance(value, TIME_TYPES) and not is_date_format(self.number_format):
+            self.number_format = get_time_format(type(value))  # 与 openpyxl 写入日期时的默认格式一致
+        self._value = value
+
+
+class _Dimension:
+    __slots__ = ("width", "height")
+
+    def __init__(self) -> None:
+        self.width = None
+        self.height = None
+
+
+class _DimensionHolder(dict):
+    def __missing__(self, key):
+        dimension = self[key] = _Dimension()
+        return dimension
+
+
+class BufferedSheet:
+    """按 openpyxl Worksheet 的用法收集一个工作表的内容，构建完成后按行顺序写入 write_only 工作表。
+
+    合并单元格的边框处理与 openpyxl 的 merge_cells 相同，保证写出的结果与普通模式一致。
+    """
+
+    def __init__(self, target, title: Optional[str] = None) -> None:
+        self.target = target
+        self.title = title or target.title
+        self.column_dimensions: Dict[str, _Dimension] = _DimensionHolder()
+        self.row_dimensions: Dict[int, _Dimension] = _DimensionHolder()
+        self.merged_ranges = []
+        self.print_options = PrintOptions()  # 打印设置，用法与 openpyxl Worksheet 的同名属性相同
+        self.page_margins = PageMargins()
+        self.page_setup = PrintPageSetup()
+        self._cells: Dict[Tuple[int, int], BufferedCell] = {}
+        self._current_row = 0
+
+    def cell(self, row: int, column: int, value=None) -> BufferedCell:
+        cell = self._cells.get((row, column))
+        if cell is None:
+            cell = self._cells[(row, column)] = BufferedCell(self.target)
+            self._current_row = max(self._current_row, row)
+        if value is not None:
+            cell.value = value
+        return cell
+
+    def __getitem__(self, ref: str) -> BufferedCell:
+        col, row = coordinate_from_string(ref)
+        return self.cell(row, column_index_from_string(col))
+
+    def __setitem__(self, ref: str, value) -> None:
+        self[ref].value = value
+
+    def append(self, values: Iterable) -> None:
+        row = self._current_row + 1
+        for column, value in enumerate(values, start=1):
+            self.cell(row, column).value = value
+        self._current_row = row
+
+    def merge_cells(self, range_string: str) -> None:
+        cell_range = CellRange(range_string)
+        start = self.cell(cell_range.min_row, cell_range.min_col)
+        end = self._cells.get((cell_range.max_row, cell_range.max_col))
+        if end is not None:
+            start.border += Border(right=end.border.right, bottom=end.border.bottom)
+
+        cells = cell_range.cells
+        next(cells)
+        for coord in cells:
+            self._cells[coord] = BufferedCell(self.target, merged=True)
+
+        for name in ("top", "left", "right", "bottom"):
+            side = getattr(start.border, name)
+            if side and side.style is None:
+                continue
+            edge = Border(**{name: side})
+            for coord in getattr(cell_range, name):
+                cell = self._cells.get(coord)
+                if cell is None:
+                    cell = self._cells[coord] = BufferedCell(self.target, merged=True)
+                cell.border += edge
+        self.merged_ranges.append(cell_range.coord)
+
+    def flush(self) -> None:
+        """先声明列宽、行高、合并区域和打印设置，再按行号顺序写出全部单元格，随后释放缓冲内容。"""
+        ws = self.target
+        ws.title = self.title
+        ws.print_options = self.print_options
+        ws.page_margins = self.page_margins
+        ws.page_setup = self.page_setup
+        for col, dimension in self.column_dimensions.items():
+            if dimension.width is not None:
+                ws.column_dimensions[col].width = dimension.width
+        for row, dimension in self.row_dimensions.items():
+            if dimension.height is not None:
+                ws.row_dimensions[row].height = dimension.height
+        for cell_range in self.merged_ranges:
+            ws.merged_cells.ranges.add(CellRange(cell_range))  # 缓冲中已去重，跳过 add() 的逐个包含检查
+
+        rows: Dict[int, Dict[int, BufferedCell]] = {}
+        for (row, column), cell in self._cells.items():
+            rows.setdefault(row, {})[column] = cell
+        last_row = max([*rows, *(row for row, dim in self.row_dimensions.items() if dim.height is not None), 0])
+        for row in range(1, last_row + 1):
+            cells = rows.pop(row, {})
+            values = [None] * (max(cells) if cells else 0)
+            for column, cell in cells.items():
+                values[column - 1] = self._write_only_cell(ws, cell)
+            ws.append(values)
+
+        self._cells.clear()
+        self.merged_ranges.clear()
+
+    @staticmethod
+    def _write_only_cell(ws, cell: BufferedCell):
+        result = WriteOnlyCell(ws, cell.value)
+        if cell._style is not None:
+            result._style = StyleArray(cell._style)  # 样式已登记在同一个工作簿中，直接复制编号
+        return result
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from typing import Dict, Optional, Tuple
+
+from openpyxl.styles import Alignment, Border, Font, PatternFill
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.styles.numbers import BUILTIN_FORMATS_MAX_SIZE, BUILTIN_FORMATS_REVERSE
+
+
+# StyleArray 中各样式编号的位置及其在工作簿中对应的样式列表
+_SLOTS = {
+    "font": (0, "_fonts"),
+    "fill": (1, "_fills"),
+    "border": (2, "_borders"),
+    "alignment": (5, "_alignments"),
+}
+_NUMBER_FORMAT_SLOT = 3
+
+
+class StyleRegistry:
+    """命名样式表：字体、对齐、边框、填充和数字格式的组合登记一次，构建时按名称把样式编号直接写到单元格上。
+
+    openpyxl 每次给单元格赋 font/alignment 等属性都要对样式对象求哈希并在工作簿的样式列表中查找；
+    这里每个组合在每个工作簿中只查找一次，之后只复制编号。只写入组合中给出的部分，未给出的保持单元格原样。
+    """
+
+    def __init__(self) -> None:
+        self._definitions: Dict[str, Dict[str, object]] = {}
+        self._interned: Dict[Tuple, object] = {}
+        self._workbook = None
+        self._resolved: Dict[str, Tuple[Tuple[int, int], ...]] = {}
+        self._indexes: Dict[Tuple[str, int], Tuple[object, int]] = {}
+
+    def define(
+        self,
+        name: str,
+        *,
+        font: Optional[Font] = None,
+        alignment: Optional[Alignment] = None,
+        border: Optional[Border] = None,
+        fill: Optional[PatternFill] = None,
+        number_format: Optional[str] = None,
+    ) -> None:
+        parts = {"font": font, "alignment": alignment, "border": border, "fill": fill, "number_format": number_format}
+        self._definitions[name] = {key: value for key, value in parts.items() if value is not None}
+        self._resolved.pop(name, None)
+
+    def derive(self, name: str, base: str, **parts) -> None:
+        """在已有组合的基础上替换部分样式，登记为新的组合。"""
+        self.define(name, **{**self._definitions[base], **parts})
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._definitions
+
+    def intern(self, cls, **kwargs):
+        """相同参数只创建一个样式对象，重复使用时可以直接按对象命中编号缓存。"""
+        key = (cls, tuple(sorted(kwargs.items())))
+        value = self._interned.get(key)
+        if value is None:
+            value = self._interned[key] = cls(**kwargs)
+        return value
+
+    def stamp(self, cell, name: str) -> None:
+        style = cell._style
+        if style is None:
+            style = cell._style = StyleArray()
+        for slot, index in self._resolve(cell.parent.parent, name):
+            style[slot] = index
+
+    def stamp_row(self, ws, row: int, col_start: int, col_end: int, name: str) -> None:
+        for col in range(col_start, col_end + 1):
+            self.stamp(ws.cell(row, col), name)
+
+    def stamp_range(self, ws, row_start: int, row_end: int, col_start: int, col_end: int, name: str) -> None:
+        for row in range(row_start, row_end + 1):
+            self.stamp_row(ws, row, col_start, col_end, name)
+
+    def apply(self, cell, **parts) -> None:
+        """不经过命名组合直接写入样式对象，对象按身份缓存编号，适合 intern 得到的对象。"""
+        style = cell._style
+        if style is None:
+            style = cell._style = StyleArray()
+        workbook = self._bind(cell.parent.parent)
+        for key, value in parts.items():
+            if value is not None:
+                slot, index = self._index(workbook, key, value)
+                style[slot] = index
+
+    def _bind(self, workbook):
+        if workbook is not self._workbook:  # 样式编号只在同一个工作簿内有效
+            self._workbook = workbook
+            self._resolved.clear()
+            self._indexes.clear()
+        return workbook
+
+    def _resolve(self, workbook, name: str) -> Tuple[Tuple[int, int], ...]:
+        self._bind(workbook)
+        resolved = self._resolved.get(name)
+        if resolved is None:
+            resolved = self._resolved[name] = tuple(
+                self._index(workbook, key, value) for key, value in self._definitions[name].items()
+            )
+        return resolved
+
+    def _index(self, workbook, key: str, value) -> Tuple[int, int]:
+        cached = self._indexes.get((key, id(value)))
+        if cached is not None and cached[0] is value:
+            return cached[1]
+        if key == "number_format":
+            slot = _NUMBER_FORMAT_SLOT
+            if value in BUILTIN_FORMATS_REVERSE:
+                index = BUILTIN_FORMATS_REVERSE[value]
+            else:
+                index = workbook._number_formats.add(value) + BUILTIN_FORMATS_MAX_SIZE
+        else:
+            slot, collection = _SLOTS[key]
+            index = getattr(workbook, collection).add(value)
+        self._indexes[(key, id(value))] = (value, (slot, index))
+        return slot, index
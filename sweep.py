@@ -0,0 +1,357 @@
+"""低价法报价方案扫描：在已生成的报价表上批量计算汇率、国外运费、保险费率、退税率和各物资供应商的不同取值，
+给出投标总价的帕累托最优方案，并可把选定的方案写回报价表。
+
+    python sweep.py 投标报价表-xxx.xlsx --rates 6.9 7.0 7.1 --insurance 0.001 0.0008 --refund 13 9 \\
+        --freight I3=1800,2000 --samples 5000 --apply 1 -o 方案1.xlsx
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import math
+import os
+import re
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from openpyxl import load_workbook
+
+from formula import Evaluator, FormulaError, fill_cached_values
+from pricing import PricingModel
+from quotation import QuotationLayout, cell_number
+
+SUPPLIERS = "全部厂家备用"
+FEES = "运输费用"
+OTHER_FEES = "其他费用"
+FREIGHT_ROWS = range(3, 16)  # 国外运费明细行，K 列为 单价 × 数量 × 汇率
+RATE_CELL = "G17"  # 运输汇率
+CONTRACT_CELL = "B5"  # 保险费 = 合同金额 × 1.1 × 保险费率
+INSURANCE_RATE_CELL = "B6"
+_LOOKUP_RANGE = re.compile(r"AL\$?1:AL\$?(\d+)")  # 物资选择 C 列 MATCH 的查找范围
+
+
+@dataclass
+class Scenario:
+    """一个报价方案及其计算结果。"""
+
+    rate: float  # 运输汇率
+    insurance_rate: float
+    refund_rate: Optional[float]  # 各物资统一的退抵增值税率(%)，None 表示保持报价表中的税率
+    freight: Dict[str, float]  # 改动的国外运费单价，如 {"I3": 1800}
+    rows: Tuple[int, ...]  # 选用的全部厂家备用行号，序号和品名相同的物资只有一个
+    total: float  # 投标总价
+    refund: float  # 承诺的退抵税额
+    score: float  # 所选供应商的得分之和
+    changed: int  # 与报价表当前选择不同的个数
+
+
+def pareto_front(points: np.ndarray) -> np.ndarray:
+    """返回不被支配的点的下标（各目标均为越小越好），按目标的字典序排列；完全相同的点只保留一个。"""
+    order = np.lexsort(points.T[::-1])
+    kept: List[int] = []
+    for index in order:
+        if kept and np.any(np.all(points[kept] <= points[index], axis=1)):  # 排在前面且各目标都不差
+            continue
+        kept.append(index)
+    return np.asarray(kept, dtype=int)
+
+
+class ScenarioSweep:
+    """读取一份已生成（可已填写单价、增加备选供应商）的报价表，用 PricingModel 按批计算各种方案。
+
+    供应商备选取自全部厂家备用中品名和序号与物资选择相同的各行，当前选择为排名（AD 列）为 1 的行；
+    只考虑物资选择中 MATCH 查找范围以内的行，范围以外的行即使排第 1 也不会被报价表选中。
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        workbook = load_workbook(filename, read_only=True)
+        try:
+            evaluator = Evaluator.from_workbook(workbook)
+        finally:
+            workbook.close()
+        self.evaluator = evaluator
+        self.layout = QuotationLayout.detect(evaluator.sheets)
+        self.base = self.layout.pricing_model(evaluator)
+
+        def number(sheet: str, ref: str) -> float:
+            return cell_number(evaluator, sheet, ref)
+
+        self.rate = number(FEES, RATE_CELL)
+        self.freight_prices = {f"I{row}": number(FEES, f"I{row}") for row in FREIGHT_ROWS}
+        self.freight_counts = np.array([number(FEES, f"J{row}") for row in FREIGHT_ROWS], dtype=float)
+        self.domestic_freight = number(FEES, "E18")
+        self.contract = number(OTHER_FEES, CONTRACT_CELL)
+        self.insurance_rate = number(OTHER_FEES, INSURANCE_RATE_CELL)
+        self._read_candidates()
+
+        # 用当前取值核对费用表的结构，保证扫描结果与重算报价表一致
+        freight, insurance = self._fees([self.rate], [self.freight_prices], [self.insurance_rate])
+        if freight[0] != self.base.freight or insurance[0] != self.base.insurance:
+            raise FormulaError("运输费用或其他费用表的结构与生成时不一致，无法扫描")
+        if not np.array_equal(self.prices[self.labels, 0], self.base.unit_prices):
+            raise FormulaError("物资选择与全部厂家备用中排名为 1 的供应商不一致")
+
+    def _read_candidates(self) -> None:
+        sheets = self.evaluator.sheets
+        lookup = _LOOKUP_RANGE.search(str(sheets.get("物资选择", {}).get((1, 3), "")))
+        last_row = int(lookup.group(1)) if lookup else math.inf
+        groups: Dict[Tuple[str, str], List[Tuple]] = {}
+        for row in sorted({row for row, _ in sheets.get(SUPPLIERS, {}) if 1 < row <= last_row}):
+            values = [self.evaluator.cell_value(SUPPLIERS, row, col) for col in (1, 2)]
+            if values[0] is None and values[1] is None:
+                continue
+            rank = self.evaluator.cell_value(SUPPLIERS, row, 30)  # AD 排名
+            rank = rank if isinstance(rank, (int, float)) and not isinstance(rank, bool) else math.inf
+            score = self.evaluator.cell_value(SUPPLIERS, row, 32)  # AF 得分
+            score = score if isinstance(score, (int, float)) and not isinstance(score, bool) else None
+            groups.setdefault(tuple(_label(value) for value in values), []).append((rank, row, score))
+
+        # 序号和品名相同的物资查找到同一行，共用一个选择
+        self.item_count = self.layout.item_count
+        labels: Dict[Tuple[str, str], int] = {}
+        self.group_labels: List[Tuple[str, str]] = []  # 各选择对应的 (序号, 品名)
+        candidates = []
+        items = []
+        for key in range(1, self.item_count + 1):
+            label = tuple(_label(self.evaluator.cell_value("物资选择", key, col)) for col in (1, 2))
+            if label not in labels:
+                rows = sorted(groups.get(label, []))
+                if not rows or rows[0][0] != 1:
+                    raise FormulaError(f"物资选择第 {key} 行在全部厂家备用中没有排名为 1 的供应商")
+                labels[label] = len(candidates)
+                candidates.append(rows)
+                self.group_labels.append(label)
+            items.append(labels[label])
+
+        width = max(len(rows) for rows in candidates) if candidates else 1
+        self.labels = np.array(items, dtype=int)  # 各物资对应的选择序号
+        self.counts = np.array([len(rows) for rows in candidates], dtype=int)
+        self.rows = np.zeros((len(candidates), width), dtype=int)
+        self.prices = np.zeros((len(candidates), width))
+        self.quantities = np.zeros((len(candidates), width))
+        self.scores = np.zeros((len(candidates), width))
+        self.has_scores = False
+        for choice_index, rows in enumerate(candidates):
+            for choice, (_, row, score) in enumerate(rows):
+                self.rows[choice_index, choice] = row
+                self.prices[choice_index, choice] = cell_number(self.evaluator, SUPPLIERS, f"J{row}")
+                self.quantities[choice_index, choice] = cell_number(self.evaluator, SUPPLIERS, f"E{row}")
+                if score is not None:
+                    self.scores[choice_index, choice] = score
+                    self.has_scores = True
+
+    def _fees(self, rates, freights, insurance_rates) -> Tuple[np.ndarray, np.ndarray]:
+        """按报价表公式计算国外运费加国内运费、运输保险费。"""
+        prices = np.array([[{**self.freight_prices, **freight}[f"I{row}"] for row in FREIGHT_ROWS] for freight in freights])
+        terms = prices * self.freight_counts * np.asarray(rates, dtype=float)[:, None]  # K 列：I*J*G17
+        foreign = np.cumsum(terms, axis=1)[:, -1]  # 与 SUM 一样逐项累加
+        insurance = self.contract * 1.1 * np.asarray(insurance_rates, dtype=float)
+        return foreign + self.domestic_freight, insurance
+
+    def supplier_choices(self, samples: int, seed: int = 0) -> np.ndarray:
+        """供应商组合，每行为各物资在备选中的序号（0 为当前选择）。
+
+        组合总数不超过 samples 时全部列出，否则随机抽样，并总是包含当前选择和逐项最便宜的选择。
+        """
+        count = len(self.counts)
+        if math.prod(int(value) for value in self.counts) <= samples:
+            return np.indices(tuple(self.counts)).reshape(count, -1).T
+        rng = np.random.default_rng(seed)
+        sampled = rng.integers(0, self.counts, size=(samples, count))
+        masked = np.where(np.arange(self.prices.shape[1]) < self.counts[:, None], self.prices * self.quantities, np.inf)
+        fixed = np.stack([np.zeros(count, dtype=int), np.argmin(masked, axis=1)])
+        return np.unique(np.concatenate([fixed, sampled]), axis=0)
+
+    def model(self, picked: np.ndarray, vat_rates=None, insurance=None, freight=None) -> PricingModel:
+        """按供应商组合（每行为各选择在备选中的序号）建立计价模型，未给出的参数保持报价表中的取值。"""
+        groups = np.arange(len(self.counts))
+        return PricingModel(
+            self.prices[groups, picked][..., self.labels],
+            self.quantities[groups, picked][..., self.labels],
+            vat_rates=self.base.vat_rates if vat_rates is None else vat_rates,
+            consumption_rates=self.base.consumption_rates,
+            fee_vat=self.base.fee_vat,
+            fee_consumption_rates=self.base.fee_consumption_rates,
+            domestic=self.base.domestic,
+            inspection=self.base.inspection,
+            insurance=self.base.insurance if insurance is None else insurance,
+            freight=self.base.freight if freight is None else freight,
+            other_fees=self.base.other_fees,
+            tech_total=self.base.tech_total,
+            training_total=self.base.training_total,
+            iterate_count=self.base.iterate_count,
+            iterate_delta=self.base.iterate_delta,
+            closed_form=self.base.closed_form,
+        )
+
+    def run(
+        self,
+        rates: Optional[Sequence[float]] = None,
+        insurance_rates: Optional[Sequence[float]] = None,
+        refund_rates: Optional[Sequence[Optional[float]]] = None,
+        freights: Optional[Dict[str, Sequence[float]]] = None,
+        samples: int = 2000,
+        seed: int = 0,
+        batch_cells: int = 2_000_000,
+    ) -> Tuple[List[Scenario], int]:
+        """计算全部方案，返回 (帕累托最优方案按投标总价排序, 方案总数)。
+
+        目标为投标总价和承诺的退抵税额越低越好，供应商有得分时得分越高越好。未给出的参数保持报价表中的取值。
+        """
+        rates = list(rates or [self.rate])
+        insurance_rates = list(insurance_rates or [self.insurance_rate])
+        refund_rates = list(refund_rates or [None])
+        freights = freights or {}
+        freight_options = [dict(zip(freights, values)) for values in itertools.product(*freights.values())]
+        settings = list(itertools.product(rates, freight_options, insurance_rates, refund_rates))
+
+        freight, insurance = self._fees(
+            [setting[0] for setting in settings], [setting[1] for setting in settings], [setting[2] for setting in settings]
+        )
+        vat_rates = np.array([
+            np.broadcast_to(self.base.vat_rates if refund is None else refund, (self.item_count,))
+            for *_, refund in settings
+        ])
+        choices = self.supplier_choices(samples, seed)
+        total = len(settings) * len(choices)
+        groups = np.arange(len(self.counts))
+        batch = max(1, batch_cells // max(self.item_count, 1))
+
+        front_keys = np.zeros((0, 2), dtype=int)  # (设置序号, 组合序号)
+        front_points = np.zeros((0, 3 if self.has_scores else 2))
+        for start in range(0, total, batch):
+            flat = np.arange(start, min(start + batch, total))
+            setting, combo = flat // len(choices), flat % len(choices)
+            picked = choices[combo]
+            result = self.model(picked, vat_rates[setting], insurance[setting], freight[setting]).compute()
+            objectives = [result.grand_total, result.refund_total]
+            if self.has_scores:
+                objectives.append(-self.scores[groups, picked][:, self.labels].sum(axis=1))
+            points = np.stack(objectives, axis=1)
+            valid = np.all(np.isfinite(points), axis=1)
+            if len(front_points):  # 先去掉已被当前最优方案支配的点
+                dominated = np.any(np.all(front_points[None, :, :] <= points[:, None, :], axis=2), axis=1)
+                valid &= ~dominated
+            keys = np.concatenate([front_keys, np.stack([setting, combo], axis=1)[valid]])
+            points = np.concatenate([front_points, points[valid]])
+            kept = pareto_front(points)
+            front_keys, front_points = keys[kept], points[kept]
+
+        scenarios = []
+        for (setting, combo), point in zip(front_keys.tolist(), front_points.tolist()):
+            rate, freight_option, insurance_rate, refund = settings[setting]
+            picked = choices[combo]
+            scenarios.append(
+                Scenario(
+                    rate=rate,
+                    insurance_rate=insurance_rate,
+                    refund_rate=refund,
+                    freight=freight_option,
+                    rows=tuple(self.rows[groups, picked].tolist()),
+                    total=point[0],
+                    refund=point[1],
+                    score=-point[2] if self.has_scores else 0.0,
+                    changed=int(np.count_nonzero(picked)),  # 备选中序号 0 为当前选择
+                )
+            )
+        return scenarios, total
+
+    def apply(self, scenario: Scenario, output: Optional[str] = None, cache_values: bool = True) -> str:
+        """把方案写回报价表：汇率、国外运费单价、保险费率、退税率，以及全部厂家备用的排名（选中的行排第 1）。"""
+        output = output or self.filename
+        wb = load_workbook(self.filename)
+        fees = wb[FEES]
+        fees[RATE_CELL] = scenario.rate
+        for ref, value in scenario.freight.items():
+            fees[ref] = value
+        wb[OTHER_FEES][INSURANCE_RATE_CELL] = scenario.insurance_rate
+        if scenario.refund_rate is not None:
+            tax = wb[QuotationLayout.TAX]
+            for row in range(4, 4 + self.item_count):
+                tax[f"D{row}"] = scenario.refund_rate
+
+        suppliers = wb[SUPPLIERS]
+        for group, chosen in enumerate(scenario.rows):
+            others = [row for row in self.rows[group, : self.counts[group]].tolist() if row != chosen]
+            for rank, row in enumerate([chosen, *others], start=1):
+                suppliers[f"AD{row}"] = rank
+        wb.save(output)
+        if cache_values:
+            fill_cached_values(output, prepare=self.layout.prepare_values)
+        return output
+
+
+def _label(value) -> str:
+    """按 & 连接时的文本比较序号和品名。"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _freight_option(text: str) -> Tuple[str, List[float]]:
+    match = re.fullmatch(r"\s*(I(\d+))\s*=\s*([-\d.,\s]+)", text, re.IGNORECASE)
+    if not match or int(match.group(2)) not in FREIGHT_ROWS:
+        raise argparse.ArgumentTypeError(f"国外运费的格式应为 I3=1800,2000（行号 3-15）：{text}")
+    return match.group(1).upper(), [float(value) for value in match.group(3).split(",") if value.strip()]
+
+
+def format_scenarios(sweep: ScenarioSweep, scenarios: List[Scenario]) -> str:
+    headers = ["序号", "投标总价", "退抵税额", *(["得分"] if sweep.has_scores else []), "汇率", "保险费率", "退税率", "国外运费", "更换供应商"]
+    lines = []
+    for index, scenario in enumerate(scenarios, start=1):
+        cells = [str(index), f"{scenario.total:,.2f}", f"{scenario.refund:,.2f}"]
+        if sweep.has_scores:
+            cells.append(f"{scenario.score:g}")
+        cells.extend([
+            f"{scenario.rate:g}",
+            f"{scenario.insurance_rate:g}",
+            "原税率" if scenario.refund_rate is None else f"{scenario.refund_rate:g}%",
+            " ".join(f"{ref}={value:g}" for ref, value in scenario.freight.items()) or "-",
+            str(scenario.changed),
+        ])
+        lines.append(cells)
+    widths = [max(len(str(row[i])) for row in [headers, *lines]) for i in range(len(headers))]
+    rows = [headers, ["-" * width for width in widths], *lines]
+    return "\n".join("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)) for row in rows)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="低价法报价方案扫描：批量计算各种参数组合的投标总价，给出帕累托最优方案。")
+    parser.add_argument("workbook", help="已生成的报价表")
+    parser.add_argument("--rates", type=float, nargs="+", help="运输汇率的候选值（运输费用!G17）")
+    parser.add_argument("--insurance", type=float, nargs="+", help="保险费率的候选值（其他费用!B6）")
+    parser.add_argument("--refund", type=float, nargs="+", help="物资统一退抵增值税率(%%)的候选值")
+    parser.add_argument("--freight", type=_freight_option, action="append", default=[], help="国外运费单价的候选值，如 I3=1800,2000")
+    parser.add_argument("--samples", type=int, default=2000, help="供应商组合超过该数量时随机抽样")
+    parser.add_argument("--seed", type=int, default=0, help="供应商组合抽样的随机种子")
+    parser.add_argument("--apply", type=int, help="把第几个方案写回报价表")
+    parser.add_argument("-o", "--output", help="写回时的输出文件，默认为 <报价表>-方案<序号>.xlsx")
+    args = parser.parse_args(argv)
+
+    started = perf_counter()
+    try:
+        sweep = ScenarioSweep(args.workbook)
+    except (OSError, FormulaError) as exc:
+        print(f"<<< 无法读取报价表：{exc} >>>")
+        return 1
+    scenarios, total = sweep.run(args.rates, args.insurance, args.refund, dict(args.freight), args.samples, args.seed)
+    print(format_scenarios(sweep, scenarios))
+    print(f"<<< 共计算 {total} 个方案，帕累托最优 {len(scenarios)} 个，用时 {perf_counter() - started:.2f}s >>>")
+
+    if args.apply:
+        if not 1 <= args.apply <= len(scenarios):
+            print(f"<<< 没有第 {args.apply} 个方案 >>>")
+            return 1
+        stem, ext = os.path.splitext(args.workbook)
+        output = sweep.apply(scenarios[args.apply - 1], args.output or f"{stem}-方案{args.apply}{ext}")
+        print(f"<<< 已写回方案 {args.apply}：{output} >>>")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,25 @@
+"""batch.output_names：文件名相同的项目文档输出到不同的目录。"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from batch import output_names  # noqa: E402
+
+
+def test_unique_names_keep_stem():
+    documents = [os.path.join("甲", "project-a.docx"), os.path.join("乙", "project-b.docx")]
+    assert output_names(documents) == {documents[0]: "project-a", documents[1]: "project-b"}
+
+
+def test_same_stem_in_different_folders():
+    documents = [
+        os.path.join("甲", "project.docx"),
+        os.path.join("乙", "project.docx"),
+        os.path.join("丙", "甲-project.docx"),
+    ]
+    names = output_names(documents)
+    assert names[documents[0]] == "甲-project"
+    assert names[documents[1]] == "乙-project"
+    assert len({name.lower() for name in names.values()}) == len(documents)
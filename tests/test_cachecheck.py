@@ -0,0 +1,41 @@
+"""cachecheck.check_cache 对省略 r 属性的单元格和行的处理。"""
+import os
+import re
+import sys
+import zipfile
+
+from openpyxl import Workbook
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cachecheck import check_cache  # noqa: E402
+
+
+def strip_references(source, target):
+    """复制 xlsx，去掉工作表中全部 <row> 和 <c> 的 r 属性（LibreOffice 等会这样写出）。"""
+    with zipfile.ZipFile(source) as src, zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            data = src.read(info.filename)
+            if info.filename.startswith("xl/worksheets/"):
+                data = re.sub(rb'(<(?:row|c)\b[^>]*?)\sr="[A-Z]*\d*"', rb"\1", data)
+            dst.writestr(info, data)
+
+
+def test_cells_without_reference(tmp_path):
+    workbook = Workbook()
+    ws = workbook.active
+    ws.title = "1.报价"
+    for row in range(1, 4):
+        ws.append([f"物资{row}", row * 10, f"=B{row}*2"])
+    source = str(tmp_path / "source.xlsx")
+    workbook.save(source)
+    target = str(tmp_path / "target.xlsx")
+    strip_references(source, target)
+    with zipfile.ZipFile(target) as archive:
+        assert ' r="' not in archive.read("xl/worksheets/sheet1.xml").decode("utf-8")
+
+    expected, report = check_cache(source), check_cache(target)
+    assert report.formulas == expected.formulas == 3
+    assert report.missing == expected.missing == ["1.报价!C1", "1.报价!C2", "1.报价!C3"]
+    assert report.inputs == expected.inputs
@@ -0,0 +1,97 @@
+"""向量化报价模型与报价表公式的一致性，以及 excel_round 的进位规则。
+
+参照值来自内置的 formula.Evaluator，而不是 Excel 或 LibreOffice 重算后的缓存值：测试环境中没有这两者，
+仓库里也没有它们重算过的报价表可作固定的比较对象。两者若对同一个 Excel 函数有相同的误解，这里发现不了；
+ROUND 的进位规则另由 test_excel_round_* 按 Excel 的已知结果单独核对。
+"""
+import os
+import random
+import sys
+
+import pytest
+from openpyxl import load_workbook
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from formula import Evaluator  # noqa: E402
+from pricing import excel_round  # noqa: E402
+from project import Commodity, Project  # noqa: E402
+from quotation import Quotation, QuotationLayout  # noqa: E402
+from sweep import FEES, FREIGHT_ROWS, INSURANCE_RATE_CELL, OTHER_FEES, RATE_CELL, SUPPLIERS  # noqa: E402
+
+TEMPLATE = os.path.join(ROOT, "project-[项目名称务].docx")
+ITEMS = 40
+
+
+@pytest.fixture(scope="module")
+def project():
+    project = Project(TEMPLATE, parser="xml")
+    project.commodities = {
+        i: Commodity.from_row([f"物资{i}", "8702401090", "台", str(i % 7 + 1), "型号", "GB/T 1", str(i)])
+        for i in range(1, ITEMS + 1)
+    }
+    return project
+
+
+def fill_inputs(filename, seed=0):
+    """按随机的单价、运费、汇率、保险费率和 9% 的退税率填写报价表。"""
+    rng = random.Random(seed)
+    workbook = load_workbook(filename)
+    suppliers = workbook[SUPPLIERS]
+    for row in range(2, ITEMS + 2):
+        suppliers[f"J{row}"] = round(rng.uniform(100, 50000), 2)
+    fees = workbook[FEES]
+    fees[RATE_CELL] = round(rng.uniform(6, 8), 4)
+    for row in FREIGHT_ROWS:
+        fees[f"I{row}"] = round(rng.uniform(0, 3000), 2)
+        fees[f"J{row}"] = rng.randint(0, 3)
+    workbook[OTHER_FEES][INSURANCE_RATE_CELL] = 0.0015
+    tax = workbook[QuotationLayout.TAX]
+    for row in range(4, 4 + ITEMS):
+        tax[f"D{row}"] = 9
+    workbook.save(filename)
+
+
+@pytest.mark.parametrize("tax_mode", ["iterative", "closed"])
+def test_pricing_model_matches_formulas(project, tmp_path, tax_mode):
+    filename = str(tmp_path / f"{tax_mode}.xlsx")
+    quotation = Quotation(project)
+    quotation.generate(filename, tax_mode=tax_mode)
+    fill_inputs(filename)
+
+    workbook = load_workbook(filename)
+    try:
+        evaluator = Evaluator.from_workbook(workbook)
+    finally:
+        workbook.close()
+    layout = QuotationLayout.detect(evaluator.sheets)
+    expected = layout.pricing_cells(layout.pricing_model(evaluator).compute())
+    values = evaluator.evaluate()
+
+    different = {key: (value, values.get(key)) for key, value in expected.items() if values.get(key) != value}
+    assert not different
+    assert len(expected) > ITEMS * 8
+
+
+@pytest.mark.parametrize(
+    "value, digits, expected",
+    [
+        (3.03 + 0.005, 2, 3.04),
+        (-3.03 - 0.005, 2, -3.04),
+        (0.125, 2, 0.13),
+        (-0.125, 2, -0.13),
+        (2.5, 0, 3),
+        (-2.5, 0, -3),
+        (1.005, 2, 1.01),
+        (2.675, 2, 2.68),
+        (1234.5, -1, 1230),
+        (-0.4999, 0, 0),
+    ],
+)
+def test_excel_round_half_away_from_zero(value, digits, expected):
+    assert excel_round(value, digits) == expected
+
+
+def test_excel_round_arrays():
+    assert excel_round([0.5, 1.5, -0.5, -1.5]).tolist() == [1, 2, -1, -2]
@@ -0,0 +1,43 @@
+"""xml 解析模式与 python-docx 解析模式的结果一致性。"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from project import _INFO_TABLE, Project  # noqa: E402
+
+TEMPLATE = os.path.join(ROOT, "project-[项目名称务].docx")
+
+
+@pytest.fixture(scope="module")
+def projects():
+    return Project(TEMPLATE, parser="docx"), Project(TEMPLATE, parser="xml")
+
+
+def public_fields(project):
+    return {key: value for key, value in vars(project).items() if not key.startswith("_")}
+
+
+def test_project_info_table(projects):
+    docx, xml = projects
+    assert xml._read_table(_INFO_TABLE) == docx._read_table(_INFO_TABLE)
+
+
+def test_project_info_fields(projects):
+    docx, xml = projects
+    assert public_fields(xml) == public_fields(docx)
+    assert xml.name
+
+
+def test_commodities(projects):
+    docx, xml = projects
+    assert xml.commodities == docx.commodities
+    assert len(xml.commodities) > 0
+
+
+def test_demand_info(projects):
+    docx, xml = projects
+    assert xml.demand_info == docx.demand_info
@@ -0,0 +1,49 @@
+"""spreadsheetml.XmlWorkbook 写出的共享公式和打印设置。"""
+import os
+import sys
+import zipfile
+
+from openpyxl import load_workbook
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from spreadsheetml import XmlWorkbook  # noqa: E402
+
+
+def test_shared_formula_breaks_at_mismatch(tmp_path):
+    workbook = XmlWorkbook()
+    ws = workbook.create_sheet("Sheet")
+    for row in range(1, 9):
+        ws.cell(row, 1, row)
+        ws.cell(row, 2, f"=A{row}*2")
+    ws["B4"] = "=A4*3"  # 中间一行的公式不同
+    ws.share_formula("B1:B8")
+    filename = str(tmp_path / "shared.xlsx")
+    workbook.save(filename)
+
+    with zipfile.ZipFile(filename) as archive:
+        xml = archive.read("xl/worksheets/sheet1.xml").decode("utf-8")
+    assert 'ref="B1:B3"' in xml and 'ref="B5:B8"' in xml
+    sheet = load_workbook(filename)["Sheet"]
+    assert [sheet.cell(row, 2).value for row in range(1, 9)] == [
+        "=A1*2", "=A2*2", "=A3*2", "=A4*3", "=A5*2", "=A6*2", "=A7*2", "=A8*2"
+    ]
+
+
+def test_page_settings(tmp_path):
+    workbook = XmlWorkbook()
+    ws = workbook.create_sheet("Sheet")
+    ws["A1"] = 1
+    ws.page_margins.left = 0.3
+    ws.page_setup.orientation = "landscape"
+    ws.page_setup.paperSize = 9
+    ws.print_options.horizontalCentered = True
+    filename = str(tmp_path / "page.xlsx")
+    workbook.save(filename)
+
+    sheet = load_workbook(filename)["Sheet"]
+    assert sheet.page_margins.left == 0.3
+    assert sheet.page_setup.orientation == "landscape"
+    assert sheet.page_setup.paperSize == 9
+    assert sheet.print_options.horizontalCentered
@@ -0,0 +1,428 @@
+"""xlsx 包级别的工作表拆分：直接在 zip 部件上操作，不经过 openpyxl 读取整个工作簿。
+
+每个导出的文件只含一个工作表。工作表 XML 按行流式改写：公式去掉、只保留缓存值，共享字符串重新编号，
+只带上用到的字符串；样式表、主题、文档属性和工作表引用的其他部件（如打印机设置）按原始压缩数据复制，不解压也不重新压缩；
+workbook.xml、关系和内容类型按单个工作表重新生成，只保留该工作表的本地定义名称（打印区域、打印标题等）。
+"""
+from __future__ import annotations
+
+import codecs
+import hashlib
+import posixpath
+import re
+import struct
+import zipfile
+from typing import Dict, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import quoteattr, unescape
+
+SHEET_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PACKAGE_RELS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CONTENT_TYPES = "http://schemas.openxmlformats.org/package/2006/content-types"
+OFFICE_TYPE = "application/vnd.openxmlformats-officedocument"
+
+_ATTRIBUTE_ENTITIES = {"&quot;": '"', "&apos;": "'"}
+_RELATIONSHIP = re.compile(r"<Relationship\b([^>]*)/>")
+_ATTRIBUTE = re.compile(r'([\w:]+)="([^"]*)"')
+_SHEET = re.compile(r"<sheet\b([^>]*)/>")
+_DEFINED_NAME = re.compile(r"<definedName\b([^>]*)>(.*?)</definedName>", re.DOTALL)
+_STRING_ITEM = re.compile(r"<si>.*?</si>|<si/>", re.DOTALL)
+_CELL = re.compile(r"<c\b([^>]*?)(?:/>|>(.*?)</c>)", re.DOTALL)
+_FORMULA = re.compile(r"<f\b[^>]*/>|<f\b[^>]*>.*?</f>", re.DOTALL)
+_VALUE = re.compile(r"<v>(.*?)</v>|<v/>", re.DOTALL)
+_TYPE = re.compile(r'\s+t="([^"]*)"')
+_STYLE = re.compile(r'\ss="[1-9]\d*"')
+_STYLE_ID = re.compile(r'\s(s|style)="(\d+)"')
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_CHUNK = 1 << 20
+
+
+def _attributes(text: str) -> Dict[str, str]:
+    return {key: unescape(value, _ATTRIBUTE_ENTITIES) for key, value in _ATTRIBUTE.findall(text)}
+
+
+def _resolve(source: str, target: str) -> str:
+    """关系中的 Target 转为 zip 中的部件名，相对路径相对于 source 所在目录。"""
+    if target.startswith("/"):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(source), target))
+
+
+def _rels_name(part: str) -> str:
+    folder, name = posixpath.split(part)
+    return posixpath.join(folder, "_rels", f"{name}.rels")
+
+
+def _items(xml: str, tag: str) -> List[str]:
+    """xml 中所有 <tag> 元素的原文，按出现顺序排列（样式表中的列表元素不嵌套同名元素）。"""
+    return re.findall(rf"<{tag}\b[^>]*/>|<{tag}\b[^>]*>.*?</{tag}>", xml, re.DOTALL)
+
+
+def _relations(archive: zipfile.ZipFile, part: str) -> Dict[str, Tuple[str, str]]:
+    """部件 part 的关系：Id -> (Type, 部件名)，part 为空时为包的关系；外部链接不在其中。"""
+    name = _rels_name(part) if part else "_rels/.rels"
+    if name not in archive.NameToInfo:
+        return {}
+    result = {}
+    for match in _RELATIONSHIP.finditer(archive.read(name).decode("utf-8")):
+        attributes = _attributes(match.group(1))
+        if attributes.get("TargetMode") == "External":
+            continue
+        result[attributes["Id"]] = (attributes["Type"], _resolve(part, attributes["Target"]))
+    return result
+
+
+def _office_document(archive: zipfile.ZipFile) -> str:
+    for kind, target in _relations(archive, "").values():
+        if kind.endswith("/officeDocument"):
+            return target
+    raise KeyError("xlsx 中没有工作簿部件")
+
+
+def workbook_sheet_names(filename: str) -> List[str]:
+    """按顺序返回 xlsx 中的工作表名，只读取包关系和 workbook.xml，耗时与工作簿大小无关。"""
+    with zipfile.ZipFile(filename) as archive:
+        xml = archive.read(_office_document(archive)).decode("utf-8")
+    return [_attributes(match.group(1))["name"] for match in _SHEET.finditer(xml)]
+
+
+def copy_raw(source: zipfile.ZipFile, info: zipfile.ZipInfo, target: zipfile.ZipFile, name: Optional[str] = None) -> None:
+    """把 source 中的一个成员按原始压缩数据写入 target，不解压也不重新压缩。"""
+    source.fp.seek(info.header_offset)
+    header = _LOCAL_HEADER.unpack(source.fp.read(_LOCAL_HEADER.size))
+    source.fp.seek(header[-2] + header[-1], 1)  # 跳过本地文件头中的文件名和扩展字段
+    data = source.fp.read(info.compress_size)
+
+    copied = zipfile.ZipInfo(name or info.filename, info.date_time)
+    copied.compress_type = info.compress_type
+    copied.flag_bits = info.flag_bits & ~0x08  # 大小和校验值直接写在文件头中，不再使用数据描述符
+    copied.external_attr = info.external_attr
+    copied.create_system = info.create_system
+    copied.CRC = info.CRC
+    copied.compress_size = info.compress_size
+    copied.file_size = info.file_size
+    copied.header_offset = target.fp.tell()
+    target.fp.write(copied.FileHeader())
+    target.fp.write(data)
+    target.filelist.append(copied)
+    target.NameToInfo[copied.filename] = copied
+    target.start_dir = target.fp.tell()
+    target._didModify = True
+
+
+class PackageSplitter:
+    """读取报价表的包结构（工作表名、部件路径、共享字符串），按工作表导出为单独的 xlsx。"""
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.archive = zipfile.ZipFile(filename)
+        self.defaults, self.overrides = self._content_types()
+        self.workbook_part = _office_document(self.archive)
+        self.workbook_xml = self.archive.read(self.workbook_part).decode("utf-8")
+        relations = self._relations(self.workbook_part)
+        self.sheets: Dict[str, str] = {}  # 工作表名 -> 部件名
+        self.sheet_indexes: Dict[str, int] = {}  # 工作表名 -> 在工作簿中的位置，用于本地定义名称
+        for index, match in enumerate(_SHEET.finditer(self.workbook_xml)):
+            attributes = _attributes(match.group(1))
+            self.sheets[attributes["name"]] = relations[attributes["r:id"]][1]
+            self.sheet_indexes[attributes["name"]] = index
+        self.styles = self._related(relations, "/styles")
+        self.theme = self._related(relations, "/theme")
+        self.shared_strings_part = self._related(relations, "/sharedStrings")
+        self._strings: Optional[List[str]] = None
+        self._style_key_cache: Optional[Dict] = None
+
+    def __enter__(self) -> "PackageSplitter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.archive.close()
+
+    def sheet_names(self) -> List[str]:
+        return list(self.sheets)
+
+    @property
+    def strings(self) -> List[str]:
+        """原工作簿的共享字符串（<si> 原文），第一次导出时才读取。"""
+        if self._strings is None:
+            self._strings = []
+            if self.shared_strings_part is not None:
+                xml = self.archive.read(self.shared_strings_part).decode("utf-8")
+                self._strings = _STRING_ITEM.findall(xml)
+        return self._strings
+
+    def export(self, name: str, output: str) -> None:
+        """把工作表 name 导出为 output，公式替换为缓存值。"""
+        part = self.sheets[name]
+        strings: Dict[str, int] = {}
+        copied: List[Tuple[str, str]] = []  # (原部件名, 新部件名)
+        with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as target:
+            with target.open("xl/worksheets/sheet1.xml", "w") as handle:
+                for chunk in self._sheet_chunks(part, strings):
+                    handle.write(chunk.encode("utf-8"))
+            copied.extend(self._copy_related(target, part, "xl/worksheets/sheet1.xml"))
+            for source, name_in_target in (
+                (self.styles, "xl/styles.xml"),
+                (self.theme, "xl/theme/theme1.xml"),
+                ("docProps/core.xml", "docProps/core.xml"),
+            ):
+                if source is not None and source in self.archive.NameToInfo:
+                    copy_raw(self.archive, self.archive.getinfo(source), target, name_in_target)
+                    copied.append((source, name_in_target))
+            target.writestr("xl/sharedStrings.xml", self._shared_strings(strings))
+            target.writestr("xl/workbook.xml", self._workbook(name))
+            target.writestr("xl/_rels/workbook.xml.rels", self._workbook_rels())
+            target.writestr("_rels/.rels", self._package_rels())
+            target.writestr("docProps/app.xml", self._app_properties())
+            target.writestr("[Content_Types].xml", self._content_types_xml(copied))
+
+    def content_hash(self, name: str) -> str:
+        """工作表 name 导出后内容的 SHA-256：改写后的工作表 XML、用到的共享字符串、工作簿设置，
+        以及按原样复制的主题和关联部件（取 zip 中记录的 CRC，不解压）。
+
+        单元格、行和列的样式编号换成该样式的实际内容（数字格式、字体、填充、边框、对齐）再计算，
+        openpyxl 等重新保存报价表时样式重新编号，只要样式本身没有变化，哈希值就不变。
+        """
+        part = self.sheets[name]
+        digest = hashlib.sha256()
+        strings: Dict[str, int] = {}
+        keys = self._style_keys()
+
+        def resolve(match) -> str:
+            return f'{match.group(1)}="{keys.get(int(match.group(2)), match.group(2))}"'
+
+        for chunk in self._sheet_chunks(part, strings):
+            digest.update(_STYLE_ID.sub(resolve, chunk).encode("utf-8"))
+        digest.update(self._shared_strings(strings).encode("utf-8"))
+        digest.update(self._workbook(name).encode("utf-8"))
+        digest.update(keys.get("dxfs", "").encode("utf-8"))
+        for related in [self.theme, *self._related_parts(part)]:
+            info = self.archive.NameToInfo.get(related) if related is not None else None
+            if info is not None:
+                digest.update(f"{related}:{info.CRC}:{info.file_size}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _style_keys(self) -> Dict:
+        """cellXfs 中每个样式编号 -> 样式内容的摘要；"dxfs" 为条件格式样式的原文。"""
+        if self._style_key_cache is not None:
+            return self._style_key_cache
+        keys: Dict = {}
+        if self.styles is not None:
+            xml = self.archive.read(self.styles).decode("utf-8")
+            formats = {
+                attributes["numFmtId"]: attributes.get("formatCode", "")
+                for attributes in map(_attributes, re.findall(r"<numFmt\b([^>]*)/>", xml))
+            }
+            lists = {tag: _items(xml, tag) for tag in ("font", "fill", "border")}
+            cell_xfs = re.search(r"<cellXfs\b[^>]*>(.*?)</cellXfs>", xml, re.DOTALL)
+            for index, xf in enumerate(_items(cell_xfs.group(1), "xf") if cell_xfs else []):
+                head = re.match(r"<xf\b([^>]*?)/?>", xf)
+                attributes = _attributes(head.group(1))
+                number = attributes.pop("numFmtId", "0")
+                parts = [formats.get(number, f"内置{number}")]
+                for tag in ("font", "fill", "border"):
+                    position = int(attributes.pop(f"{tag}Id", "0"))
+                    parts.append(lists[tag][position] if position < len(lists[tag]) else "")
+                attributes.pop("xfId", None)
+                parts.append(repr(sorted(attributes.items())))
+                parts.append(xf[head.end():])
+                keys[index] = hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+            dxfs = re.search(r"<dxfs\b.*?</dxfs>", xml, re.DOTALL)
+            keys["dxfs"] = dxfs.group(0) if dxfs else ""
+        self._style_key_cache = keys
+        return keys
+
+    # ---- 读取包结构 ----
+
+    def _content_types(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        xml = self.archive.read("[Content_Types].xml").decode("utf-8")
+        defaults = {}
+        for match in re.finditer(r"<Default\b([^>]*)/>", xml):
+            attributes = _attributes(match.group(1))
+            defaults[attributes["Extension"].lower()] = attributes["ContentType"]
+        overrides = {}
+        for match in re.finditer(r"<Override\b([^>]*)/>", xml):
+            attributes = _attributes(match.group(1))
+            overrides[attributes["PartName"].lstrip("/")] = attributes["ContentType"]
+        return defaults, overrides
+
+    def _relations(self, part: str) -> Dict[str, Tuple[str, str]]:
+        return _relations(self.archive, part)
+
+    @staticmethod
+    def _related(relations: Dict[str, Tuple[str, str]], suffix: str) -> Optional[str]:
+        for kind, target in relations.values():
+            if kind.endswith(suffix):
+                return target
+        return None
+
+    # ---- 写出 ----
+
+    def sheet_xml(self, part: str) -> Iterator[str]:
+        """逐块解压工作表 XML，每块到最后一个完整的 </row> 为止，单元格在块内不会被截断。"""
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        pending = ""
+        with self.archive.open(part) as source:
+            while True:
+                data = source.read(_CHUNK)
+                pending += decoder.decode(data, final=not data)
+                if not data:
+                    break
+                end = pending.rfind("</row>")
+                if end >= 0:
+                    end += len("</row>")
+                    yield pending[:end]
+                    pending = pending[end:]
+        yield pending
+
+    def _sheet_chunks(self, part: str, strings: Dict[str, int]) -> Iterator[str]:
+        for chunk in self.sheet_xml(part):
+            yield self._rewrite_cells(chunk, strings)
+
+    def _rewrite_cells(self, xml: str, strings: Dict[str, int]) -> str:
+        def string_index(item: str) -> int:
+            index = strings.get(item)
+            if index is None:
+                index = strings[item] = len(strings)
+            return index
+
+        def replace(match) -> str:
+            attributes, inner = match.group(1), match.group(2)
+            if inner is None:
+                return match.group(0)
+            kind = _TYPE.search(attributes)
+            kind = kind.group(1) if kind else "n"
+            if "<f" in inner:
+                inner = _FORMULA.sub("", inner)
+                value = _VALUE.search(inner)
+                if value is None or not value.group(1):
+                    # 没有缓存值的公式只保留样式，没有样式时整个单元格去掉
+                    return f"<c{_TYPE.sub('', attributes)}/>" if _STYLE.search(attributes) else ""
+                if kind == "str":  # 公式的字符串结果改为共享字符串
+                    space = ' xml:space="preserve"' if value.group(1) != value.group(1).strip() else ""
+                    index = string_index(f"<si><t{space}>{value.group(1)}</t></si>")
+                    return f'<c{_TYPE.sub("", attributes)} t="s"><v>{index}</v></c>'
+            if kind == "s":
+                inner = _VALUE.sub(
+                    lambda value: f"<v>{string_index(self.strings[int(value.group(1))])}</v>" if value.group(1) else "",
+                    inner,
+                )
+            return f"<c{attributes}>{inner}</c>"
+
+        return _CELL.sub(replace, xml)
+
+    def _copy_related(self, target: zipfile.ZipFile, part: str, name: str) -> List[Tuple[str, str]]:
+        """复制工作表引用的部件及其关系（如打印机设置、图片），部件名保持不变，只有工作表本身改名。"""
+        rels = _rels_name(part)
+        if rels not in self.archive.NameToInfo:
+            return []
+        copy_raw(self.archive, self.archive.getinfo(rels), target, _rels_name(name))
+        copied = []
+        for related in self._related_parts(part)[1:]:
+            copy_raw(self.archive, self.archive.getinfo(related), target)
+            if not related.endswith(".rels"):
+                copied.append((related, related))
+        return copied
+
+    def _related_parts(self, part: str) -> List[str]:
+        """工作表的关系部件，以及经关系直接或间接引用的部件和它们的关系部件；工作表没有关系时为空。"""
+        rels = _rels_name(part)
+        if rels not in self.archive.NameToInfo:
+            return []
+        parts = [rels]
+        pending = [related for _, related in self._relations(part).values()]
+        seen = set()
+        while pending:
+            related = pending.pop()
+            if related in seen or related not in self.archive.NameToInfo:
+                continue
+            seen.add(related)
+            parts.append(related)
+            nested = _rels_name(related)
+            if nested in self.archive.NameToInfo:
+                parts.append(nested)
+                pending.extend(target_part for _, target_part in self._relations(related).values())
+        return parts
+
+    @staticmethod
+    def _shared_strings(strings: Dict[str, int]) -> str:
+        count = len(strings)
+        return f'<sst xmlns="{SHEET_MAIN}" count="{count}" uniqueCount="{count}">{"".join(strings)}</sst>'
+
+    def _workbook(self, name: str) -> str:
+        """按原工作簿的 workbookPr 和 calcPr 生成只含一个工作表的 workbook.xml。"""
+        properties = re.search(r"<workbookPr\b[^>]*/>", self.workbook_xml)
+        calculation = re.search(r"<calcPr\b[^>]*/>", self.workbook_xml)
+        local = str(self.sheet_indexes[name])
+        names = []
+        for match in _DEFINED_NAME.finditer(self.workbook_xml):
+            attributes = _attributes(match.group(1))
+            if attributes.get("localSheetId") == local:
+                attributes["localSheetId"] = "0"
+                text = "".join(f" {key}={quoteattr(value)}" for key, value in attributes.items())
+                names.append(f"<definedName{text}>{match.group(2)}</definedName>")
+        return (
+            f'<workbook xmlns="{SHEET_MAIN}" xmlns:r="{REL_NS}">'
+            + (properties.group(0) if properties else "<workbookPr/>")
+            + '<bookViews><workbookView activeTab="0"/></bookViews>'
+            + f'<sheets><sheet name={quoteattr(name)} sheetId="1" r:id="rId1"/></sheets>'
+            + (f"<definedNames>{''.join(names)}</definedNames>" if names else "")
+            + (calculation.group(0) if calculation else "")
+            + "</workbook>"
+        )
+
+    def _workbook_rels(self) -> str:
+        relations = [("rId1", "worksheet", "worksheets/sheet1.xml"), ("rId2", "sharedStrings", "sharedStrings.xml")]
+        if self.styles is not None:
+            relations.append(("rId3", "styles", "styles.xml"))
+        if self.theme is not None:
+            relations.append(("rId4", "theme", "theme/theme1.xml"))
+        return (
+            f'<Relationships xmlns="{PACKAGE_RELS}">'
+            + "".join(
+                f'<Relationship Id="{rid}" Type="{REL_NS}/{kind}" Target="{target}"/>' for rid, kind, target in relations
+            )
+            + "</Relationships>"
+        )
+
+    def _package_rels(self) -> str:
+        relations = [f'<Relationship Id="rId1" Type="{REL_NS}/officeDocument" Target="xl/workbook.xml"/>']
+        if "docProps/core.xml" in self.archive.NameToInfo:
+            relations.append(
+                f'<Relationship Id="rId2" Type="{PACKAGE_RELS}/metadata/core-properties" Target="docProps/core.xml"/>'
+            )
+        relations.append(f'<Relationship Id="rId3" Type="{REL_NS}/extended-properties" Target="docProps/app.xml"/>')
+        return f'<Relationships xmlns="{PACKAGE_RELS}">{"".join(relations)}</Relationships>'
+
+    @staticmethod
+    def _app_properties() -> str:
+        return (
+            '<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties">'
+            "<Application>Microsoft Excel</Application></Properties>"
+        )
+
+    def _content_types_xml(self, copied: List[Tuple[str, str]]) -> str:
+        overrides = {
+            "xl/workbook.xml": f"{OFFICE_TYPE}.spreadsheetml.sheet.main+xml",
+            "xl/worksheets/sheet1.xml": f"{OFFICE_TYPE}.spreadsheetml.worksheet+xml",
+            "xl/sharedStrings.xml": f"{OFFICE_TYPE}.spreadsheetml.sharedStrings+xml",
+            "docProps/app.xml": f"{OFFICE_TYPE}.extended-properties+xml",
+        }
+        defaults = {"rels": self.defaults.get("rels"), "xml": self.defaults.get("xml", "application/xml")}
+        for source, name in copied:
+            if source in self.overrides:
+                overrides[name] = self.overrides[source]
+            else:
+                extension = posixpath.splitext(name)[1][1:].lower()
+                if extension in self.defaults:
+                    defaults[extension] = self.defaults[extension]
+        defaults["rels"] = defaults["rels"] or "application/vnd.openxmlformats-package.relationships+xml"
+        return (
+            f'<Types xmlns="{CONTENT_TYPES}">'
+            + "".join(f'<Default Extension="{ext}" ContentType="{kind}"/>' for ext, kind in defaults.items())
+            + "".join(f'<Override PartName="/{part}" ContentType="{kind}"/>' for part, kind in overrides.items())
+            + "</Types>"
+        )